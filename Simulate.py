@@ -4,30 +4,47 @@ import subprocess
 import re
 from pathlib import Path
 from math import pi
+import math
 import itertools
 import xml.etree.ElementTree as ET
 import glob
 import time
+import os
+import json
+import hashlib
+import sqlite3
+import socket
+import statistics
+from dataclasses import dataclass, asdict
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import tracing
 
 GENCASE_EXE     = r"C:\Users\chakraag\Downloads\DualSPHysics_v5.4.3\DualSPHysics_v5.4\bin\windows\GenCase_win64.exe"
 DUAL_CPU_EXE    = r"C:\Users\chakraag\Downloads\DualSPHysics_v5.4.3\DualSPHysics_v5.4\bin\windows\DualSPHysics5.4CPU_win64.exe"
 DUAL_GPU_EXE    = r"C:\Users\chakraag\Downloads\DualSPHysics_v5.4.3\DualSPHysics_v5.4\bin\windows\DualSPHysics5.4GPU_win64.exe"
 PARTVTK_EXE     = r"C:\Users\chakraag\Downloads\DualSPHysics_v5.4.3\DualSPHysics_v5.4\bin\windows\PartVTK_win64.exe"
+# Return code recorded when a tool is missing or cannot be started (the
+# shell's "command not found"), so it is never mistaken for a clean run.
+LAUNCH_FAILED_RC = 127
+
 def stream_run(cmd, cwd=None):
-    proc = subprocess.Popen(
-        cmd,
-        cwd=str(cwd) if cwd else None,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1,
-        universal_newlines=True,
-    )
-    for line in proc.stdout:
-        sys.stdout.write(line)
-        sys.stdout.flush()
-    proc.stdout.close()
-    return proc.wait()
+    with tracing.process_span(cmd, watch=cwd) as sp:
+        proc = subprocess.Popen(
+            cmd,
+            cwd=str(cwd) if cwd else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            universal_newlines=True,
+        )
+        for line in proc.stdout:
+            sys.stdout.write(line)
+            sys.stdout.flush()
+        proc.stdout.close()
+        return tracing.wait_child(proc, sp)
 
 def parse_list_or_single(prompt, default):
     raw = input(f"{prompt} [{default}]: ").strip()
@@ -75,7 +92,10 @@ def safe_val_tag(prefix: str, val: float, unit_suffix=""):
         core = f"{val:g}".replace(".", "p")
     return f"{prefix}-{core}{unit_suffix}"
 
-def ensure_case_assets_without_xml(case_dir: Path, variant_dir: Path):
+def ensure_case_assets_without_xml(case_dir: Path, variant_dir: Path, stager=None):
+    if stager is not None:
+        stager.stage(variant_dir)
+        return True
     data_src = case_dir / "data"
     if data_src.exists() and data_src.is_dir():
         shutil.copytree(data_src, variant_dir / "data", dirs_exist_ok=True)
@@ -209,16 +229,10 @@ def update_dp(tree: ET.ElementTree, dp: float):
             dp_const.text = new_val
             updated = True
             changes_log.append(f"  * Updated constants/dp: {old_val} -> {new_val}")    
+    in_params = {n for p in root.iter("parameters") for n in p.iter()}
     for xp in [".//dp", ".//kernel//dp", ".//*[@name='dp']", ".//*[@Name='dp']"]:
         for n in root.findall(xp):
-            parent = n
-            in_params = False
-            for _ in range(5):  
-                parent = list(root.iter())  
-                if parent and any(p.tag == "parameters" for p in root.iter() if n in list(p.iter())):
-                    in_params = True
-                    break
-            if in_params:
+            if n in in_params:
                 continue
                 
             if "v" in n.attrib:
@@ -287,6 +301,202 @@ def update_mvrotsinu(tree: ET.ElementTree, freq_hz: float, ampl_val: float, unit
     print(f"  * Updated {updated} mvrotsinu block(s): freq={freq_hz:g} Hz, ampl={ampl_val:g} {unit}")
     return updated
 
+def motion_begin_nodes(root):
+    """
+    <begin> elements of the <objreal> blocks that hold an mvrotsinu.
+    """
+    return [b for obj in root.iter("objreal") if obj.find(".//mvrotsinu") is not None
+            for b in obj.iter("begin")]
+
+def update_motion_start(tree: ET.ElementTree, t_start: float):
+    """
+    Delays the mvrotsinu motion by t_start (warm start from a settled Part).
+    """
+    nodes = motion_begin_nodes(tree.getroot())
+    for b in nodes:
+        b.set("start", f"{float(b.attrib.get('start', 0)) + t_start:g}")
+    print(f"  * Motion start delayed by {t_start:g}s in {len(nodes)} <begin> block(s)")
+    return len(nodes)
+
+class XmlPatchPlan:
+    """
+    Template compiler for the per-variant XML edits. The base tree is parsed
+    and patched for structure (missing sections, parameter nodes, dp nodes,
+    fresh freq/ampl children) once; every node/attribute a sweep parameter
+    touches is recorded. emit() then restores those nodes, applies the same
+    rules as update_dp()/update_time_max()/update_mvrotsinu() directly to
+    them and serialises, with no tree rescans or clone/reparse per variant.
+    """
+    def __init__(self, tree_orig: ET.ElementTree):
+        tree = clone_tree(tree_orig)
+        root = tree.getroot()
+        self.pristine = ET.tostring(root, encoding="utf-8", xml_declaration=True)
+        preserve_critical_xml_sections(tree, tree_orig)
+        self.tree = tree
+        self.has_constants = root.find(".//execution/constants") is not None
+        self._lock = threading.Lock()
+        self._ops = []
+        touched = []
+        params = _ensure_params_block(root)
+        _ensure_constants_block(root)
+
+        def param_site(key, value_fn):
+            node = None
+            for p in params.findall("./parameter"):
+                if p.attrib.get("key", "").lower() == key.lower():
+                    node = p
+                    break
+            if node is None:
+                node = ET.SubElement(params, "parameter")
+                node.set("key", key)
+                node.set("value", "")
+                node.set("comment", "Custom value from batch script")
+                self._ops.append(lambda c, n=node: n.set("value", f"{value_fn(c):g}"))
+            else:
+                def op(c, n=node):
+                    new_val = f"{value_fn(c):g}"
+                    old_val = n.attrib.get("value")
+                    if old_val != new_val:
+                        n.set("value", new_val)
+                        n.set("comment", f"Updated from batch script (was {old_val})")
+                self._ops.append(op)
+            touched.append(node)
+
+        def vtext_op(c, n):
+            old_val = n.attrib.get("v", n.text or "")
+            new_val = f"{c['dp']:g}"
+            if old_val != new_val:
+                n.set("v", new_val)
+                n.text = new_val
+
+        param_site("VResId", lambda c: -1)
+        param_site("Dp", lambda c: c["dp"])
+        param_site("DP", lambda c: c["dp"])
+        self.dp_sites = 0
+        for node in root.findall(".//geometry/definition"):
+            def op(c, n=node):
+                old_dp = n.attrib.get("dp")
+                new_dp = f"{c['dp']:g}"
+                if old_dp != new_dp:
+                    n.set("dp", new_dp)
+                    n.set("comment", f"Custom dp from batch (was {old_dp})")
+            self._ops.append(op)
+            touched.append(node)
+            self.dp_sites += 1
+        geom_def = root.find(".//geometry/definition")
+        if geom_def is not None:
+            dp_node = geom_def.find("./lattice_dp")
+            if dp_node is None:
+                dp_node = geom_def.find("./dp")
+            if dp_node is None:
+                dp_node = ET.SubElement(geom_def, "dp")
+            self._ops.append(lambda c, n=dp_node: vtext_op(c, n))
+            touched.append(dp_node)
+            self.dp_sites += 1
+        constants = root.find(".//constants")
+        if constants is not None:
+            dp_const = constants.find("./dp")
+            if dp_const is None:
+                dp_const = ET.SubElement(constants, "dp")
+            self._ops.append(lambda c, n=dp_const: vtext_op(c, n))
+            touched.append(dp_const)
+            self.dp_sites += 1
+        in_params = {n for p in root.iter("parameters") for n in p.iter()}
+        for xp in [".//dp", ".//kernel//dp", ".//*[@name='dp']", ".//*[@Name='dp']"]:
+            for n in root.findall(xp):
+                if n in in_params:
+                    continue
+                def op(c, n=n):
+                    new_val = f"{c['dp']:g}"
+                    if "v" in n.attrib:
+                        if n.attrib.get("v") != new_val:
+                            n.set("v", new_val)
+                    elif not list(n):
+                        if (n.text or "").strip() != new_val:
+                            n.text = new_val
+                self._ops.append(op)
+                touched.append(n)
+                self.dp_sites += 1
+
+        self._tm_params = params
+        self._tm_node = None
+        for p in params.findall("./parameter"):
+            if p.attrib.get("key", "").lower() == "timemax":
+                self._tm_node = p
+                break
+        self._tm_created = self._tm_node is None
+        if self._tm_created:
+            self._tm_node = ET.SubElement(params, "parameter")
+            self._tm_node.set("key", "TimeMax")
+            self._tm_index = list(params).index(self._tm_node)
+            params.remove(self._tm_node)
+        touched.append(self._tm_node)
+
+        self.mv_nodes = root.findall(".//mvrotsinu")
+        self.begin_nodes = motion_begin_nodes(root)
+        touched.extend(self.begin_nodes)
+        self._mv_children = []
+        for mv in self.mv_nodes:
+            for child in list(mv):
+                if child.tag in ("freq", "ampl"):
+                    mv.remove(child)
+            f = ET.SubElement(mv, "freq")
+            a = ET.SubElement(mv, "ampl")
+            for n in (f, a):
+                n.set("v", "")
+                n.set("units_comment", "")
+            self._mv_children.append((f, a))
+            touched.extend((mv, f, a))
+        self._snapshot = [(n, dict(n.attrib), n.text) for n in touched]
+
+    def _apply(self, dp, t_end, f_in, ampl_val, unit, t_start=0.0):
+        for n, attrib, text in self._snapshot:
+            n.attrib.clear()
+            n.attrib.update(attrib)
+            n.text = text
+        c = {"dp": dp}
+        for op in self._ops:
+            op(c)
+        tm = self._tm_node
+        if t_end >= 0:
+            if self._tm_created and tm not in self._tm_params:
+                self._tm_params.insert(self._tm_index, tm)
+            old_val = tm.attrib.get("value")
+            tm.set("value", f"{t_start + t_end:g}")
+            tm.set("comment", f"Set by batch script (was {old_val})")
+        elif self._tm_created and tm in self._tm_params:
+            self._tm_params.remove(tm)
+        for mv, (f, a) in zip(self.mv_nodes, self._mv_children):
+            mv.set("anglesunits", unit)
+            if t_end >= 0:
+                mv.set("duration", f"{t_end:g}")
+            f.set("v", f"{f_in:g}")
+            a.set("v", f"{ampl_val:g}")
+            f.set("units_comment", "1/s")
+            a.set("units_comment", unit)
+        if t_start:
+            for b in self.begin_nodes:
+                b.set("start", f"{float(b.attrib.get('start', 0)) + t_start:g}")
+
+    def emit(self, dp, t_end, f_in, ampl_val, unit, verbose=True, t_start=0.0):
+        """
+        Returns the patched document as UTF-8 bytes (with XML declaration).
+        t_start > 0 is a warm start: TimeMax and the motion start move
+        later by t_start, the motion duration stays t_end.
+        """
+        with self._lock:
+            self._apply(dp, t_end, f_in, ampl_val, unit, t_start)
+            data = ET.tostring(self.tree.getroot(), encoding="utf-8", xml_declaration=True)
+            if verbose:
+                print(f"  * Patch plan: dp={dp:g} at {self.dp_sites} site(s) (+VResId=-1, Dp/DP params)")
+                if t_end >= 0:
+                    print(f"  * TimeMax={t_start + t_end:g}" + (f" (warm start at {t_start:g}s)" if t_start else ""))
+                else:
+                    print(f"  * Keeping default TimeMax (user specified {t_end})")
+                print(f"  * Updated {len(self.mv_nodes)} mvrotsinu block(s): freq={f_in:g} Hz, ampl={ampl_val:g} {unit}")
+                print_xml_verification(self.tree.getroot())
+        return data
+
 def run_gencase(case_dir: Path, base: str, dp: float = None):
     exe = Path(GENCASE_EXE)
     if not exe.exists():
@@ -357,7 +567,297 @@ def verify_gencase_output(case_dir: Path, base: str, expected_dp: float):
     
     print("  =================================\n")
 
-def run_dual(case_dir: Path, case_base: str, mode: str = "cpu") -> Path:
+# ---------------------------------------------------------------------------
+# Streaming parser for the DualSPHysics PART progress table. Lines are fed as
+# they arrive from the solver; each recognised line becomes a typed record.
+# ---------------------------------------------------------------------------
+
+_RE_PART_ROW = re.compile(
+    r"^(\d{4,})\s+([0-9.eE+-]+)\s+([\d,]+)\s+([\d,]+)\s+([\d,]+)\s+([\d,]+)\s+([0-9.eE+-]+)\s+(.*\S)?\s*$")
+_RE_PARTS_OUT = re.compile(r"Particles out:\s*([\d,]+)\s*\(total out:\s*([\d,]+)\)\s*-\s*Current np:\s*([\d,]+)")
+_RE_DTMIN = re.compile(r"WARNING:\s*([\d,]+) DTs adjusted to DtMin \(t:([0-9.eE+-]+), nstep:(\d+)\)")
+_RE_MEMORY = re.compile(r"(Initial|Updated) allocated memory in (\w+):\s*([\d,]+)")
+_RE_INFO = re.compile(r"^([A-Za-z][A-Za-z0-9]*)=(.*)$")
+# Header values worth keeping (numbers have thousands separators removed).
+SOLVER_INFO_KEYS = ("CaseNp", "CaseNbound", "CaseNfixed", "CaseNmoving", "CaseNfloat", "CaseNfluid",
+                    "Dp", "KernelH", "CteB", "Gamma", "RhopZero", "MassFluid",
+                    "DtIni", "DtMin", "TimeMax", "TimePart", "MapCells", "RunMode")
+
+def _int(s):
+    return int(s.replace(",", ""))
+
+def _num(s):
+    s = s.strip().strip('"')
+    head = s.split()[0] if s else s
+    try:
+        return _int(head) if re.fullmatch(r"[\d,]+", head) else float(head)
+    except ValueError:
+        return s
+
+@dataclass
+class PartRecord:
+    part: int
+    part_time: float
+    total_steps: int
+    steps: int
+    particles: int
+    cells: int
+    time_per_sec: float
+    finish_time: str
+    steps_per_s: float
+    sim_per_wall: float
+    kind: str = "part"
+
+@dataclass
+class ParticlesOutRecord:
+    part_time: float
+    out: int
+    total_out: int
+    np: int
+    kind: str = "out"
+
+@dataclass
+class DtMinRecord:
+    count: int
+    t: float
+    nstep: int
+    kind: str = "dtmin"
+
+@dataclass
+class MemoryRecord:
+    part_time: float
+    device: str
+    bytes: int
+    initial: bool
+    kind: str = "mem"
+
+class PartTableParser:
+    """
+    Incremental parser for solver stdout. feed() takes one line and returns
+    a record (PartRecord, ParticlesOutRecord, DtMinRecord, MemoryRecord) or
+    None. Header values such as CaseNp/CaseNfluid/Dp end up in .info.
+    t_start is the simulated time the run begins at (warm starts).
+    """
+    def __init__(self, t_start=0.0):
+        self.t_start = t_start
+        self.info = {}
+        self.in_table = False
+        self.last_part = None
+        self.parts = 0
+        self.total_out = 0
+        self.dtmin_count = 0
+        self.mem_initial = None
+        self.mem_last = None
+        self.wall_solver = 0.0
+
+    def feed(self, line: str):
+        s = line.strip()
+        if not s:
+            return None
+        if self.in_table and s[0].isdigit():
+            m = _RE_PART_ROW.match(s)
+            if m:
+                return self._part_row(m)
+        if "Particles out:" in s:
+            m = _RE_PARTS_OUT.search(s)
+            if m:
+                self.total_out = _int(m.group(2))
+                t = self.last_part.part_time if self.last_part else self.t_start
+                return ParticlesOutRecord(t, _int(m.group(1)), self.total_out, _int(m.group(3)))
+        if "DtMin" in s and "WARNING" in s:
+            m = _RE_DTMIN.search(s)
+            if m:
+                self.dtmin_count = _int(m.group(1))
+                return DtMinRecord(self.dtmin_count, float(m.group(2)), int(m.group(3)))
+        if "allocated memory" in s:
+            m = _RE_MEMORY.search(s)
+            if m:
+                nbytes = _int(m.group(3))
+                initial = m.group(1) == "Initial"
+                if self.mem_initial is None:
+                    self.mem_initial = nbytes
+                self.mem_last = nbytes
+                t = self.last_part.part_time if self.last_part else self.t_start
+                return MemoryRecord(t, m.group(2), nbytes, initial)
+        if s.startswith("PART ") and "PartTime" in s:
+            self.in_table = True
+            return None
+        if not self.in_table and "=" in s:
+            m = _RE_INFO.match(s)
+            if m and m.group(1) in SOLVER_INFO_KEYS:
+                self.info[m.group(1)] = _num(m.group(2))
+        return None
+
+    def _part_row(self, m):
+        part_time = float(m.group(2))
+        steps = _int(m.group(4))
+        time_per_sec = float(m.group(7))
+        prev_t = self.last_part.part_time if self.last_part else self.t_start
+        wall = time_per_sec * max(part_time - prev_t, 0.0)
+        self.wall_solver += wall
+        rec = PartRecord(
+            part=int(m.group(1)), part_time=part_time, total_steps=_int(m.group(3)), steps=steps,
+            particles=_int(m.group(5)), cells=_int(m.group(6)), time_per_sec=time_per_sec,
+            finish_time=(m.group(8) or "").strip(),
+            steps_per_s=steps / wall if wall > 0 else 0.0,
+            sim_per_wall=1.0 / time_per_sec if time_per_sec > 0 else 0.0,
+        )
+        self.last_part = rec
+        self.parts += 1
+        return rec
+
+    def summary(self):
+        last = self.last_part
+        sim_t = last.part_time - self.t_start if last else 0.0
+        nfluid = self.info.get("CaseNfluid")
+        loss_pct = 100.0 * self.total_out / nfluid if isinstance(nfluid, int) and nfluid > 0 else None
+        return {
+            "kind": "summary",
+            "parts": self.parts,
+            "sim_time": sim_t,
+            "total_steps": last.total_steps if last else 0,
+            "wall_solver_est": self.wall_solver,
+            "steps_per_s": (last.total_steps / self.wall_solver) if last and self.wall_solver > 0 else 0.0,
+            "sim_per_wall": (sim_t / self.wall_solver) if self.wall_solver > 0 else 0.0,
+            "particles_out": self.total_out,
+            "particles_out_pct": loss_pct,
+            "loss_rate_per_sim_s": (self.total_out / sim_t) if sim_t > 0 else 0.0,
+            "dtmin_adjusted": self.dtmin_count,
+            "mem_initial": self.mem_initial,
+            "mem_final": self.mem_last,
+            "mem_growth": (self.mem_last - self.mem_initial) if self.mem_initial is not None else None,
+            "info": self.info,
+            **({"t_start": self.t_start} if self.t_start else {}),
+        }
+
+class MetricsWriter:
+    """
+    Appends parser records to a per-variant metrics.jsonl: one "info" line
+    when the table starts, one line per record and a closing "summary".
+    """
+    def __init__(self, path: Path, parser: PartTableParser, append=False):
+        self.path = path
+        self.parser = parser
+        self._fh = path.open("a" if append else "w", encoding="utf-8")
+        self._info_written = False
+
+    def write(self, rec):
+        if rec is None:
+            return
+        if not self._info_written:
+            self._fh.write(json.dumps({"kind": "info", **self.parser.info}) + "\n")
+            self._info_written = True
+        self._fh.write(json.dumps(asdict(rec)) + "\n")
+        if rec.kind == "part":
+            self._fh.flush()
+
+    def close(self, **extra):
+        summary = self.parser.summary()
+        summary.update(extra)
+        self._fh.write(json.dumps(summary) + "\n")
+        self._fh.close()
+        return summary
+
+def metrics_from_log(log_path: Path, metrics_path: Path = None):
+    """
+    Run an existing solver log through the streaming parser (line by line)
+    and write its metrics.jsonl. Returns the summary dict.
+    """
+    metrics_path = metrics_path or log_path.with_name("metrics.jsonl")
+    parser = PartTableParser()
+    writer = MetricsWriter(metrics_path, parser)
+    with log_path.open("r", encoding="utf-8", errors="ignore") as fh:
+        for line in fh:
+            writer.write(parser.feed(line))
+    return writer.close()
+
+# ---------------------------------------------------------------------------
+# Divergence watchdog: stops solver runs that are clearly going nowhere.
+# ---------------------------------------------------------------------------
+
+WATCHDOG_DTMIN_RATE    = "dtmin_rate"
+WATCHDOG_PARTICLES_OUT = "particles_out"
+WATCHDOG_PROJECTED_TIME = "projected_time"
+
+class SolverWatchdog:
+    """
+    Checks live parser records against the configured limits (None/0 = off):
+      max_dtmin_per_sim_s  DtMin-adjusted steps per simulated second
+      max_out_pct          particles out as % of CaseNfluid
+      max_wall_s           projected solver wall time (elapsed + remaining
+                           simulated time x recent Time/Sec)
+    The DtMin rate is per simulated second of this run (from the parser's
+    t_start for warm starts) and only checked after grace_sim_time of it,
+    since the first adjustments at start-up say little about the run.
+    """
+    def __init__(self, max_dtmin_per_sim_s=None, max_out_pct=None, max_wall_s=None, grace_sim_time=0.05):
+        self.max_dtmin_per_sim_s = max_dtmin_per_sim_s
+        self.max_out_pct = max_out_pct
+        self.max_wall_s = max_wall_s
+        self.grace_sim_time = grace_sim_time
+        self.start = time.time()
+        self.reason = None
+        self.detail = None
+        self._time_per_sec = None
+
+    def _trigger(self, reason, detail):
+        self.reason = reason
+        self.detail = detail
+        return reason
+
+    def check(self, rec, parser: PartTableParser):
+        if self.reason or rec is None:
+            return self.reason
+        if isinstance(rec, DtMinRecord):
+            t_sim = rec.t
+        elif isinstance(rec, PartRecord):
+            t_sim = rec.part_time
+            tps = rec.time_per_sec
+            self._time_per_sec = tps if self._time_per_sec is None else 0.7 * self._time_per_sec + 0.3 * tps
+        else:
+            t_sim = rec.part_time
+        t_run = t_sim - parser.t_start
+        if self.max_dtmin_per_sim_s and parser.dtmin_count and t_run >= self.grace_sim_time:
+            rate = parser.dtmin_count / t_run
+            if rate > self.max_dtmin_per_sim_s:
+                return self._trigger(WATCHDOG_DTMIN_RATE,
+                                     f"{parser.dtmin_count} DtMin adjustments by t={t_sim:g}s "
+                                     f"({rate:.0f}/s > {self.max_dtmin_per_sim_s:g}/s)")
+        nfluid = parser.info.get("CaseNfluid")
+        if self.max_out_pct and isinstance(nfluid, int) and nfluid > 0:
+            pct = 100.0 * parser.total_out / nfluid
+            if pct > self.max_out_pct:
+                return self._trigger(WATCHDOG_PARTICLES_OUT,
+                                     f"{parser.total_out} particles out ({pct:.2f}% of CaseNfluid={nfluid} "
+                                     f"> {self.max_out_pct:g}%)")
+        t_max = parser.info.get("TimeMax")
+        if self.max_wall_s and isinstance(rec, PartRecord) and isinstance(t_max, (int, float)):
+            elapsed = time.time() - self.start
+            projected = elapsed + max(t_max - rec.part_time, 0.0) * self._time_per_sec
+            if projected > self.max_wall_s:
+                return self._trigger(WATCHDOG_PROJECTED_TIME,
+                                     f"projected {projected:.0f}s wall at {self._time_per_sec:.1f} s/sec "
+                                     f"> budget {self.max_wall_s:g}s")
+        return None
+
+def stop_process(proc, timeout=10):
+    proc.terminate()
+    try:
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+def run_dual(case_dir: Path, case_base: str, mode: str = "cpu", threads: int = None, watchdog=None,
+             restart_part: int = None, extra_flags=(), output: str = "full", restart_from: Path = None,
+             t_start: float = 0.0, analyser=None):
+    """
+    Solves the GenCase'd case in case_dir. restart_part resumes from that
+    Part of this folder's own output, or with restart_from, starts from the
+    Part of another variant folder (warm start at simulated time t_start).
+    analyser (an InSituAnalyser) is started with the solver and finished
+    when it exits. Returns (out_dir, return code); a missing or unstartable
+    exe gives LAUNCH_FAILED_RC.
+    """
     out_dir = case_dir / "out"
     out_dir.mkdir(exist_ok=True)
     logs_dir = case_dir / "logs"
@@ -367,265 +867,3459 @@ def run_dual(case_dir: Path, case_base: str, mode: str = "cpu") -> Path:
     dual_exe = Path(DUAL_GPU_EXE if mode.startswith("g") else DUAL_CPU_EXE)
     if not dual_exe.exists():
         print(f"WARNING: DualSPHysics exe not found at {dual_exe}. Skipping solver.")
-        return out_dir
-    gencase_xml_candidates = sorted(case_dir.glob("*.xml"), key=lambda p: p.stat().st_mtime, reverse=True)
-    gencase_output_xml = None
-    for xml_file in gencase_xml_candidates:
-        if xml_file.stem not in [f"{case_base}_Def", case_base, f"{case_base}_Actual"]:
-            gencase_output_xml = xml_file
-            print(f"  >> Using GenCase output XML: {xml_file.name}")
-            break  
-    if gencase_output_xml is None:
-        print(f"  !! WARNING: Could not find GenCase output XML (e.g., '0.01.xml')")
-        print(f"     Available XML files: {[x.name for x in case_dir.glob('*.xml')]}")
-        print(f"     Trying to use {case_base}.xml anyway...")
-        gencase_output_xml = case_dir / f"{case_base}.xml"
+        return out_dir, LAUNCH_FAILED_RC
+    gencase_output_xml = solver_case_xml(case_dir, case_base)
     dual_case_name = gencase_output_xml.stem
     cmd = [
         str(dual_exe),
         dual_case_name,              
         str(case_dir),               
-        "-sv:binx,vtk",
-        "-svdomainvtk:1",
-        "-svnormals:1",
-        "-svres",
+        *OUTPUT_POLICIES[output],
         "-dirout", str(out_dir)
     ]
-    print("\n> Running DualSPHysics (VTK on):\n", " ".join([f'"{c}"' if " " in c else c for c in cmd]))
-    with dual_log.open("w", encoding="utf-8") as lf:
-        proc = subprocess.Popen(
-            cmd,
-            cwd=str(case_dir),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
-            universal_newlines=True,
-        )
-        for line in proc.stdout:
-            sys.stdout.write(line)
-            sys.stdout.flush()
-            lf.write(line)
-        proc.stdout.close()
-        rc = proc.wait()
+    if threads and not mode.startswith("g") and not any(f.startswith("-ompthreads") for f in extra_flags):
+        cmd.append(f"-ompthreads:{threads}")
+    cmd.extend(extra_flags)
+    if restart_part:
+        cmd.extend([f"-partbegin:{restart_part}", str(stage_restart_dir(case_dir, restart_part, restart_from))])
+    print(f"\n> Running DualSPHysics ({'VTK on' if output == 'full' else 'binary output only'}):\n", " ".join([f'"{c}"' if " " in c else c for c in cmd]))
+    resumed = bool(restart_part) and restart_from is None
+    parser = PartTableParser(t_start)
+    metrics = MetricsWriter(logs_dir / "metrics.jsonl", parser, append=resumed)
+    start_t = time.time()
+    with dual_log.open("a" if resumed else "w", encoding="utf-8") as lf, \
+            tracing.process_span(cmd, watch=out_dir, variant=case_dir.name) as sp:
+        proc_t0 = tracing.now()
+        try:
+            proc = subprocess.Popen(
+                cmd,
+                cwd=str(case_dir),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                bufsize=1,
+                universal_newlines=True,
+            )
+        except OSError as e:
+            print(f"!! Could not start DualSPHysics: {e}")
+            lf.write(f"[Launch failed: {e}]\n")
+            proc = None
+        if proc is not None:
+            if analyser is not None:
+                analyser.start(parser)
+            for line in proc.stdout:
+                sys.stdout.write(line)
+                sys.stdout.flush()
+                lf.write(line)
+                rec = parser.feed(line)
+                metrics.write(rec)
+                if rec is not None and rec.kind == "part" and parser.parts == 1:
+                    tracing.mark("solver.startup", proc_t0, variant=case_dir.name)
+                if watchdog is not None and watchdog.check(rec, parser):
+                    print(f"\n!! Watchdog stopped the solver ({watchdog.reason}): {watchdog.detail}")
+                    lf.write(f"\n[Watchdog: {watchdog.reason}: {watchdog.detail}]\n")
+                    stop_process(proc)
+                    break
+            proc.stdout.close()
+            rc = tracing.wait_child(proc, sp)
+        else:
+            rc = LAUNCH_FAILED_RC
         lf.write(f"\n[Return code: {rc}]\n")
+    if analyser is not None:
+        analyser.finish()
+    extra = {"return_code": rc, "wall_time": time.time() - start_t}
+    if watchdog is not None and watchdog.reason:
+        extra.update(watchdog=watchdog.reason, watchdog_detail=watchdog.detail)
+    summary = metrics.close(**extra)
+    if summary["parts"]:
+        print(f"  Solver metrics: {summary['parts']} part(s), {summary['steps_per_s']:.0f} steps/s, "
+              f"{summary['sim_per_wall']:.4f} sim-s/wall-s, {summary['particles_out']} particle(s) out "
+              f"-> {metrics.path}")
 
     print(f"\nDualSPHysics return code: {rc}")
     if rc != 0:
         print(f"!! Solver failed for {case_dir.name}. Check {dual_log} for details.")
-    return out_dir
+    return out_dir, rc
 def ensure_vtk_with_partvtk(out_dir: Path, case_base: str):
     """
     If the solver produced BINX but no VTK, run PartVTK to convert BINX->VTK.
+    Returns PartVTK's return code (0 if there was nothing to convert,
+    LAUNCH_FAILED_RC if PartVTK is missing or cannot be started).
     """
     vtks = glob.glob(str(out_dir / "*.vtk"))
     if vtks:
         print(f"VTK check: found {len(vtks)} file(s).")
-        return
+        return 0
     binx = sorted(glob.glob(str(out_dir / "*.binx")))
     if not binx:
         print("No VTKs and no BINX found to convert. Skipping PartVTK.")
-        return
+        return 0
     exe = Path(PARTVTK_EXE)
     if not exe.exists():
         print(f"PartVTK not found at {exe}. Cannot convert BINX->VTK.")
-        return
+        return LAUNCH_FAILED_RC
     cmd = [str(exe), str(out_dir), case_base, str(out_dir), "-savevtk"]
     print("\n> Converting BINX->VTK with PartVTK (streaming):\n", " ".join([f'"{c}"' if " " in c else c for c in cmd]))
-    rc = stream_run(cmd, cwd=out_dir)
+    try:
+        rc = stream_run(cmd, cwd=out_dir)
+    except OSError as e:
+        print(f"!! Could not start PartVTK: {e}")
+        return LAUNCH_FAILED_RC
     print("\nPartVTK return code:", rc)
     after_vtks = glob.glob(str(out_dir / "*.vtk"))
     print(f"PartVTK VTK files: {len(after_vtks)}")
-def main():
-    print("=== SPH batch runner ===")
-    print("Changes:")
-    print("  - Enhanced XML dp injection at multiple locations")
-    print("  - Explicit -dp flag passed to GenCase command line")
-    print("  - Post-GenCase verification of actual dp used")
-    print("=" * 60)
-    xml_path_in = input("\nPath to *_Def.xml (e.g., C:\\Users\\you\\Autoslosh_Def.xml): ").strip('" ').strip()
-    if not xml_path_in:
-        print("No XML path provided.")
-        sys.exit(1)
-    xml_path = Path(xml_path_in)
-    if not xml_path.exists():
-        print(f"XML not found: {xml_path}")
-        sys.exit(1)    
+    return rc
+# ---------------------------------------------------------------------------
+# Output retention: binary-only solves, on-demand VTK, disk quota.
+# ---------------------------------------------------------------------------
+
+# Solver save flags per output policy. "binary" keeps only the Part_????.bi4
+# files; VTK is produced later by materialise_vtk() for the Parts needed.
+OUTPUT_POLICIES = {
+    "full":   ["-sv:binx,vtk", "-svdomainvtk:1", "-svnormals:1", "-svres"],
+    "binary": ["-sv:binx", "-svdomainvtk:0", "-svnormals:0", "-svres"],
+}
+ARCHIVE_NAME = "data.tar.xz"
+
+def part_times(variant_dir: Path):
+    """
+    {part number: simulated time} from logs/metrics.jsonl (Part 0 is t=0).
+    """
+    times = {0: 0.0}
+    metrics = variant_dir / "logs" / "metrics.jsonl"
+    if metrics.exists():
+        with metrics.open("r", encoding="utf-8") as fh:
+            for line in fh:
+                if '"kind": "part"' in line:
+                    rec = json.loads(line)
+                    times[rec["part"]] = rec["part_time"]
+    return times
+
+def restore_archived_output(variant_dir: Path):
+    archive = variant_dir / "out" / ARCHIVE_NAME
+    if archive.exists():
+        print(f"  Unpacking {archive} ...")
+        shutil.unpack_archive(str(archive), str(variant_dir / "out"))
+        archive.unlink()
+
+def select_parts(variant_dir: Path, t_start=None, t_end=None, stride=1):
+    """
+    Part numbers present in out/data within [t_start, t_end], every stride-th.
+    """
+    data_dir = variant_dir / "out" / "data"
+    numbers = sorted(int(p.stem.split("_")[1]) for p in data_dir.glob("Part_[0-9][0-9][0-9][0-9]*.bi4"))
+    times = part_times(variant_dir)
+    keep = [n for n in numbers
+            if (t_start is None or times.get(n, float("inf")) >= t_start)
+            and (t_end is None or times.get(n, float("-inf")) <= t_end)]
+    return keep[::max(1, int(stride))]
+
+def _link_or_copy(src: Path, dst: Path):
     try:
-        tree_orig, cleaned, preclean_bak = load_xml_with_sanitize(xml_path)
-        if cleaned:
-            print(f"Note: XML had leading junk; cleaned and saved. Backup at: {preclean_bak}")                
-        root_check = tree_orig.getroot()
-        constants_check = root_check.find(".//execution/constants")
-        if constants_check is None:
-            print("\n⚠ WARNING: Your original XML is missing <execution><constants> section!")
-            print("  This will cause DualSPHysics to fail.")
-            print("  The script will attempt to create a minimal constants section.")
-            print("  You may need to add proper constants manually to your original XML.")
-            response = input("\n  Continue anyway? (yes/no) [no]: ").strip().lower()
-            if not response.startswith('y'):
-                print("Aborting.")
-                sys.exit(0)        
-    except ET.ParseError as e:
-        print("ERROR: Cannot parse XML even after sanitize attempt:", e)
-        sys.exit(2)  
-    print("\n--- Parameter Sweep Configuration ---")
-    dp_list = parse_list_or_single("Dp (m) list (comma-separated)", 0.01)
-    t_list  = parse_list_or_single("Simulation duration TimeMax (s) list (-1 keeps case default)", -1)
-    unit    = get_choice("Amplitude units (degrees/radians)", "degrees")
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
 
-    freq_list  = parse_list_or_single("Frequency (Hz) list (leave blank to use ω)", "")
-    if len(freq_list) == 1 and freq_list[0] == 0.0:
-        freq_list = []
-    omega_list = parse_list_or_single("Angular velocity ω (rad/s) list (leave blank to use f)", "")
-    if len(omega_list) == 1 and omega_list[0] == 0.0:
-        omega_list = []
-    ampl_list  = parse_list_or_single(f"Amplitude values list ({unit})", 8.0)
-    if omega_list and not freq_list:
-        freq_list = [w/(2*pi) for w in omega_list]
-    if not freq_list:
-        freq_list = [0.5]  
-    combos = list(itertools.product(dp_list, t_list, freq_list, ampl_list))
-    print(f"\nPlanned runs: {len(combos)} combination(s).")
-    print(f"Total variants to generate: {len(combos)}")
-    base = xml_path.stem
-    case_dir = xml_path.parent
-    if base.endswith("_Def"):
-        base = base[:-4]
-    print(f"Base case name: {base}")
-    print(f"Case directory: {case_dir}")
-    run_solver = (input("\nRun DualSPHysics automatically for each variant? (yes/no) [yes]: ").strip().lower() or "yes").startswith("y")
-    mode       = (input("Run mode: cpu/gpu [cpu]: ").strip().lower() or "cpu")
-    print("\n" + "="*60)
-    print("Starting batch generation...")
-    print("="*60 + "\n")
-    completed, total = 0, 0.0
-    for (dp, t_end, f_in, ampl_val) in combos:
-        start_t = time.time()
-        tag_dp = safe_val_tag("dp", dp)
-        tag_t  = safe_val_tag("t", t_end)
-        tag_f  = safe_val_tag("f", f_in)
-        tag_a  = safe_val_tag("a", ampl_val, "deg" if unit == "degrees" else "rad")
-        variant_name = "__".join([tag_dp, tag_t, tag_f, tag_a])
-        variant_dir = case_dir / f"{base}__{variant_name}"
-        variant_dir.mkdir(exist_ok=True)
-        print(f"\n{'='*60}")
-        print(f"Processing: {variant_name}")
-        print(f"{'='*60}")
-        xml_variant_def = variant_dir / f"{base}_Def.xml"
-        clone = clone_tree(tree_orig)
-        clone.write(xml_variant_def, encoding="utf-8", xml_declaration=True)
-        ensure_case_assets_without_xml(case_dir, variant_dir)
-        upd_tree, _, _ = load_xml_with_sanitize(xml_variant_def)
-        preserve_critical_xml_sections(upd_tree, tree_orig)
-        print(f"\nApplying parameter updates for {variant_name}:")
-        dp_set = update_dp(upd_tree, dp)
-        if t_end >= 0:
-            update_time_max(upd_tree, t_end)
-        else:
-            print(f"  * Keeping default TimeMax (user specified {t_end})")
-            
-        mvupd = update_mvrotsinu(
-            upd_tree,
-            freq_hz   = f_in,
-            ampl_val  = ampl_val,
-            unit      = unit,
-            duration  = t_end if t_end >= 0 else -1
-        )
-        backup = write_tree_with_backup(upd_tree, xml_variant_def)
-        print(f"  Saved {xml_variant_def.name} (backup: {backup.name})")
-        xml_for_gencase = variant_dir / f"{base}.xml"
-        upd_tree.write(xml_for_gencase, encoding="utf-8", xml_declaration=True)
-        print(f"  Saved {xml_for_gencase.name} (for GenCase)")
-        rt_check = upd_tree.getroot()
-        constants_check = rt_check.find(".//execution/constants")
-        if constants_check is None:
-            print("  ⚠ WARNING: <execution><constants> section is MISSING!")
-            print("             DualSPHysics will fail. Check your original XML.")
-        else:
-            print(f"  ✓ Constants section exists with {len(list(constants_check))} child elements")
-        rt = upd_tree.getroot()
+def _partvtk_chunk(exe: Path, data_dir: Path, chunk_dir: Path, vtk_dir: Path, parts, log_path: Path):
+    """
+    PartVTK over exactly `parts`: a private input folder with links to
+    Part_Head and the selected Part files.
+    """
+    shutil.rmtree(chunk_dir, ignore_errors=True)
+    chunk_dir.mkdir(parents=True)
+    for name in ["Part_Head.ibi4"] + [f"Part_{n:04d}.bi4" for n in parts]:
+        src = data_dir / name
+        if src.exists():
+            _link_or_copy(src, chunk_dir / name)
+    cmd = [str(exe), "-dirin", str(chunk_dir), "-savevtk", str(vtk_dir / "PartFluid"), "-onlytype:-all,+fluid"]
+    with log_path.open("w", encoding="utf-8") as lf, tracing.process_span(cmd, parts=len(parts)) as sp:
+        rc = tracing.wait_child(subprocess.Popen(cmd, cwd=str(chunk_dir), stdout=lf, stderr=subprocess.STDOUT), sp)
+    shutil.rmtree(chunk_dir, ignore_errors=True)
+    return rc
+
+def materialise_vtk(variant_dir: Path, t_start=None, t_end=None, stride=1, workers=None):
+    """
+    Writes out/vtk/PartFluid_????.vtk for the selected Parts, running PartVTK
+    on several Part ranges at once. Parts that already have a VTK are
+    skipped. Returns the number of Parts that got a VTK; Parts of a failed
+    PartVTK run are not counted.
+    """
+    exe = Path(PARTVTK_EXE)
+    if not exe.exists():
+        print(f"PartVTK not found at {exe}. Cannot materialise VTK.")
+        return 0
+    variant_dir = Path(variant_dir).resolve()
+    restore_archived_output(variant_dir)
+    data_dir = variant_dir / "out" / "data"
+    vtk_dir = variant_dir / "out" / "vtk"
+    vtk_dir.mkdir(parents=True, exist_ok=True)
+    parts = [n for n in select_parts(variant_dir, t_start, t_end, stride)
+             if not (vtk_dir / f"PartFluid_{n:04d}.vtk").exists()]
+    if not parts:
+        print(f"  {variant_dir.name}: requested VTK already present")
+        return 0
+    workers = max(1, min(workers or os.cpu_count() or 1, len(parts)))
+    # Contiguous Part ranges (sizes differ by at most one): each PartVTK
+    # process then reads neighbouring files instead of every workers-th one.
+    size, extra = divmod(len(parts), workers)
+    bounds = [i * size + min(i, extra) for i in range(workers + 1)]
+    chunks = [parts[lo:hi] for lo, hi in zip(bounds, bounds[1:])]
+    start_t = time.time()
+    logs_dir = variant_dir / "logs"
+    logs_dir.mkdir(exist_ok=True)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_partvtk_chunk, exe, data_dir, variant_dir / "out" / f".vtkchunk{i}", vtk_dir,
+                               chunk, logs_dir / f"partvtk_{i}.log")
+                   for i, chunk in enumerate(chunks)]
+        rcs = [f.result() for f in futures]
+    bad = sum(1 for rc in rcs if rc != 0)
+    missing = [n for n in parts if not (vtk_dir / f"PartFluid_{n:04d}.vtk").exists()]
+    print(f"  {variant_dir.name}: {len(parts) - len(missing)} Part(s) -> VTK in {time.time() - start_t:.1f}s "
+          f"({workers} PartVTK process(es){f', {bad} failed' if bad else ''}) -> {vtk_dir}")
+    if missing:
+        print(f"  !! {len(missing)} Part(s) got no VTK (Parts {missing[0]}-{missing[-1]}); see logs/partvtk_*.log")
+    return len(parts) - len(missing)
+
+def _dir_bytes(path: Path, seen=None):
+    """
+    Bytes of the regular files under path. Hardlinked files (prefix views,
+    staged data/) count once per seen set of inodes.
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    for f in path.rglob("*"):
+        if f.is_file() and not f.is_symlink():
+            st = f.stat()
+            if (st.st_dev, st.st_ino) not in seen:
+                seen.add((st.st_dev, st.st_ino))
+                total += st.st_size
+    return total
 
-        def _first(root, xps, attr=None):
-            for xp in xps:
-                node = root.find(xp)
-                if node is None:
+def enforce_quota(case_dir: Path, base: str, quota_bytes, protect=(), archive=True):
+    """
+    Keeps the variant folders of a sweep under quota_bytes, oldest finished
+    variants first: drop VTK (regenerable from the .bi4 files), then, with
+    archive, pack out/data into out/data.tar.xz. Variants named in protect,
+    variants without a finished solver run, and prefix views (their files
+    are links into the parent run) are never touched.
+    """
+    with tracing.span("quota", "scan"):
+        variants = []
+        for variant_dir in case_dir.glob(f"{base}__*"):
+            name = variant_dir.name.split("__", 1)[1]
+            metrics = variant_dir / "logs" / "metrics.jsonl"
+            if name in protect or is_prefix_view(variant_dir) or not read_solver_summary(variant_dir):
+                continue
+            variants.append((metrics.stat().st_mtime, variant_dir))
+        variants.sort()
+        seen = set()
+        total = sum(_dir_bytes(d, seen) for d in case_dir.glob(f"{base}__*"))
+        freed, actions = 0, []
+        tiers = [("vtk", lambda d: list(d.glob("out/*.vtk")) + list(d.glob("out/vtk/*.vtk")))]
+        if archive:
+            tiers.append(("archive", lambda d: [] if (d / "out" / ARCHIVE_NAME).exists() else [d / "out" / "data"]))
+        for tier, targets in tiers:
+            for _, variant_dir in variants:
+                if total - freed <= quota_bytes:
+                    break
+                paths = [p for p in targets(variant_dir) if p.exists()]
+                if not paths:
                     continue
-                if attr:
-                    if attr in node.attrib:
-                        return node.attrib[attr]
+                if tier == "vtk":
+                    size = sum(p.stat().st_size for p in paths)
+                    for p in paths:
+                        p.unlink()
+                else:
+                    data_dir = paths[0]
+                    # Files still linked from a prefix view stay on disk.
+                    size = sum(f.stat().st_size for f in data_dir.rglob("*") if f.is_file() and f.stat().st_nlink == 1)
+                    archive_path = shutil.make_archive(str(variant_dir / "out" / "data"), "xztar",
+                                                       root_dir=str(variant_dir / "out"), base_dir="data")
+                    shutil.rmtree(data_dir)
+                    size -= Path(archive_path).stat().st_size
+                freed += size
+                actions.append((tier, variant_dir.name, size))
+        for tier, name, size in actions:
+            print(f"  Quota: {'dropped VTK of' if tier == 'vtk' else 'archived out/data of'} {name} "
+                  f"({size / 1024**2:.1f} MiB)")
+        used = total - freed
+        print(f"Disk quota: {used / 1024**3:.2f} of {quota_bytes / 1024**3:.2f} GiB used by {base}__* "
+              f"({freed / 1024**2:.1f} MiB freed){'  ⚠ still over quota' if used > quota_bytes else ''}")
+        return freed
+
+# ---------------------------------------------------------------------------
+# Headless PNG frames (render.py): particles coloured by a scalar, no VTK.
+# ---------------------------------------------------------------------------
+
+RENDER_DEFAULTS = {"scalar": "vel", "width": 1200, "cmap": "coolwarm", "t_start": None, "t_end": None,
+                   "stride": 1, "workers": None, "tile": None, "shared_scale": True}
+# Position of each parameter's tag in a variant name, for tiling by parameter.
+VARIANT_NAME_FIELDS = {"dp": 1, "t_end": 2, "freq": 3, "ampl": 4}
+
+def render_variants(variant_dirs, out_dir: Path = None, tile=False, **opts):
+    """
+    PNG frames of the Parts selected (as for --vtk) in each variant. Each
+    variant gets a fixed camera and colour scale over all its frames. By
+    default they go to <variant>/out/frames/<scalar>_<part>.png; with tile
+    the variants are drawn side by side on a common time axis (warm-start
+    offsets removed) into out_dir/frame_####.png. Returns the PNG paths.
+    """
+    try:
+        import render
+    except ImportError as e:
+        print(f"  !! Rendering skipped (numpy missing?): {e}")
+        return []
+    opts = dict(RENDER_DEFAULTS, **opts)
+    workers = opts["workers"] or os.cpu_count() or 1
+    runs = []
+    for variant_dir in variant_dirs:
+        variant_dir = Path(variant_dir).resolve()
+        restore_archived_output(variant_dir)
+        parts = select_parts(variant_dir, opts["t_start"], opts["t_end"], opts["stride"])
+        if not parts:
+            print(f"  {variant_dir.name}: no Parts to render")
+            continue
+        try:
+            with tracing.span("render.scan", variant=variant_dir.name, parts=len(parts)):
+                runs.append((variant_dir, render.scan_run(
+                    variant_dir / "out" / "data", parts, opts["scalar"], width=opts["width"], cmap=opts["cmap"],
+                    workers=workers, t_offset=warm_start_offset(variant_dir),
+                    label=variant_dir.name.split("__", 1)[-1])))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"  !! {variant_dir.name}: cannot render: {e}")
+    if not runs:
+        return []
+    if tile:
+        jobs = render.frame_jobs([run for _, run in runs], out_dir, shared_scale=opts["shared_scale"])
+    else:
+        jobs = [job for variant_dir, run in runs
+                for job in render.frame_jobs([run], variant_dir / "out" / "frames", prefix=opts["scalar"])]
+    start_t = time.time()
+    with tracing.span("render.frames", frames=len(jobs)):
+        paths = render.render_frames(jobs, workers=workers)
+    where = out_dir if tile else "out/frames/"
+    print(f"  Rendered {len(paths)} frame(s) of {len(runs)} variant(s) coloured by {opts['scalar']} "
+          f"in {time.time() - start_t:.1f}s ({workers} process(es)) -> {where}")
+    return paths
+
+def render_sweep(case_dir: Path, base: str, combos, unit, render_cfg):
+    """
+    Frames for every variant of combos with particle output. With
+    render_cfg["tile"] = "dp" (or "t_end", "freq", "ampl"), variants that
+    differ only in that parameter are tiled together into
+    <base>_frames_<scalar>/<group>/.
+    """
+    opts = dict(RENDER_DEFAULTS, **(render_cfg if isinstance(render_cfg, dict) else {}))
+    dirs = [d for d in dict.fromkeys(case_dir / f"{base}__{variant_name_for(*c, unit)}" for c in combos)
+            if (d / "out" / "data").is_dir() or (d / "out" / ARCHIVE_NAME).exists()]
+    if not dirs:
+        return []
+    print(f"\nRendering frames of {len(dirs)} variant(s):")
+    by = opts.pop("tile")
+    if not by:
+        return render_variants(dirs, **opts)
+    if by not in VARIANT_NAME_FIELDS:
+        print(f"  !! Unknown render tile {by!r} (expected {'/'.join(VARIANT_NAME_FIELDS)}), rendering untiled")
+        return render_variants(dirs, **opts)
+    groups = {}
+    for d in dirs:
+        fields = d.name.split("__")
+        del fields[VARIANT_NAME_FIELDS[by]]
+        groups.setdefault("__".join(fields[1:]), []).append(d)
+    root = case_dir / f"{base}_frames_{opts['scalar']}"
+    return [p for name, group in groups.items()
+            for p in render_variants(group, out_dir=root / f"{name}__by-{by}", tile=True, **opts)]
+
+# ---------------------------------------------------------------------------
+# Zero-copy staging of data/ into variant folders.
+# ---------------------------------------------------------------------------
+
+STAGING_MODES = ("auto", "reflink", "hardlink", "symlink", "copy")
+FICLONE = 0x40049409  # Linux ioctl: share extents copy-on-write (btrfs, XFS, ...)
+
+def _reflink(src: Path, dst: Path):
+    import fcntl
+    with src.open("rb") as fs, dst.open("wb") as fd:
+        fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+    shutil.copystat(src, dst)
+
+class AssetStager:
+    """
+    Puts the case's data/ files into each variant folder without copying
+    bytes where the filesystem allows: reflink, then hardlink, then symlink,
+    then a plain copy ("auto"), or one fixed method. The sources are
+    fingerprinted once (size, mtime, sha256) and re-checked before every
+    variant, so an asset edited during a sweep is noticed and re-staged.
+    Staged files are shared with data/ and must be treated as read-only.
+    """
+    def __init__(self, case_dir: Path, mode="auto"):
+        if mode not in STAGING_MODES:
+            raise ValueError(f"staging mode must be one of {', '.join(STAGING_MODES)}")
+        self.src_dir = case_dir / "data"
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._methods = ["reflink", "hardlink", "symlink", "copy"] if mode == "auto" else [mode, "copy"]
+        self._failed = set()
+        self.counts = {}
+        self.bytes = {}
+        self.reused = 0
+        self.seconds = 0.0
+        self.copy_seconds = 0.0
+        self.manifest = self._scan()
+
+    def _scan(self):
+        manifest = {}
+        if self.src_dir.is_dir():
+            for f in sorted(p for p in self.src_dir.rglob("*") if p.is_file()):
+                st = f.stat()
+                manifest[f.relative_to(self.src_dir).as_posix()] = (st.st_size, st.st_mtime_ns, sha256_file(f))
+        return manifest
+
+    @property
+    def digest(self):
+        h = hashlib.sha256()
+        for rel, (_, _, sha) in sorted(self.manifest.items()):
+            h.update(f"{rel}\0{sha}\0".encode())
+        return h.hexdigest()
+
+    def verify_sources(self):
+        """
+        Cheap stat check of data/ against the manifest; anything that moved
+        is re-hashed. Returns the relative paths whose content changed.
+        """
+        changed = []
+        current = set()
+        for f in (p for p in self.src_dir.rglob("*") if p.is_file()) if self.src_dir.is_dir() else ():
+            rel = f.relative_to(self.src_dir).as_posix()
+            current.add(rel)
+            st = f.stat()
+            known = self.manifest.get(rel)
+            if known is not None and known[:2] == (st.st_size, st.st_mtime_ns):
+                continue
+            sha = sha256_file(f)
+            if known is None or known[2] != sha:
+                changed.append(rel)
+            self.manifest[rel] = (st.st_size, st.st_mtime_ns, sha)
+        for rel in set(self.manifest) - current:
+            del self.manifest[rel]
+            changed.append(rel)
+        return changed
+
+    def _is_current(self, src: Path, dst: Path, size, mtime_ns):
+        try:
+            if dst.is_symlink():
+                return dst.resolve() == src.resolve()
+            st = dst.stat()
+        except OSError:
+            return False
+        src_st = src.stat()
+        if (st.st_dev, st.st_ino) == (src_st.st_dev, src_st.st_ino):
+            return True
+        return (st.st_size, st.st_mtime_ns) == (size, mtime_ns)
+
+    def _place(self, src: Path, dst: Path):
+        for method in self._methods:
+            if method in self._failed:
+                continue
+            try:
+                if method == "reflink":
+                    _reflink(src, dst)
+                elif method == "hardlink":
+                    os.link(src, dst)
+                elif method == "symlink":
+                    os.symlink(src.resolve(), dst)
                 else:
-                    if "v" in node.attrib:
-                        return node.attrib["v"]
-                    val = (node.text or "").strip()
-                    if val:
-                        return val
+                    t0 = time.perf_counter()
+                    shutil.copy2(src, dst)
+                    self.copy_seconds += time.perf_counter() - t0
+                return method
+            except (OSError, ImportError, NotImplementedError):
+                # Not supported here (other device, filesystem, OS, privileges):
+                # don't try this method again for the rest of the sweep.
+                with self._lock:
+                    self._failed.add(method)
+                if dst.exists() or dst.is_symlink():
+                    dst.unlink()
+        raise OSError(f"could not stage {src} -> {dst}")
+
+    def stage(self, variant_dir: Path):
+        start = time.perf_counter()
+        with self._lock:
+            changed = self.verify_sources()
+            manifest = dict(self.manifest)
+        if changed:
+            print(f"  ! data/ changed since the sweep started: {', '.join(sorted(changed)[:5])}"
+                  f"{' ...' if len(changed) > 5 else ''} (re-staging)")
+        dst_dir = variant_dir / "data"
+        for rel, (size, mtime_ns, _) in manifest.items():
+            src, dst = self.src_dir / rel, dst_dir / rel
+            if rel not in changed and self._is_current(src, dst, size, mtime_ns):
+                with self._lock:
+                    self.reused += 1
+                continue
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            if dst.exists() or dst.is_symlink():
+                dst.unlink()
+            method = self._place(src, dst)
+            with self._lock:
+                self.counts[method] = self.counts.get(method, 0) + 1
+                self.bytes[method] = self.bytes.get(method, 0) + size
+        with self._lock:
+            self.seconds += time.perf_counter() - start
+
+    def _copy_rate(self):
+        """
+        Bytes/s of a plain copy on this filesystem: measured from the copies
+        made, else by copying the largest asset once.
+        """
+        copied = self.bytes.get("copy", 0)
+        if copied and self.copy_seconds > 0:
+            return copied / self.copy_seconds
+        if not self.manifest:
             return None
-        dp_echo = None
-        gdef = rt.find(".//geometry/definition")
-        if gdef is not None:
-            dp_echo = gdef.attrib.get("dp")
-        if dp_echo is None:
-            p_dp = rt.find(".//execution/parameters/parameter[@key='Dp']") \
-                or rt.find(".//execution/parameters/parameter[@key='dp']")
-            if p_dp is not None:
-                dp_echo = p_dp.attrib.get("value")
-        tmax_echo = None
-        tm_node = rt.find(".//execution/parameters/parameter[@key='TimeMax']") \
-            or rt.find(".//execution/parameters/parameter[@key='timemax']")
-        if tm_node is not None:
-            tmax_echo = tm_node.attrib.get("value")
-        if tmax_echo is None:
-            tmax_echo = _first(rt, [".//tmax", ".//time//tmax", ".//simulation//tmax"])
-        vres_echo = None
-        vres_node = rt.find(".//execution/parameters/parameter[@key='VResId']") \
-            or rt.find(".//execution/parameters/parameter[@key='vresid']")
-        if vres_node is not None:
-            vres_echo = vres_node.attrib.get("value")
-        mv_node   = rt.find(".//mvrotsinu")
-        unit_echo = mv_node.attrib.get("anglesunits") if mv_node is not None else None
-        freq_echo = _first(rt, [".//mvrotsinu/freq"])
-        ampl_echo = _first(rt, [".//mvrotsinu/ampl"])
-        print(f"\n  XML Verification:")
-        print(f"    Dp: {dp_echo}")
-        print(f"    TimeMax: {tmax_echo}")
-        print(f"    VResId: {vres_echo}")
-        print(f"    Motion unit: {unit_echo}")
-        print(f"    Frequency: {freq_echo} Hz")
-        print(f"    Amplitude: {ampl_echo} {unit_echo}")
-        ok = run_gencase(variant_dir, base, dp=dp)
-        if not ok:
-            print(f"\n[{variant_name}] GenCase FAILED, skipping solver for this combo.")
-            elapsed = time.time() - start_t
-            completed += 1
-            total += elapsed
-            avg = total / completed
-            remaining = len(combos) - completed
-            print(f"[{variant_name}] Elapsed {elapsed:.1f}s • Done {completed}/{len(combos)} • Avg ~{avg:.1f}s • Remaining ~{avg*remaining:.1f}s")
+        rel = max(self.manifest, key=lambda r: self.manifest[r][0])
+        probe = self.src_dir.parent / f".stage-probe-{os.getpid()}"
+        t0 = time.perf_counter()
+        shutil.copyfile(self.src_dir / rel, probe)
+        elapsed = time.perf_counter() - t0
+        probe.unlink()
+        return self.manifest[rel][0] / elapsed if elapsed > 0 else None
+
+    def summary(self):
+        saved = sum(b for m, b in self.bytes.items() if m != "copy")
+        methods = ", ".join(f"{n} {m}" for m, n in sorted(self.counts.items())) or "nothing new"
+        line = (f"Asset staging ({self.mode}): {methods}, {self.reused} already in place • "
+                f"{saved / 1024**2:.1f} MiB not copied • {self.seconds:.1f}s staging")
+        rate = self._copy_rate() if saved else None
+        if rate:
+            saved_s = saved / rate
+            shown = f"{saved_s:.1f}s" if saved_s < 60 else format_duration(saved_s)
+            line += f" • ~{shown} of copying saved ({rate / 1024**2:.0f} MiB/s)"
+        return line
+
+# ---------------------------------------------------------------------------
+# Content-addressed GenCase cache. Particle geometry depends only on the
+# geometry part of the XML, dp, data/ assets and the GenCase build, so
+# frequency/amplitude/TimeMax variants can share one GenCase run.
+# ---------------------------------------------------------------------------
+
+GENCASE_CACHE_DIRNAME = ".gencase_cache"
+_file_hash_memo = {}
+
+def sha256_file(path: Path) -> str:
+    st = path.stat()
+    # Keyed on the inode where there is one, so hardlinked/symlinked staged
+    # assets are hashed once per sweep rather than once per variant.
+    memo_key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns) if st.st_ino else (str(path), st.st_size, st.st_mtime_ns)
+    digest = _file_hash_memo.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with path.open("rb") as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _file_hash_memo[memo_key] = digest
+    return digest
+
+def _canonical_xml(node, h):
+    h.update(node.tag.encode())
+    for k in sorted(node.attrib):
+        if k == "comment":
             continue
-        if run_solver:
-            out_folder = run_dual(variant_dir, base, mode=mode)
-            ensure_vtk_with_partvtk(out_folder, base)
-        elapsed = time.time() - start_t
-        completed += 1
-        total += elapsed
-        avg = total / completed
-        remaining = len(combos) - completed
-        print(f"\n[{variant_name}] ✓ COMPLETE")
-        print(f"  Elapsed: {elapsed:.1f}s")
-        print(f"  Progress: {completed}/{len(combos)}")
-        print(f"  Average time per variant: {avg:.1f}s")
-        print(f"  Estimated remaining: {avg*remaining:.1f}s")
-    print("\n" + "="*60)
-    print("ALL VARIANTS COMPLETE!")
-    print("="*60)
-    print(f"Total variants processed: {completed}")
-    print(f"Total time: {total:.1f}s ({total/60:.1f} minutes)")
-    print(f"Average per variant: {total/completed:.1f}s")
-    print("\nNext steps:")
-    print("  1. Check the logs/ folder in each variant for solver output")
-    print("  2. Open ParaView and load the .vtk files from out/ folders")
-    print("  3. Compare particle spacing visually between different dp values")
-    print("  4. If dp still doesn't change, check Run.out files for warnings")
+        h.update(f"|{k}={node.attrib[k]}".encode())
+    h.update(f"|t={(node.text or '').strip()}".encode())
+    for child in node:
+        h.update(b"<")
+        _canonical_xml(child, h)
+        h.update(b">")
+
+def geometry_hash(tree: ET.ElementTree) -> str:
+    """
+    Hash of the XML with the per-variant motion/time settings stripped out
+    (mvrotsinu freq/ampl/duration/anglesunits, its motion start time and
+    the TimeMax parameter).
+    """
+    root = clone_tree(tree).getroot()
+    for b in motion_begin_nodes(root):
+        b.attrib.pop("start", None)
+    for mv in root.iter("mvrotsinu"):
+        for attr in ("duration", "anglesunits"):
+            mv.attrib.pop(attr, None)
+        for child in list(mv):
+            if child.tag in ("freq", "ampl"):
+                mv.remove(child)
+    for params in root.iter("parameters"):
+        for p in list(params):
+            if p.attrib.get("key", "").lower() == "timemax":
+                params.remove(p)
+    h = hashlib.sha256()
+    _canonical_xml(root, h)
+    return h.hexdigest()
+
+def assets_hash(data_dir: Path) -> str:
+    h = hashlib.sha256()
+    if data_dir.is_dir():
+        for f in sorted(p for p in data_dir.rglob("*") if p.is_file()):
+            h.update(f.relative_to(data_dir).as_posix().encode())
+            h.update(sha256_file(f).encode())
+    return h.hexdigest()
+
+def gencase_version_id() -> str:
+    exe = Path(GENCASE_EXE)
+    return sha256_file(exe) if exe.exists() else "missing"
+
+def _dir_snapshot(case_dir: Path):
+    snap = {}
+    for p in case_dir.iterdir():
+        if p.is_file():
+            snap[p.name] = p.stat().st_mtime_ns
+    return snap
+
+def patch_motion_and_time(xml_path: Path, t_end, f_in, ampl_val, unit, t_start=0.0):
+    tree, _, _ = load_xml_with_sanitize(xml_path)
+    if t_end >= 0:
+        update_time_max(tree, t_start + t_end)
+    update_mvrotsinu(tree, freq_hz=f_in, ampl_val=ampl_val, unit=unit, duration=t_end if t_end >= 0 else -1)
+    if t_start:
+        update_motion_start(tree, t_start)
+    tree.write(xml_path, encoding="utf-8", xml_declaration=True)
+
+class GenCaseCache:
+    """
+    GenCase outputs stored under <case>/.gencase_cache/<key>/ with an
+    entry.json each. Evicts least-recently-used entries once the cache
+    grows past max_bytes. Safe to share between scheduler threads: an
+    entry is only restored or evicted under its key lock, and eviction
+    skips entries another thread is using.
+    """
+    def __init__(self, cache_dir: Path, max_bytes=20 * 1024**3):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def key_for(self, variant_dir: Path, base: str, dp: float) -> str:
+        tree, _, _ = load_xml_with_sanitize(variant_dir / f"{base}.xml")
+        h = hashlib.sha256()
+        for part in (geometry_hash(tree), f"dp={dp:g}", assets_hash(variant_dir / "data"), gencase_version_id()):
+            h.update(part.encode())
+            h.update(b"\0")
+        return h.hexdigest()[:32]
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.RLock())
+
+    def _read_entry(self, entry_dir: Path):
+        try:
+            return json.loads((entry_dir / "entry.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _touch(self, entry_dir: Path, meta):
+        meta["last_used"] = time.time()
+        (entry_dir / "entry.json").write_text(json.dumps(meta, indent=1), encoding="utf-8")
+
+    def restore(self, key, variant_dir: Path):
+        entry_dir = self.cache_dir / key
+        with self._key_lock(key):
+            meta = self._read_entry(entry_dir)
+            if meta is None:
+                return None
+            try:
+                for name in meta["files"]:
+                    shutil.copy2(entry_dir / name, variant_dir / name)
+                self._touch(entry_dir, meta)
+            except FileNotFoundError:
+                # Evicted by another process sharing the case dir: a miss.
+                return None
+            return meta
+
+    def store(self, key, variant_dir: Path, files, dp):
+        entry_dir = self.cache_dir / key
+        tmp_dir = self.cache_dir / f".tmp-{key}-{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir()
+        size = 0
+        for name in files:
+            shutil.copy2(variant_dir / name, tmp_dir / name)
+            size += (tmp_dir / name).stat().st_size
+        meta = {"key": key, "dp": dp, "files": sorted(files), "bytes": size, "created": time.time()}
+        self._touch(tmp_dir, meta)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        try:
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            # Another process (or host, on a shared case dir) stored it first.
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        with self._lock:
+            entries = []
+            for entry_dir in self.cache_dir.iterdir():
+                if not entry_dir.is_dir() or entry_dir.name.startswith(".tmp-") or entry_dir.name == keep:
+                    continue
+                meta = self._read_entry(entry_dir)
+                if meta is not None:
+                    entries.append((meta.get("last_used", 0), meta.get("bytes", 0), entry_dir))
+            total = sum(e[1] for e in entries)
+            if keep is not None:
+                total += (self._read_entry(self.cache_dir / keep) or {}).get("bytes", 0)
+            for _, size, entry_dir in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                key_lock = self._key_locks.setdefault(entry_dir.name, threading.RLock())
+                if not key_lock.acquire(blocking=False):
+                    continue  # being restored or stored right now
+                try:
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                finally:
+                    key_lock.release()
+                total -= size
+                self.evictions += 1
+
+    def total_bytes(self):
+        return sum(f.stat().st_size for f in self.cache_dir.rglob("*") if f.is_file())
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = 100.0 * self.hits / lookups if lookups else 0.0
+        return (f"GenCase cache: {self.hits} hit(s), {self.misses} miss(es) ({rate:.0f}% hit rate), "
+                f"{self.evictions} eviction(s), {self.total_bytes()/1024**2:.1f} MiB on disk")
+
+def run_gencase_cached(cache: GenCaseCache, variant_dir: Path, base: str, dp, t_end, f_in, ampl_val, unit,
+                       t_start=0.0):
+    """
+    run_gencase() through the cache. On a hit the cached .bi4/solver XML are
+    copied in and only TimeMax and the mvrotsinu block are re-patched.
+    """
+    with tracing.span("gencase.key", variant=variant_dir.name):
+        key = cache.key_for(variant_dir, base, dp)
+    with cache._key_lock(key):
+        with tracing.span("gencase.restore", variant=variant_dir.name) as sp:
+            meta = cache.restore(key, variant_dir)
+            sp.set(hit=meta is not None)
+        if meta is not None:
+            with cache._lock:
+                cache.hits += 1
+            print(f"\n> GenCase cache HIT ({key}): reusing {len(meta['files'])} file(s) from dp={meta['dp']:g} run")
+            for name in meta["files"]:
+                if name.endswith(".xml"):
+                    patch_motion_and_time(variant_dir / name, t_end, f_in, ampl_val, unit, t_start)
+            return True
+        with cache._lock:
+            cache.misses += 1
+        print(f"\n> GenCase cache MISS ({key})")
+        inputs = {f"{base}.xml", f"{base}_Def.xml", f"{base}_Def.xml.bak"}
+        before = _dir_snapshot(variant_dir)
+        ok = run_gencase(variant_dir, base, dp=dp)
+        if ok:
+            after = _dir_snapshot(variant_dir)
+            produced = [n for n, m in after.items() if n not in inputs and before.get(n) != m]
+            if produced:
+                with tracing.span("gencase.store", variant=variant_dir.name, files=len(produced)):
+                    cache.store(key, variant_dir, produced, dp)
+        return ok
+
+def rotation_axis_point(tree: ET.ElementTree):
+    """
+    (x, z) midpoint of the first mvrotsinu axis, or (0, 0).
+    """
+    mv = tree.getroot().find(".//mvrotsinu")
+    if mv is None:
+        return (0.0, 0.0)
+    pts = [mv.find("./axisp1"), mv.find("./axisp2")]
+    pts = [p for p in pts if p is not None]
+    if not pts:
+        return (0.0, 0.0)
+    x = sum(float(p.attrib.get("x", 0)) for p in pts) / len(pts)
+    z = sum(float(p.attrib.get("z", 0)) for p in pts) / len(pts)
+    return (x, z)
+
+def read_solver_info(variant_dir: Path):
+    metrics = variant_dir / "logs" / "metrics.jsonl"
+    if not metrics.exists():
+        return {}
+    with metrics.open("r", encoding="utf-8") as fh:
+        first = fh.readline()
+    try:
+        rec = json.loads(first)
+    except ValueError:
+        return {}
+    return rec if rec.get("kind") == "info" else {}
+
+def run_post_diagnostics(variant_dir: Path, out_dir: Path, diag_cfg):
+    """
+    Sloshing time series (surface gauges, CoM, probe pressure, moment) from
+    out/data/Part_????.bi4 into out/diagnostics.npz. Needs numpy. Times
+    of warm-started variants count from the start of the excitation.
+    """
+    try:
+        import sloshdiag
+    except ImportError as e:
+        print(f"  !! Diagnostics skipped (numpy missing?): {e}")
+        return None
+    out_file = out_dir / "diagnostics.npz"
+    start_t = time.time()
+    try:
+        result = sloshdiag.run_diagnostics(out_dir / "data", out_file,
+                                           **_diag_params(variant_dir, read_solver_info(variant_dir), diag_cfg))
+    except (OSError, ValueError, KeyError) as e:
+        print(f"  !! Diagnostics failed: {e}")
+        return None
+    print(f"  Diagnostics: {len(result['time'])} part(s) in {time.time() - start_t:.1f}s -> {out_file}")
+    return out_file
+
+def _diag_params(variant_dir: Path, info, diag_cfg):
+    """
+    sloshdiag.run_diagnostics() keyword arguments from the solver header
+    values in info and the diagnostics options.
+    """
+    return dict(gauges=diag_cfg.get("gauges", ()), probes=diag_cfg.get("probes", ()),
+                axis=diag_cfg.get("axis", (0.0, 0.0)), dp=info.get("Dp"), kernel_h=info.get("KernelH"),
+                cte_b=info.get("CteB"), gamma=info.get("Gamma", 7.0), rho0=info.get("RhopZero", 1000.0),
+                mass_fluid=info.get("MassFluid"), workers=diag_cfg.get("workers", 1),
+                t_offset=warm_start_offset(variant_dir))
+
+class InSituAnalyser:
+    """
+    Diagnostics computed while the solver runs (diagnostics insitu = true).
+    run_dual() calls start() once the solver is up: a sloshdiag
+    DiagnosticsTail then processes each Part as it is completed, with the
+    constants from the live solver header, and keeps out/diagnostics.npz
+    current. finish() is called when the solver exits and handles the
+    last Parts, so the series is ready with the solver's return. A
+    diagnostics failure is reported and leaves result None; it never
+    changes the solver's outcome.
+    """
+    def __init__(self, variant_dir: Path, diag_cfg):
+        self.variant_dir, self.diag_cfg = variant_dir, diag_cfg
+        self.out_file = variant_dir / "out" / "diagnostics.npz"
+        self.tail = None
+        self.result = None
+
+    def start(self, parser: PartTableParser):
+        try:
+            import sloshdiag
+        except ImportError as e:
+            print(f"  !! In-situ diagnostics off (numpy missing?): {e}")
+            return
+        params = lambda: _diag_params(self.variant_dir, parser.info, self.diag_cfg) if "Dp" in parser.info else None
+        try:
+            self.out_file.unlink(missing_ok=True)
+            self.tail = sloshdiag.DiagnosticsTail(self.variant_dir / "out" / "data", self.out_file, params,
+                                                  poll_s=self.diag_cfg.get("insitu_poll_s", 1.0),
+                                                  settle_s=self.diag_cfg.get("insitu_settle_s", 2.0)).start()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"  !! In-situ diagnostics failed to start: {e}")
+
+    def finish(self):
+        if self.tail is None:
+            return None
+        start_t = time.time()
+        try:
+            series = self.tail.stop()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"  !! Diagnostics failed: {e}")
+            return None
+        if series is None:
+            print("  !! In-situ diagnostics: no Parts processed")
+            return None
+        print(f"  In-situ diagnostics: {len(series['time'])} part(s), ready {time.time() - start_t:.1f}s after "
+              f"the solver exited{f', {self.tail.errors} unreadable' if self.tail.errors else ''} -> {self.out_file}")
+        self.result = self.out_file
+        return self.result
+
+def parse_points(prompt):
+    """
+    Reads "x:z, x:z, ..." pairs; blank input gives an empty list.
+    """
+    raw = input(f"{prompt} []: ").strip()
+    points = []
+    for item in raw.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        x, _, z = item.partition(":")
+        points.append((float(x), float(z)))
+    return points
+
+# ---------------------------------------------------------------------------
+# Resumable sweep manifest (SQLite in the case directory).
+# ---------------------------------------------------------------------------
+
+MANIFEST_NAME = "sweep_manifest.sqlite"
+STAGES = ("prepare", "gencase", "solver", "convert", "diagnostics")
+
+class SweepManifest:
+    """
+    Per-variant parameter tuple, input hash, stage status and timings.
+    A variant whose input hash changed starts over; otherwise stages marked
+    done are skipped on the next run of the same sweep. Thread-safe.
+    """
+    def __init__(self, db_path: Path, case_dir: Path = None):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS variants(
+                name TEXT PRIMARY KEY, dp REAL, t_end REAL, freq REAL, ampl REAL, unit TEXT,
+                input_hash TEXT, status TEXT, reason TEXT, created REAL, updated REAL);
+            CREATE TABLE IF NOT EXISTS stages(
+                name TEXT, stage TEXT, status TEXT, started REAL, finished REAL, detail TEXT,
+                PRIMARY KEY(name, stage));
+        """)
+        self._db.commit()
+        case_dir = case_dir or self.db_path.parent
+        self.assets_digest = assets_hash(case_dir / "data")
+
+    def input_hash(self, xml_bytes: bytes) -> str:
+        h = hashlib.sha256(xml_bytes)
+        h.update(self.assets_digest.encode())
+        return h.hexdigest()[:32]
+
+    def begin(self, name, combo, unit, input_hash):
+        """
+        Registers the variant and returns {stage: status} of what can be
+        kept. A changed input hash drops all recorded stages.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT input_hash FROM variants WHERE name=?", (name,)).fetchone()
+            if row is not None and row[0] != input_hash:
+                self._db.execute("DELETE FROM stages WHERE name=?", (name,))
+                print(f"  Manifest: inputs of {name} changed, starting over")
+            self._db.execute(
+                "INSERT INTO variants(name, dp, t_end, freq, ampl, unit, input_hash, status, created, updated) "
+                "VALUES(?,?,?,?,?,?,?,'running',?,?) ON CONFLICT(name) DO UPDATE SET "
+                "input_hash=excluded.input_hash, status='running', reason=NULL, updated=excluded.updated",
+                (name, *combo, unit, input_hash, now, now))
+            self._db.commit()
+            return dict(self._db.execute("SELECT stage, status FROM stages WHERE name=?", (name,)).fetchall())
+
+    def stage_start(self, name, stage):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO stages(name, stage, status, started) VALUES(?,?,'running',?) "
+                "ON CONFLICT(name, stage) DO UPDATE SET status='running', started=excluded.started, "
+                "finished=NULL, detail=NULL", (name, stage, time.time()))
+            self._db.commit()
+
+    def stage_end(self, name, stage, status="done", detail=None):
+        with self._lock:
+            self._db.execute("UPDATE stages SET status=?, finished=?, detail=? WHERE name=? AND stage=?",
+                             (status, time.time(), detail, name, stage))
+            self._db.commit()
+
+    def variant_end(self, name, status, reason=None):
+        with self._lock:
+            self._db.execute("UPDATE variants SET status=?, reason=?, updated=? WHERE name=?",
+                             (status, reason, time.time(), name))
+            self._db.commit()
+
+    def stage_timings(self, name):
+        with self._lock:
+            rows = self._db.execute("SELECT stage, status, started, finished FROM stages WHERE name=?",
+                                    (name,)).fetchall()
+        return {s: (st, (f - b) if (f and b) else None) for s, st, b, f in rows}
+
+    def summary(self):
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM variants GROUP BY status").fetchall()
+        return "Manifest: " + ", ".join(f"{n} {s}" for s, n in sorted(rows)) + f" ({self.db_path.name})"
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+def read_solver_summary(variant_dir: Path):
+    """
+    Last "summary" record of logs/metrics.jsonl, or {}.
+    """
+    metrics = variant_dir / "logs" / "metrics.jsonl"
+    if not metrics.exists():
+        return {}
+    last = {}
+    with metrics.open("r", encoding="utf-8") as fh:
+        for line in fh:
+            if '"kind": "summary"' in line:
+                try:
+                    last = json.loads(line)
+                except ValueError:
+                    pass
+    return last
+
+def last_saved_part(variant_dir: Path):
+    """
+    Number of the last PART the solver reported as saved in
+    logs/dualsphysics.log whose Part_????.bi4 exists, or None.
+    """
+    log = variant_dir / "logs" / "dualsphysics.log"
+    data_dir = variant_dir / "out" / "data"
+    if not log.exists():
+        return None
+    parser = PartTableParser()
+    last = None
+    with log.open("r", encoding="utf-8", errors="ignore") as fh:
+        for line in fh:
+            rec = parser.feed(line)
+            if isinstance(rec, PartRecord) and (data_dir / f"Part_{rec.part:04d}.bi4").exists():
+                last = rec.part
+    return last
+
+def stage_restart_dir(variant_dir: Path, part: int, source_dir: Path = None) -> Path:
+    """
+    Copies Part_Head, Part_<part> and PartOut files of source_dir (default:
+    variant_dir itself) into variant_dir/out/restart for the solver's
+    -partbegin option.
+    """
+    data_dir = (source_dir or variant_dir) / "out" / "data"
+    restart_dir = variant_dir / "out" / "restart"
+    shutil.rmtree(restart_dir, ignore_errors=True)
+    restart_dir.mkdir(parents=True)
+    names = ["Part_Head.ibi4", f"Part_{part:04d}.bi4"] + [p.name for p in data_dir.glob("PartOut_*.obi4")]
+    for name in names:
+        if (data_dir / name).exists():
+            shutil.copy2(data_dir / name, restart_dir / name)
+    return restart_dir
+
+def variant_name_for(dp, t_end, f_in, ampl_val, unit):
+    tag_dp = safe_val_tag("dp", dp)
+    tag_t  = safe_val_tag("t", t_end)
+    tag_f  = safe_val_tag("f", f_in)
+    tag_a  = safe_val_tag("a", ampl_val, "deg" if unit == "degrees" else "rad")
+    return "__".join([tag_dp, tag_t, tag_f, tag_a])
+
+def _first(root, xps, attr=None):
+    for xp in xps:
+        node = root.find(xp)
+        if node is None:
+            continue
+        if attr:
+            if attr in node.attrib:
+                return node.attrib[attr]
+        else:
+            if "v" in node.attrib:
+                return node.attrib["v"]
+            val = (node.text or "").strip()
+            if val:
+                return val
+    return None
+
+def print_xml_verification(rt):
+    dp_echo = None
+    gdef = rt.find(".//geometry/definition")
+    if gdef is not None:
+        dp_echo = gdef.attrib.get("dp")
+    if dp_echo is None:
+        p_dp = rt.find(".//execution/parameters/parameter[@key='Dp']") \
+            or rt.find(".//execution/parameters/parameter[@key='dp']")
+        if p_dp is not None:
+            dp_echo = p_dp.attrib.get("value")
+    tmax_echo = None
+    tm_node = rt.find(".//execution/parameters/parameter[@key='TimeMax']") \
+        or rt.find(".//execution/parameters/parameter[@key='timemax']")
+    if tm_node is not None:
+        tmax_echo = tm_node.attrib.get("value")
+    if tmax_echo is None:
+        tmax_echo = _first(rt, [".//tmax", ".//time//tmax", ".//simulation//tmax"])
+    vres_echo = None
+    vres_node = rt.find(".//execution/parameters/parameter[@key='VResId']") \
+        or rt.find(".//execution/parameters/parameter[@key='vresid']")
+    if vres_node is not None:
+        vres_echo = vres_node.attrib.get("value")
+    mv_node   = rt.find(".//mvrotsinu")
+    unit_echo = mv_node.attrib.get("anglesunits") if mv_node is not None else None
+    freq_echo = _first(rt, [".//mvrotsinu/freq"])
+    ampl_echo = _first(rt, [".//mvrotsinu/ampl"])
+    print(f"\n  XML Verification:")
+    print(f"    Dp: {dp_echo}")
+    print(f"    TimeMax: {tmax_echo}")
+    print(f"    VResId: {vres_echo}")
+    print(f"    Motion unit: {unit_echo}")
+    print(f"    Frequency: {freq_echo} Hz")
+    print(f"    Amplitude: {ampl_echo} {unit_echo}")
+
+def prepare_variant(tree_orig, case_dir: Path, base: str, dp, t_end, f_in, ampl_val, unit, plan=None,
+                    stager=None, t_start=0.0, name=None) -> Path:
+    variant_name = name or variant_name_for(dp, t_end, f_in, ampl_val, unit)
+    variant_dir = case_dir / f"{base}__{variant_name}"
+    variant_dir.mkdir(exist_ok=True)
+    print(f"\n{'='*60}")
+    print(f"Processing: {variant_name}")
+    print(f"{'='*60}")
+    xml_variant_def = variant_dir / f"{base}_Def.xml"
+    if plan is not None:
+        with tracing.span("assets", variant=variant_name):
+            ensure_case_assets_without_xml(case_dir, variant_dir, stager)
+        print(f"\nApplying parameter updates for {variant_name}:")
+        with tracing.span("xml", variant=variant_name):
+            data = plan.emit(dp, t_end, f_in, ampl_val, unit, t_start=t_start)
+            backup = xml_variant_def.with_suffix(xml_variant_def.suffix + ".bak")
+            backup.write_bytes(plan.pristine)
+            xml_variant_def.write_bytes(data)
+            (variant_dir / f"{base}.xml").write_bytes(data)
+        print(f"  Saved {xml_variant_def.name} (backup: {backup.name}) and {base}.xml (for GenCase)")
+        if not plan.has_constants:
+            print("  ⚠ WARNING: <execution><constants> section is MISSING!")
+            print("             DualSPHysics will fail. Check your original XML.")
+        return variant_dir
+    with tracing.span("xml.clone", variant=variant_name):
+        clone = clone_tree(tree_orig)
+        clone.write(xml_variant_def, encoding="utf-8", xml_declaration=True)
+    with tracing.span("assets", variant=variant_name):
+        ensure_case_assets_without_xml(case_dir, variant_dir, stager)
+    upd_tree, _, _ = load_xml_with_sanitize(xml_variant_def)
+    preserve_critical_xml_sections(upd_tree, tree_orig)
+    print(f"\nApplying parameter updates for {variant_name}:")
+    update_dp(upd_tree, dp)
+    if t_end >= 0:
+        update_time_max(upd_tree, t_start + t_end)
+    else:
+        print(f"  * Keeping default TimeMax (user specified {t_end})")
+    update_mvrotsinu(
+        upd_tree,
+        freq_hz   = f_in,
+        ampl_val  = ampl_val,
+        unit      = unit,
+        duration  = t_end if t_end >= 0 else -1
+    )
+    if t_start:
+        update_motion_start(upd_tree, t_start)
+    backup = write_tree_with_backup(upd_tree, xml_variant_def)
+    print(f"  Saved {xml_variant_def.name} (backup: {backup.name})")
+    xml_for_gencase = variant_dir / f"{base}.xml"
+    upd_tree.write(xml_for_gencase, encoding="utf-8", xml_declaration=True)
+    print(f"  Saved {xml_for_gencase.name} (for GenCase)")
+    rt_check = upd_tree.getroot()
+    constants_check = rt_check.find(".//execution/constants")
+    if constants_check is None:
+        print("  ⚠ WARNING: <execution><constants> section is MISSING!")
+        print("             DualSPHysics will fail. Check your original XML.")
+    else:
+        print(f"  ✓ Constants section exists with {len(list(constants_check))} child elements")
+    print_xml_verification(upd_tree.getroot())
+    return variant_dir
+
+class VariantRun:
+    """
+    One (dp, t_end, f, ampl) combo split into the stages the pipeline
+    scheduler overlaps: front() = prepare + GenCase, solve(), post() =
+    PartVTK + diagnostics. Each returns False once the variant is finished
+    (failed, killed or nothing left to do); run_variant() calls them in turn.
+    """
+    def __init__(self, tree_orig, case_dir: Path, base: str, combo, unit, run_solver=True, mode="cpu",
+                 threads=None, gencase_cache=None, plan=None, watchdog_cfg=None, diag_cfg=None, manifest=None,
+                 stager=None, output="full", warm=None, name=None):
+        self.tree_orig, self.case_dir, self.base, self.combo, self.unit = tree_orig, case_dir, base, combo, unit
+        self.run_solver, self.mode, self.threads, self.output = run_solver, mode, threads, output
+        self.gencase_cache, self.plan, self.stager, self.manifest = gencase_cache, plan, stager, manifest
+        self.watchdog_cfg, self.diag_cfg = watchdog_cfg, diag_cfg
+        self.warm = warm if run_solver and combo[1] is not None and combo[1] >= 0 else None
+        self.warm_state = None
+        self.solver_flags = list(getattr(combo, "solver_flags", ()))
+        self.name = name or variant_name_for(*combo, unit)
+        self.variant_dir = case_dir / f"{base}__{self.name}"
+        self.out_folder = self.variant_dir / "out"
+        self.result = {"name": self.name, "dir": self.variant_dir, "combo": combo, "ok": False, "stage": "gencase"}
+        self.timings = {}
+        self.finished = False
+        self.done = {}
+        if manifest is not None:
+            self.plan = plan or XmlPatchPlan(tree_orig)
+            xml_bytes = self.plan.emit(*combo, unit, verbose=False)
+            warm_tag = f" warm:{self.warm.settle_s:g}" if self.warm is not None else ""
+            input_hash = manifest.input_hash(xml_bytes + (" ".join(self.solver_flags) + warm_tag).encode())
+            self.done = manifest.begin(self.name, combo, unit, input_hash)
+            if not any(self.variant_dir.glob("*.bi4")):
+                self.done.pop("gencase", None)
+
+    def _stage(self, name):
+        if self.manifest is not None:
+            self.manifest.stage_start(self.name, name)
+
+    def _stage_end(self, name, status="done", detail=None):
+        if self.manifest is not None:
+            self.manifest.stage_end(self.name, name, status, detail)
+
+    def _timed(self, key, t0):
+        self.timings[key] = self.timings.get(key, 0.0) + time.time() - t0
+
+    def finish(self, status, reason=None):
+        if self.manifest is not None:
+            self.manifest.variant_end(self.name, status, reason)
+        self.result["elapsed"] = sum(self.timings.values())
+        self.result["timings"] = dict(self.timings)
+        self.finished = True
+        return False
+
+    def front(self):
+        t0 = time.time()
+        dp, t_end, f_in, ampl_val = self.combo
+        if self.warm is not None:
+            self.warm_state = self.warm.state_for(dp, self.solver_flags, threads=self.threads)
+        t_start = self.warm_state["t"] if self.warm_state else 0.0
+        if self.done.get("gencase") == "done":
+            print(f"\n[{self.name}] Manifest: prepare/GenCase already done, skipping")
+            ok = True
+        else:
+            self._stage("prepare")
+            with tracing.span("prepare", variant=self.name):
+                prepare_variant(self.tree_orig, self.case_dir, self.base, dp, t_end, f_in, ampl_val, self.unit,
+                                plan=self.plan, stager=self.stager, t_start=t_start, name=self.name)
+            if self.warm_state:
+                (self.variant_dir / WARM_START_NAME).write_text(json.dumps(self.warm_state, indent=1),
+                                                                encoding="utf-8")
+            else:
+                (self.variant_dir / WARM_START_NAME).unlink(missing_ok=True)
+            self._stage_end("prepare")
+            self._stage("gencase")
+            with tracing.span("gencase", variant=self.name) as sp:
+                if self.gencase_cache is not None:
+                    ok = run_gencase_cached(self.gencase_cache, self.variant_dir, self.base, dp, t_end, f_in,
+                                            ampl_val, self.unit, t_start)
+                else:
+                    ok = run_gencase(self.variant_dir, self.base, dp=dp)
+                sp.set(ok=ok)
+            self._stage_end("gencase", "done" if ok else "failed")
+        self._timed("front", t0)
+        if not ok:
+            return self.finish("failed", "gencase")
+        self.result["stage"] = "done"
+        self.result["ok"] = True
+        if not self.run_solver:
+            return self.finish("done")
+        return True
+
+    def solve(self):
+        t0 = time.time()
+        try:
+            return self._solve()
+        finally:
+            self._timed("solve", t0)
+
+    def _solve(self):
+        result, done = self.result, self.done
+        if done.get("solver") in ("done", "killed"):
+            print(f"[{self.name}] Manifest: solver already {done['solver']}, skipping")
+            if done["solver"] == "killed":
+                result.update(ok=False, stage="killed", reason=read_solver_summary(self.variant_dir).get("watchdog"),
+                              detail="stopped by watchdog in an earlier run")
+                return self.finish("killed", result["reason"])
+            return True
+        restart_part = last_saved_part(self.variant_dir) if done.get("solver") == "running" else None
+        restart_from, t_start = None, warm_start_offset(self.variant_dir)
+        if restart_part:
+            print(f"[{self.name}] Manifest: solver was interrupted, resuming from PART {restart_part}")
+        elif t_start:
+            state = json.loads((self.variant_dir / WARM_START_NAME).read_text(encoding="utf-8"))
+            restart_part, restart_from = state["part"], self.case_dir / state["dir"]
+            restore_archived_output(restart_from)
+            print(f"[{self.name}] Warm start from PART {restart_part} of {state['dir']} (t={t_start:g}s)")
+        self._stage("solver")
+        result["stage"] = "solver"
+        watchdog = SolverWatchdog(**self.watchdog_cfg) if self.watchdog_cfg else None
+        analyser = None
+        if self.diag_cfg and self.diag_cfg.get("insitu") and done.get("diagnostics") != "done":
+            analyser = InSituAnalyser(self.variant_dir, self.diag_cfg)
+        with tracing.span("solver", variant=self.name, threads=self.threads, warm=bool(t_start)):
+            self.out_folder, rc = run_dual(self.variant_dir, self.base, mode=self.mode, threads=self.threads,
+                                           watchdog=watchdog, restart_part=restart_part,
+                                           extra_flags=self.solver_flags, output=self.output,
+                                           restart_from=restart_from, t_start=t_start, analyser=analyser)
+        if analyser is not None and analyser.result:
+            # Kept for killed/failed runs too (partial series), but only a
+            # complete run marks the stage done in the manifest.
+            result["diagnostics"] = analyser.result
+        if watchdog is not None and watchdog.reason:
+            self._stage_end("solver", "killed", watchdog.detail)
+            result.update(ok=False, stage="killed", reason=watchdog.reason, detail=watchdog.detail)
+            return self.finish("killed", watchdog.reason)
+        self._stage_end("solver", "done" if rc == 0 else "failed", f"return code {rc}")
+        if rc != 0:
+            result.update(ok=False, stage="solver", reason=f"solver rc={rc}")
+            return self.finish("failed", result["reason"])
+        if result.get("diagnostics"):
+            self._stage("diagnostics")
+            self._stage_end("diagnostics", "done", "in-situ")
+        return True
+
+    def post(self):
+        t0 = time.time()
+        if self.output == "full" and self.done.get("convert") != "done":
+            self._stage("convert")
+            with tracing.span("convert", variant=self.name) as sp:
+                rc = ensure_vtk_with_partvtk(self.out_folder, self.base)
+                sp.set(rc=rc)
+            self._stage_end("convert", "done" if rc == 0 else "failed", f"return code {rc}")
+        if self.diag_cfg and self.done.get("diagnostics") != "done" and not self.result.get("diagnostics"):
+            self._stage("diagnostics")
+            self.result["stage"] = "diagnostics"
+            with tracing.span("diagnostics", variant=self.name):
+                self.result["diagnostics"] = run_post_diagnostics(self.variant_dir, self.out_folder, self.diag_cfg)
+            self._stage_end("diagnostics", "done" if self.result["diagnostics"] else "failed")
+        self.result["stage"] = "done"
+        self._timed("post", t0)
+        return self.finish("done")
+
+def run_variant(tree_orig, case_dir: Path, base: str, combo, unit, **variant_opts):
+    """
+    Prepare, GenCase, solve and convert one (dp, t_end, f, ampl) combo.
+    With a manifest, stages already done for the same inputs are skipped
+    and an interrupted solver run restarts from its last saved PART. With
+    a WarmStarter (warm=...) the solver starts from the settled state of
+    the variant's dp instead of GenCase's lattice.
+    Returns a result dict with the variant name, status and elapsed seconds.
+    variant_opts are VariantRun's keyword arguments.
+    """
+    run = VariantRun(tree_orig, case_dir, base, combo, unit, **variant_opts)
+    if run.front() and run.solve():
+        run.post()
+    return run.result
+
+# ---------------------------------------------------------------------------
+# Hydrostatic warm start: settle each dp once, excite from the settled Part.
+# ---------------------------------------------------------------------------
+
+WARM_START_NAME = "warm_start.json"
+
+def warm_start_offset(variant_dir: Path):
+    """
+    Simulated time at which a warm-started variant's excitation begins
+    (0.0 for a cold start).
+    """
+    try:
+        return float(json.loads((variant_dir / WARM_START_NAME).read_text(encoding="utf-8"))["t"])
+    except (OSError, ValueError, KeyError):
+        return 0.0
+
+class WarmStarter:
+    """
+    One unexcited settling run (amplitude 0, TimeMax = settle_s) per dp and
+    solver flags, shared by every excitation variant at that dp: they
+    restart from its last Part with the motion start and TimeMax shifted
+    by the settled time. Settling runs are solved on first use, in
+    <base>__settle__<dp>__<t> folders, binary output only. Thread-safe.
+    """
+    def __init__(self, tree_orig, case_dir: Path, base: str, unit, settle_s, variant_opts):
+        self.tree_orig, self.case_dir, self.base, self.unit = tree_orig, case_dir, base, unit
+        self.settle_s = float(settle_s)
+        self.variant_opts = dict(variant_opts, diag_cfg=None, output="binary", warm=None, run_solver=True)
+        self.states = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def name_for(self, dp, solver_flags=()):
+        name = f"settle__{safe_val_tag('dp', dp)}__{safe_val_tag('t', self.settle_s)}"
+        if solver_flags:
+            name += "__" + hashlib.sha256(" ".join(solver_flags).encode()).hexdigest()[:8]
+        return name
+
+    def state_for(self, dp, solver_flags=(), threads=None):
+        """
+        {"dir", "part", "t"} of the settled state for dp, or None (the
+        variant then starts cold) if the settling run failed.
+        """
+        import sweepspec
+        name = self.name_for(dp, solver_flags)
+        with self._lock:
+            lock = self._key_locks.setdefault(name, threading.Lock())
+        with lock:
+            if name in self.states:
+                return self.states[name]
+            point = sweepspec.SweepPoint((dp, self.settle_s, 0.0, 0.0), solver_flags)
+            print(f"\n[warm start] Settling dp={dp:g} for {self.settle_s:g}s (no motion) in {self.base}__{name}")
+            run = VariantRun(self.tree_orig, self.case_dir, self.base, point, self.unit, threads=threads,
+                             name=name, **self.variant_opts)
+            with tracing.span("warm.settle", variant=name):
+                if run.front() and run.solve():
+                    run.post()
+            state = None
+            part = last_saved_part(run.variant_dir)
+            if run.result["ok"] and part:
+                state = {"dir": run.variant_dir.name, "part": part, "t": part_times(run.variant_dir).get(part)}
+            if state is None or state["t"] is None:
+                print(f"[warm start] !! Settling run for dp={dp:g} gave no usable Part; variants start cold")
+                state = None
+            else:
+                print(f"[warm start] dp={dp:g} settled: PART {part} at t={state['t']:g}s")
+            self.states[name] = state
+            return state
+
+    def summary(self):
+        ok = sum(1 for s in self.states.values() if s)
+        return (f"Warm start: {ok} settled state(s) of {self.settle_s:g}s shared"
+                + (f", {len(self.states) - ok} failed" if len(self.states) > ok else ""))
+
+# ---------------------------------------------------------------------------
+# Parallel scheduler: several variants at once under a core/memory budget.
+# ---------------------------------------------------------------------------
+
+# Rough CPU solver footprint per particle, from the "Updated allocated memory"
+# lines in a 14,641-particle 2D log (~3.1 MiB) plus cell arrays and headroom.
+BYTES_PER_PARTICLE   = 400
+PROCESS_BASE_BYTES   = 200 * 1024**2
+PARTICLES_PER_THREAD = 4000
+FALLBACK_NP          = 15000
+
+def lattice_particle_estimate(tree: ET.ElementTree, dp: float):
+    """
+    Upper bound on the particle count: lattice points inside <definition>
+    pointmin/pointmax at spacing dp (flat axes count as 2D).
+    """
+    gdef = tree.getroot().find(".//geometry/definition")
+    if gdef is None:
+        return None
+    pmin = gdef.find("./pointmin")
+    pmax = gdef.find("./pointmax")
+    if pmin is None or pmax is None or dp <= 0:
+        return None
+    n = 1
+    for axis in ("x", "y", "z"):
+        try:
+            lo = float(pmin.attrib.get(axis, 0))
+            hi = float(pmax.attrib.get(axis, 0))
+        except ValueError:
+            return None
+        extent = abs(hi - lo)
+        if extent > 0:
+            n *= int(extent / dp) + 1
+    return n
+
+def estimate_variant_resources(tree_orig, dp, max_cores, tuning=None):
+    np_est = lattice_particle_estimate(tree_orig, dp) or FALLBACK_NP
+    threads = tuning.threads_for(dp, np_est, concurrent=True, max_cores=max_cores) if tuning is not None else None
+    threads = threads or max(1, min(max_cores, -(-np_est // PARTICLES_PER_THREAD)))
+    mem = PROCESS_BASE_BYTES + np_est * BYTES_PER_PARTICLE
+    return {"particles": np_est, "threads": threads, "mem_bytes": mem}
+
+# ---------------------------------------------------------------------------
+# Runtime cost model (CaseNp, dp, KernelH, TimeMax + PART history).
+# ---------------------------------------------------------------------------
+
+# Solver wall time is modelled as  steps * particles * (s per particle-step):
+#   steps/sim-second * KernelH   ~ constant (CFL: dt scales with h)
+#   wall * threads**THREAD_SCALING_EXP / (steps * CaseNp)   ~ constant per machine
+# Priors come from a 14.6k particle run on 24 threads and are only used until
+# the case directory has solver history of its own.
+STEPS_H_PRIOR = 277.0
+SEC_PER_PARTICLE_STEP_PRIOR = {"cpu": 3.3e-6, "gpu": 1.5e-8}
+THREAD_SCALING_EXP = 0.8
+PRIOR_LOG_SIGMA = 1.0
+PRIOR_WEIGHT = 0.25
+BAND_Z = 1.645  # 90% band
+
+_RE_THREADS = re.compile(r"Threads:\s*(\d+)")
+
+def _run_device(run_mode: str) -> str:
+    return "gpu" if re.search(r"gpu|cuda", run_mode or "", re.IGNORECASE) else "cpu"
+
+def format_duration(seconds: float) -> str:
+    seconds = max(0.0, float(seconds))
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds // 60:.0f}m{seconds % 60:02.0f}s"
+    return f"{seconds // 3600:.0f}h{(seconds % 3600) // 60:02.0f}m"
+
+@dataclass
+class CostSample:
+    name: str
+    device: str
+    np: int
+    dp: float
+    kernel_h: float
+    threads: int
+    steps: int
+    sim_time: float
+    wall: float
+
+    @property
+    def steps_h(self):
+        return self.steps / self.sim_time * self.kernel_h
+
+    @property
+    def sec_per_particle_step(self):
+        return self.wall * self.threads ** THREAD_SCALING_EXP / (self.steps * self.np)
+
+@dataclass
+class CostPrediction:
+    seconds: float
+    low: float
+    high: float
+    particles: int
+    steps: int
+
+    def __str__(self):
+        return f"~{format_duration(self.seconds)} ({format_duration(self.low)}-{format_duration(self.high)})"
+
+def _log_stats(values, prior, prior_sigma=PRIOR_LOG_SIGMA):
+    """
+    Shrunk geometric mean and log-std of positive values towards a prior.
+    """
+    logs = [math.log(v) for v in values if v > 0]
+    n = len(logs)
+    mean = (PRIOR_WEIGHT * math.log(prior) + sum(logs)) / (PRIOR_WEIGHT + n)
+    var = sum((x - mean) ** 2 for x in logs)
+    var = (PRIOR_WEIGHT * prior_sigma ** 2 + var) / (PRIOR_WEIGHT + n)
+    return mean, var
+
+class CostModel:
+    """
+    Predicts solver wall time per variant before GenCase runs. Learns from
+    the metrics.jsonl of every solved variant in the case directory and
+    from each variant finished during the sweep (observe()).
+    """
+    def __init__(self, tree_orig, device="cpu"):
+        self.tree = tree_orig
+        self.device = device
+        self.samples = []
+        self._np_cache = {}
+        root = tree_orig.getroot()
+        try:
+            coefh = float(_first(root, [".//constants/coefh"], "value"))
+        except (TypeError, ValueError):
+            coefh = 1.0
+        gdef = root.find(".//geometry/definition")
+        dims = 3
+        if gdef is not None and gdef.find("./pointmin") is not None and gdef.find("./pointmax") is not None:
+            pmin, pmax = gdef.find("./pointmin").attrib, gdef.find("./pointmax").attrib
+            dims = sum(1 for a in "xyz" if pmin.get(a, "0") != pmax.get(a, "0")) or 3
+        self.h_over_dp_prior = coefh * math.sqrt(dims)
+        tm = root.find(".//execution/parameters/parameter[@key='TimeMax']")
+        try:
+            self.default_time_max = float(tm.get("value"))
+        except (AttributeError, TypeError, ValueError):
+            self.default_time_max = 1.0
+        try:
+            self.h_over_dp_prior = float(_first(root, [".//constants/hdp"], "value"))
+        except (TypeError, ValueError):
+            pass
+
+    @classmethod
+    def from_case_dir(cls, tree_orig, case_dir: Path, base: str, device="cpu"):
+        model = cls(tree_orig, device)
+        with tracing.span("scan.cost_history", "scan") as sp:
+            for variant_dir in sorted(case_dir.glob(f"{base}__*")):
+                model.observe(variant_dir)
+            sp.set(runs=len(model.samples))
+        return model
+
+    def observe(self, variant_dir: Path):
+        """
+        Adds the solver run in variant_dir (if any) to the history. Runs
+        stopped early still count: only rates are used.
+        """
+        summ = read_solver_summary(variant_dir)
+        info = summ.get("info") or {}
+        np_case, dp, kernel_h = info.get("CaseNp"), info.get("Dp"), info.get("KernelH")
+        wall = summ.get("wall_time") or summ.get("wall_solver_est")
+        steps, sim_time = summ.get("total_steps"), summ.get("sim_time")
+        if not (np_case and dp and kernel_h and wall and steps and sim_time):
+            return None
+        device = _run_device(info.get("RunMode"))
+        m = _RE_THREADS.search(info.get("RunMode") or "")
+        threads = int(m.group(1)) if (m and device == "cpu") else 1
+        sample = CostSample(variant_dir.name, device, int(np_case), float(dp), float(kernel_h), threads,
+                            int(steps), float(sim_time), float(wall))
+        self.samples = [s for s in self.samples if s.name != sample.name] + [sample]
+        return sample
+
+    def _particles(self, dp):
+        """
+        Lattice estimate scaled by the CaseNp/lattice ratio seen so far.
+        """
+        ratios = [s.np / self._lattice(s.dp) for s in self.samples]
+        mean, var = _log_stats(ratios, 1.0, prior_sigma=0.5)
+        return self._lattice(dp) * math.exp(mean), var
+
+    def _lattice(self, dp):
+        if dp not in self._np_cache:
+            self._np_cache[dp] = lattice_particle_estimate(self.tree, dp) or FALLBACK_NP
+        return self._np_cache[dp]
+
+    def predict(self, dp, t_end, threads=None) -> CostPrediction:
+        own = [s for s in self.samples if s.device == self.device]
+        np_est, var_np = self._particles(dp)
+        h_mean, var_h = _log_stats([s.kernel_h / s.dp for s in self.samples], self.h_over_dp_prior, 0.2)
+        a_mean, var_a = _log_stats([s.steps_h for s in own], STEPS_H_PRIOR)
+        b_mean, var_b = _log_stats([s.sec_per_particle_step for s in own], SEC_PER_PARTICLE_STEP_PRIOR[self.device])
+        kernel_h = dp * math.exp(h_mean)
+        t_end = t_end if t_end and t_end > 0 else self.default_time_max
+        steps = float(t_end) * math.exp(a_mean) / kernel_h
+        threads = 1 if self.device == "gpu" else (threads or os.cpu_count() or 1)
+        seconds = steps * np_est * math.exp(b_mean) / threads ** THREAD_SCALING_EXP
+        spread = BAND_Z * math.sqrt(var_np + var_h + var_a + var_b)
+        return CostPrediction(seconds, seconds * math.exp(-spread), seconds * math.exp(spread),
+                              int(np_est), int(steps))
+
+    def describe(self):
+        own = sum(1 for s in self.samples if s.device == self.device)
+        if not own:
+            return f"Cost model: no {self.device.upper()} solver history yet, using default rates (wide bands)"
+        return f"Cost model: calibrated on {own} {self.device.upper()} run(s) in this case directory"
+
+class _VariantStdout:
+    """
+    sys.stdout stand-in that sends writes from a scheduler worker thread to
+    that variant's own log file, and everything else to the real console.
+    """
+    def __init__(self, console):
+        self.console = console
+        self._local = threading.local()
+
+    def bind(self, stream):
+        self._local.stream = stream
+
+    def _target(self):
+        return getattr(self._local, "stream", None) or self.console
+
+    def write(self, s):
+        return self._target().write(s)
+
+    def flush(self):
+        self._target().flush()
+
+def _run_variant_logged(proxy, log_path: Path, *args, **kwargs):
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with log_path.open("w", encoding="utf-8") as lf:
+        proxy.bind(lf)
+        try:
+            return run_variant(*args, **kwargs)
+        except Exception as e:
+            print(f"!! Variant crashed: {e!r}")
+            raise
+        finally:
+            proxy.bind(None)
+
+def _remaining_makespan(pending, running, max_cores):
+    """
+    Rough time to drain the queue: the longest running job's remainder or
+    the pending core-seconds spread over the core budget, whichever is larger.
+    """
+    now = time.time()
+    left = [max(0.0, res["cost"].seconds - (now - started)) for _, res, started in running.values()]
+    core_s = sum(res["cost"].seconds * res["threads"] for _, res in pending)
+    core_s += sum(l * res["threads"] for l, (_, res, _) in zip(left, running.values()))
+    return max(max(left, default=0.0), core_s / max_cores)
+
+# Completions a blocked head-of-queue job waits through while smaller jobs
+# are backfilled past it; after that nothing else starts until it fits.
+MAX_BACKFILL_COMPLETIONS = 4
+
+def run_variants_parallel(tree_orig, case_dir: Path, base: str, combos, unit,
+                          max_cores=None, max_mem_gib=None, max_jobs=None, cost_model=None, tuning=None,
+                          deferred=(), max_backfill=MAX_BACKFILL_COMPLETIONS, **variant_opts):
+    """
+    Run variants concurrently. Each job is sized from its dp (threads and
+    memory); jobs start in order whenever they fit in the remaining budget.
+    With a cost model the queue is ordered longest-predicted-first, after
+    every variant not named in deferred. With a ThreadTuning, threads per
+    job come from the measured best split.
+    A job larger than the whole budget runs alone with all cores. Smaller
+    jobs are backfilled past one that does not fit yet, but only for
+    max_backfill completions; then the queue waits for it.
+    Console output of each variant goes to <variant>/logs/runner.log.
+    variant_opts are passed on to run_variant().
+    """
+    max_cores = max_cores or os.cpu_count() or 1
+    mem_budget = (max_mem_gib * 1024**3) if max_mem_gib else float("inf")
+    max_jobs = max_jobs or max_cores
+    use_threads = not variant_opts.get("mode", "cpu").lower().strip().startswith("g")
+    pending = []
+    for combo in combos:
+        res = estimate_variant_resources(tree_orig, combo[0], max_cores, tuning)
+        res["threads"] = max(1, min(res["threads"], max_cores))
+        if cost_model is not None:
+            res["cost"] = cost_model.predict(combo[0], combo[1], res["threads"] if use_threads else None)
+        pending.append((combo, res))
+    if cost_model is not None:
+        pending.sort(key=lambda item: item[1]["cost"].seconds, reverse=True)
+    if deferred:
+        pending.sort(key=lambda item: variant_name_for(*item[0], unit) in deferred)
+    n_total = len(pending)
+    console = sys.stdout
+    proxy = _VariantStdout(console)
+    sys.stdout = proxy
+    running = {}
+    results = []
+    free_cores, free_mem = max_cores, mem_budget
+    head, head_waits = None, 0
+    wall_start = time.time()
+    try:
+        with ThreadPoolExecutor(max_workers=max_jobs) as pool:
+            while pending or running:
+                if not pending or pending[0] is not head:
+                    head, head_waits = (pending[0] if pending else None), 0
+                starving = head_waits >= max_backfill
+                for item in list(pending):
+                    if len(running) >= max_jobs:
+                        break
+                    combo, res = item
+                    mem_charge = min(res["mem_bytes"], mem_budget)
+                    fits = res["threads"] <= free_cores and mem_charge <= free_mem
+                    if not fits and running:
+                        if starving:
+                            break
+                        continue
+                    pending.remove(item)
+                    free_cores -= res["threads"]
+                    free_mem -= mem_charge
+                    name = variant_name_for(*combo, unit)
+                    log_path = case_dir / f"{base}__{name}" / "logs" / "runner.log"
+                    eta = f", ETA {res['cost']}" if "cost" in res else ""
+                    console.write(f"[start] {name}  (~{res['particles']:,} particles, "
+                                  f"{res['threads']} thread(s), {res['mem_bytes']/1024**2:.0f} MiB{eta})\n")
+                    fut = pool.submit(_run_variant_logged, proxy, log_path, tree_orig, case_dir, base, combo, unit,
+                                      threads=res["threads"] if use_threads else None, **variant_opts)
+                    running[fut] = (name, res, time.time())
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                head_waits += len(done)
+                for fut in done:
+                    name, res, _ = running.pop(fut)
+                    free_cores += res["threads"]
+                    free_mem += min(res["mem_bytes"], mem_budget)
+                    try:
+                        result = fut.result()
+                    except Exception as e:
+                        result = {"name": name, "ok": False, "stage": "crashed", "elapsed": 0.0, "error": repr(e)}
+                    results.append(result)
+                    if cost_model is not None and result.get("dir"):
+                        cost_model.observe(result["dir"])
+                    wall = time.time() - wall_start
+                    rate = len(results) / (wall / 3600.0) if wall > 0 else 0.0
+                    status = "✓" if result["ok"] else f"✗ ({result.get('reason') or result['stage']})"
+                    eta = ""
+                    if cost_model is not None and (pending or running):
+                        eta = f" • sweep ETA ~{format_duration(_remaining_makespan(pending, running, max_cores))}"
+                    console.write(f"[done {len(results)}/{n_total}] {name} {status} "
+                                  f"in {result['elapsed']:.1f}s • {rate:.1f} variants/hour{eta}\n")
+    finally:
+        sys.stdout = console
+    wall = time.time() - wall_start
+    n_ok = sum(1 for r in results if r["ok"])
+    print("\n" + "="*60)
+    print("PARALLEL SWEEP SUMMARY")
+    print("="*60)
+    print(f"Variants: {len(results)} ({n_ok} ok, {len(results) - n_ok} failed)")
+    print(f"Wall time: {wall:.1f}s • Sum of variant times: {sum(r['elapsed'] for r in results):.1f}s")
+    if wall > 0:
+        print(f"Throughput: {len(results) / (wall / 3600.0):.1f} variants/hour")
+    return results
+
+PIPELINE_STAGES = ("front", "solve", "post")
+
+def _pipeline_step(proxy, run, stage):
+    """
+    Runs one stage of a VariantRun, its console output going to the
+    variant's runner.log unless proxy is None. Returns False when the
+    variant is finished.
+    """
+    if run.finished:
+        return False
+    log_path = run.variant_dir / "logs" / "runner.log"
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with log_path.open("a", encoding="utf-8") as lf:
+        if proxy is not None:
+            proxy.bind(lf)
+        try:
+            return getattr(run, stage)()
+        except Exception as e:
+            print(f"!! {stage} crashed: {e!r}")
+            run.result.update(ok=False, stage="crashed", error=repr(e))
+            return run.finish("failed", f"{stage} crashed")
+        finally:
+            if proxy is not None:
+                proxy.bind(None)
+
+def run_variants_pipelined(tree_orig, case_dir: Path, base: str, combos, unit, depth=2, post_workers=1,
+                           threads=None, cost_model=None, n_total=None, tuning=None, **variant_opts):
+    """
+    One solver at a time, with prepare + GenCase of the next variants and
+    PartVTK/diagnostics of the previous ones running alongside it:
+
+        front thread -> queue(depth) -> solver (this thread) -> queue(depth) -> post_workers
+
+    The bounded queues give backpressure: at most `depth` prepared variants
+    wait on disk for the solver, and the solver blocks when post-processing
+    falls behind. On CPU the solver gets all cores but one per side stage
+    unless threads is given (or tuning has a smaller single-run count for
+    the variant's dp). Solver output stays on the console; the other
+    stages log to <variant>/logs/runner.log. Prints a per-stage timing
+    report and returns the results in completion order. An error raised
+    in the front thread is re-raised here once the other stages are done.
+    """
+    import queue as queue_mod
+    if threads is None and not str(variant_opts.get("mode", "cpu")).lower().startswith("g"):
+        threads = max(1, (os.cpu_count() or 1) - 1 - post_workers)
+    depth = max(1, int(depth))
+    ready = queue_mod.Queue(maxsize=depth)
+    solved = queue_mod.Queue(maxsize=depth)
+    busy = {s: 0.0 for s in PIPELINE_STAGES}
+    starved = {s: 0.0 for s in PIPELINE_STAGES}
+    blocked = {s: 0.0 for s in PIPELINE_STAGES}
+    results, lock = [], threading.Lock()
+    console = sys.stdout
+    proxy = _VariantStdout(console)
+    stop, front_error = threading.Event(), []
+    wall_start = time.time()
+
+    def put(q, item, stage):
+        t0 = time.time()
+        q.put(item)
+        with lock:
+            blocked[stage] += time.time() - t0
+
+    def get(q, stage):
+        t0 = time.time()
+        item = q.get()
+        with lock:
+            starved[stage] += time.time() - t0
+        return item
+
+    def record(run):
+        with lock:
+            results.append(run.result)
+            for s, v in run.timings.items():
+                busy[s] += v
+            n_done = len(results)
+        status = "✓" if run.result["ok"] else f"✗ ({run.result.get('reason') or run.result['stage']})"
+        steps = " ".join(f"{s} {run.timings[s]:.1f}s" for s in PIPELINE_STAGES if s in run.timings)
+        console.write(f"[done {n_done}/{n_total or '?'}] {run.name} {status} ({steps})\n")
+
+    def front():
+        try:
+            for combo in combos:
+                if stop.is_set():
+                    break
+                try:
+                    run_threads = threads
+                    if threads and tuning is not None:
+                        run_threads = tuning.threads_for(combo[0], max_cores=threads) or threads
+                    run = VariantRun(tree_orig, case_dir, base, combo, unit, threads=run_threads, **variant_opts)
+                except Exception as e:
+                    console.write(f"!! {variant_name_for(*combo, unit)}: {e!r}\n")
+                    continue
+                console.write(f"[front] {run.name}\n")
+                _pipeline_step(proxy, run, "front")
+                put(ready, run, "front")
+        except BaseException as e:
+            front_error.append(e)
+        finally:
+            ready.put(None)
+
+    def post():
+        while True:
+            run = get(solved, "post")
+            if run is None:
+                solved.put(None)
+                return
+            _pipeline_step(proxy, run, "post")
+            record(run)
+
+    sys.stdout = proxy
+    side = [threading.Thread(target=front, name="pipeline-front", daemon=True)]
+    side += [threading.Thread(target=post, name=f"pipeline-post{i}", daemon=True) for i in range(post_workers)]
+    for t in side:
+        t.start()
+    try:
+        while True:
+            run = get(ready, "solve")
+            if run is None:
+                break
+            if not run.finished:
+                console.write(f"[solve] {run.name}" + (f" ({run.threads} thread(s))\n" if run.threads else "\n"))
+                _pipeline_step(None, run, "solve")
+                if cost_model is not None and run.timings.get("solve"):
+                    cost_model.observe(run.variant_dir)
+            if run.finished:
+                record(run)
+            else:
+                put(solved, run, "solve")
+    finally:
+        # If the solver loop stopped early the front thread may be blocked
+        # on the full ready queue: drain it until the thread has exited.
+        stop.set()
+        while side[0].is_alive():
+            try:
+                ready.get_nowait()
+            except queue_mod.Empty:
+                pass
+            side[0].join(timeout=0.1)
+        solved.put(None)
+        for t in side[1:]:
+            t.join()
+        sys.stdout = console
+    if front_error:
+        raise front_error[0]
+    wall = time.time() - wall_start
+    serial = sum(busy.values())
+    labels = {"front": "prepare+GenCase", "solve": "solver", "post": "PartVTK/diagnostics"}
+    n_ok = sum(1 for r in results if r["ok"])
+    print("\n" + "="*60)
+    print("PIPELINE SUMMARY")
+    print("="*60)
+    print(f"Variants: {len(results)} ({n_ok} ok, {len(results) - n_ok} failed)")
+    print(f"  {'stage':<20} {'busy':>10} {'waiting':>10} {'blocked':>10}")
+    for s in PIPELINE_STAGES:
+        print(f"  {labels[s]:<20} {format_duration(busy[s]):>10} {format_duration(starved[s]):>10} "
+              f"{format_duration(blocked[s]):>10}")
+    print("  (waiting = idle for lack of input, blocked = idle on a full queue downstream)")
+    if wall > 0:
+        saved = serial - wall
+        print(f"Wall time: {format_duration(wall)} • stages back to back: {format_duration(serial)} • "
+              f"overlap saved {format_duration(max(0.0, saved))} ({100.0 * max(0.0, saved) / serial if serial else 0:.0f}%)")
+        print(f"Solver utilisation: {100.0 * busy['solve'] / wall:.0f}% of wall time")
+    return results
+
+def main():
+    print("=== SPH batch runner ===")
+    print("Changes:")
+    print("  - Enhanced XML dp injection at multiple locations")
+    print("  - Explicit -dp flag passed to GenCase command line")
+    print("  - Post-GenCase verification of actual dp used")
+    print("=" * 60)
+    xml_path_in = input("\nPath to *_Def.xml (e.g., C:\\Users\\you\\Autoslosh_Def.xml): ").strip('" ').strip()
+    if not xml_path_in:
+        print("No XML path provided.")
+        sys.exit(1)
+    xml_path = Path(xml_path_in)
+    if not xml_path.exists():
+        print(f"XML not found: {xml_path}")
+        sys.exit(1)    
+    try:
+        tree_orig, cleaned, preclean_bak = load_xml_with_sanitize(xml_path)
+        if cleaned:
+            print(f"Note: XML had leading junk; cleaned and saved. Backup at: {preclean_bak}")                
+        root_check = tree_orig.getroot()
+        constants_check = root_check.find(".//execution/constants")
+        if constants_check is None:
+            print("\n⚠ WARNING: Your original XML is missing <execution><constants> section!")
+            print("  This will cause DualSPHysics to fail.")
+            print("  The script will attempt to create a minimal constants section.")
+            print("  You may need to add proper constants manually to your original XML.")
+            response = input("\n  Continue anyway? (yes/no) [no]: ").strip().lower()
+            if not response.startswith('y'):
+                print("Aborting.")
+                sys.exit(0)        
+    except ET.ParseError as e:
+        print("ERROR: Cannot parse XML even after sanitize attempt:", e)
+        sys.exit(2)  
+    print("\n--- Parameter Sweep Configuration ---")
+    dp_list = parse_list_or_single("Dp (m) list (comma-separated)", 0.01)
+    t_list  = parse_list_or_single("Simulation duration TimeMax (s) list (-1 keeps case default)", -1)
+    unit    = get_choice("Amplitude units (degrees/radians)", "degrees")
+
+    freq_list  = parse_list_or_single("Frequency (Hz) list (leave blank to use ω)", "")
+    if len(freq_list) == 1 and freq_list[0] == 0.0:
+        freq_list = []
+    omega_list = parse_list_or_single("Angular velocity ω (rad/s) list (leave blank to use f)", "")
+    if len(omega_list) == 1 and omega_list[0] == 0.0:
+        omega_list = []
+    ampl_list  = parse_list_or_single(f"Amplitude values list ({unit})", 8.0)
+    if omega_list and not freq_list:
+        freq_list = [w/(2*pi) for w in omega_list]
+    if not freq_list:
+        freq_list = [0.5]  
+    combos = list(itertools.product(dp_list, t_list, freq_list, ampl_list))
+    print(f"\nPlanned runs: {len(combos)} combination(s).")
+    print(f"Total variants to generate: {len(combos)}")
+    base = xml_path.stem
+    case_dir = xml_path.parent
+    if base.endswith("_Def"):
+        base = base[:-4]
+    print(f"Base case name: {base}")
+    print(f"Case directory: {case_dir}")
+    cfg = {}
+    cfg["solver"]    = (input("\nRun DualSPHysics automatically for each variant? (yes/no) [yes]: ").strip().lower() or "yes").startswith("y")
+    cfg["mode"]      = (input("Run mode: cpu/gpu [cpu]: ").strip().lower() or "cpu")
+    cfg["scheduler"] = get_choice("Scheduler: serial/parallel/pipeline", "serial",
+                                  choices=("serial", "parallel", "pipeline"))
+    if cfg["scheduler"] == "pipeline":
+        cfg["pipeline_depth"] = int(parse_list_or_single("Variants prepared ahead of the solver", 2)[0])
+        cfg["post_workers"]   = int(parse_list_or_single("Parallel post-processing (PartVTK/diagnostics) workers", 1)[0])
+    if cfg["scheduler"] == "parallel":
+        cfg["cores"]      = int(parse_list_or_single("Core budget", os.cpu_count() or 1)[0])
+        cfg["memory_gib"] = parse_list_or_single("Memory budget GiB (0 = unlimited)", 0)[0] or None
+        cfg["max_jobs"]   = int(parse_list_or_single("Max concurrent variants (0 = as many as fit)", 0)[0]) or None
+    cfg["cache"] = (input("Reuse GenCase output across freq/ampl/TimeMax variants (cache)? (yes/no) [yes]: ").strip().lower() or "yes").startswith("y")
+    if cfg["cache"]:
+        cfg["cache_gib"] = parse_list_or_single("GenCase cache size limit GiB", 20)[0]
+    if cfg["solver"] and (input("Enable divergence watchdog (stop unstable solver runs early)? (yes/no) [no]: ").strip().lower() or "no").startswith("y"):
+        cfg["watchdog"] = {
+            "max_dtmin_per_sim_s": parse_list_or_single("  Max DtMin adjustments per simulated second (0 = off)", 20000)[0],
+            "max_out_pct":         parse_list_or_single("  Max particles out, % of CaseNfluid (0 = off)", 5)[0],
+            "max_wall_s":          parse_list_or_single("  Max projected solver wall time per variant, s (0 = off)", 0)[0],
+        }
+    if cfg["solver"] and (input("Compute sloshing diagnostics after each solve (needs numpy)? (yes/no) [no]: ").strip().lower() or "no").startswith("y"):
+        cfg["diagnostics"] = {
+            "gauges":  parse_list_or_single("  Free-surface gauge x positions (m) list", 0.0),
+            "probes":  parse_points("  Pressure probe points x:z list (blank = none)"),
+            "workers": int(parse_list_or_single("  Worker processes for diagnostics", 1)[0]),
+            "insitu":  (input("  Analyse each Part while the solver is still running (in-situ)? (yes/no) [no]: ").strip().lower() or "no").startswith("y"),
+        }
+    if cfg["solver"] and (input("Warm start: settle the tank once per dp (no motion) and start every variant from it? (yes/no) [no]: ").strip().lower() or "no").startswith("y"):
+        cfg["warm_start"] = {
+            "settle_s": parse_list_or_single("  Settling time, s", 0.5)[0],
+        }
+    if cfg["solver"] and (len(freq_list) > 1 or len(ampl_list) > 1) and (input("Adaptive sampling: use the freq/ampl values as seeds and add runs where the response surface is uncertain? (yes/no) [no]: ").strip().lower() or "no").startswith("y"):
+        cfg["adaptive"] = {
+            "metric":    get_choice("  Response metric (moment/surface_z/pressure)", "moment", choices=("moment", "surface_z", "pressure")),
+            "budget":    int(parse_list_or_single("  Run budget per (dp, TimeMax) surface, seeds included", 30)[0]),
+            "tolerance": parse_list_or_single("  Accuracy target, surrogate std as % of the response range", 2)[0] / 100.0,
+            "batch":     int(parse_list_or_single("  New points per round (run together with the parallel scheduler)", 1)[0]),
+        }
+    if cfg["solver"] and len(t_list) > 1:
+        cfg["time_prefix"] = (input("Run only the longest TimeMax per dp/freq/ampl and derive the shorter ones from its Parts? (yes/no) [yes]: ").strip().lower() or "yes").startswith("y")
+    if cfg["solver"] and len(dp_list) > 1 and (input("Convergence study: solve dp coarse to fine and stop once results converge? (yes/no) [no]: ").strip().lower() or "no").startswith("y"):
+        cfg["convergence"] = {
+            "tolerance": parse_list_or_single("  Tolerance, max relative change between levels (%)", 2)[0] / 100.0,
+        }
+    cfg["staging"] = get_choice("Stage data/ into variants via (auto/reflink/hardlink/symlink/copy)", "auto",
+                                choices=STAGING_MODES)
+    cfg["output"] = get_choice("Solver output: full (binx+vtk) / binary (bi4 only, VTK on demand)", "full",
+                               choices=("full", "binary"))
+    cfg["quota_gib"] = parse_list_or_single("Disk quota for the variant folders, GiB (0 = none)", 0)[0]
+    if cfg["solver"] and (input("Render PNG frames of each finished variant (needs numpy)? (yes/no) [no]: ").strip().lower() or "no").startswith("y"):
+        cfg["render"] = {
+            "scalar": get_choice("  Colour particles by (vel/pressure/rho/z/idp)", "vel",
+                                 choices=("vel", "pressure", "rho", "z", "idp")),
+            "stride": int(parse_list_or_single("  Render every n-th Part", 1)[0]),
+            "tile":   input("  Tile variants side by side that differ only in (dp/t_end/freq/ampl, blank = no tiling): ").strip().lower() or None,
+        }
+    cfg["trace"] = (input("Trace every stage (Chrome/Perfetto trace + top-stages table)? (yes/no) [no]: ").strip().lower() or "no").startswith("y")
+    cfg["preflight"] = {
+        "max_np": parse_list_or_single("Pre-flight particle limit per variant (0 = none)", 0)[0] or None,
+    }
+    cfg["manifest"] = (input("Keep a resumable sweep manifest (skip finished stages on rerun)? (yes/no) [yes]: ").strip().lower() or "yes").startswith("y")
+    run_sweep(tree_orig, case_dir, base, combos, unit, cfg, interactive=True)
+
+# ---------------------------------------------------------------------------
+# OpenMP autotuner: threads per solver run x concurrent runs, per case size.
+# ---------------------------------------------------------------------------
+
+TUNING_NAME = "omp_tuning.json"
+AUTOTUNE_DIRNAME = ".autotune"
+AUTOTUNE_SLICE_PARTS = 4
+
+def _np_bucket(particles):
+    return int(round(math.log2(max(1, particles))))
+
+class ThreadTuning:
+    """
+    Best OpenMP split per (dp, CaseNp bucket) for each host, as measured by
+    autotune() and kept in <case dir>/omp_tuning.json. Buckets are powers
+    of two of the particle count.
+    """
+    def __init__(self, path: Path, host=None):
+        self.path = Path(path)
+        self.host = host or socket.gethostname()
+        try:
+            self.data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.data = {}
+
+    @property
+    def entries(self):
+        return self.data.get(self.host, {})
+
+    def lookup(self, dp, particles=None):
+        """
+        Entry measured at this dp, else the one with the nearest CaseNp
+        bucket (within a factor of two), else None.
+        """
+        entries = list(self.entries.values())
+        for e in entries:
+            if math.isclose(e["dp"], dp, rel_tol=1e-9):
+                return e
+        if particles and entries:
+            b = _np_bucket(particles)
+            e = min(entries, key=lambda e: abs(e["bucket"] - b))
+            if abs(e["bucket"] - b) <= 1:
+                return e
+        return None
+
+    def threads_for(self, dp, particles=None, concurrent=False, max_cores=None):
+        """
+        Tuned threads per run: the best split's when runs share the node,
+        the best single-run count otherwise. None without a match.
+        """
+        e = self.lookup(dp, particles)
+        if e is None:
+            return None
+        threads = e["threads"] if concurrent else e["serial_threads"]
+        return max(1, min(threads, max_cores)) if max_cores else threads
+
+    def store(self, entry):
+        data = ThreadTuning(self.path, self.host).data
+        data.setdefault(self.host, {})[f"dp={entry['dp']:g}/np~2^{entry['bucket']}"] = entry
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}")
+        tmp.write_text(json.dumps(data, indent=1), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self.data = data
+
+    def describe(self):
+        if not self.entries:
+            return f"OpenMP tuning: nothing measured on {self.host} yet"
+        lines = [f"OpenMP tuning for {self.host} ({self.path.name}):"]
+        for key, e in sorted(self.entries.items(), key=lambda kv: kv[1]["dp"]):
+            lines.append(f"  {key:<24} {e['concurrency']} x {e['threads']} thread(s) "
+                         f"(~{e['variants_per_hour']:.1f} variants/h); alone: {e['serial_threads']} thread(s)")
+        return "\n".join(lines)
+
+def default_splits(cores):
+    """
+    (threads, concurrent runs) candidates: threads halving from all cores
+    down to one, each tried alone and with as many runs as fit.
+    """
+    ladder, t = [], cores
+    while t >= 1:
+        ladder.append(t)
+        t //= 2
+    splits = []
+    for t in ladder:
+        splits.append((t, 1))
+        if cores // t > 1:
+            splits.append((t, cores // t))
+    return splits
+
+def parse_splits(text):
+    """
+    "24x1,12x2,6x4" -> [(24, 1), (12, 2), (6, 4)]  (threads x concurrent runs)
+    """
+    splits = []
+    for item in str(text).split(","):
+        t, _, c = item.strip().lower().partition("x")
+        splits.append((int(t), int(c or 1)))
+    return splits
+
+def solver_case_xml(case_dir: Path, case_base: str, verbose=True) -> Path:
+    """
+    The GenCase output XML the solver should be given (e.g. 0.01.xml).
+    """
+    for xml_file in sorted(case_dir.glob("*.xml"), key=lambda p: p.stat().st_mtime, reverse=True):
+        if xml_file.stem not in [f"{case_base}_Def", case_base, f"{case_base}_Actual"]:
+            if verbose:
+                print(f"  >> Using GenCase output XML: {xml_file.name}")
+            return xml_file
+    if verbose:
+        print(f"  !! WARNING: Could not find GenCase output XML (e.g., '0.01.xml')")
+        print(f"     Available XML files: {[x.name for x in case_dir.glob('*.xml')]}")
+        print(f"     Trying to use {case_base}.xml anyway...")
+    return case_dir / f"{case_base}.xml"
+
+def _calibration_slice(cmd, cwd: Path, log_path: Path, timeout_s):
+    """
+    Runs one calibration solve and returns its PART-table rates (medians
+    over the Parts after the first, which carries the start-up cost), or
+    None if it produced no usable Part.
+    """
+    parser = PartTableParser()
+    rows = []
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with log_path.open("w", encoding="utf-8") as lf:
+        proc = subprocess.Popen(cmd, cwd=str(cwd), stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                text=True, bufsize=1)
+        timer = threading.Timer(timeout_s, proc.kill)
+        timer.start()
+        try:
+            for line in proc.stdout:
+                lf.write(line)
+                rec = parser.feed(line)
+                if isinstance(rec, PartRecord) and rec.steps_per_s > 0:
+                    rows.append(rec)
+            proc.stdout.close()
+            rc = proc.wait()
+        finally:
+            timer.cancel()
+    body = rows[1:] or rows
+    if not body or (rc != 0 and len(rows) < 2):
+        return None
+    return {"steps_per_s": statistics.median(r.steps_per_s for r in body),
+            "sim_per_wall": statistics.median(r.sim_per_wall for r in body),
+            "particles": parser.info.get("CaseNp")}
+
+def autotune(tree_orig, case_dir: Path, base: str, combo, unit, cores=None, slice_s=30.0, splits=None,
+             tuning=None, **variant_opts):
+    """
+    Calibrates one representative variant. It is prepared and GenCase'd as
+    usual (so the real run reuses both), then short slices of it are solved
+    at each (threads, concurrent runs) split, each slice sized to take
+    about slice_s. The split with the highest steps/s summed over its
+    concurrent runs is stored in the tuning file with the best single-run
+    thread count. Returns the entry, or None.
+    """
+    cores = cores or os.cpu_count() or 1
+    tuning = tuning or ThreadTuning(case_dir / TUNING_NAME)
+    splits = splits or default_splits(cores)
+    exe = Path(DUAL_CPU_EXE)
+    if not exe.exists():
+        print(f"DualSPHysics CPU exe not found at {exe}. Cannot autotune.")
+        return None
+    run = VariantRun(tree_orig, case_dir, base, combo, unit, run_solver=False, **variant_opts)
+    run.front()
+    if not run.result["ok"]:
+        print(f"[autotune] GenCase failed for {run.name}")
+        return None
+    dp, t_end = combo[0], combo[1]
+    model = CostModel.from_case_dir(tree_orig, case_dir, base)
+    t_full = t_end if t_end and t_end > 0 else model.default_time_max
+    case_name = solver_case_xml(run.variant_dir, base, verbose=False).stem
+    root = case_dir / AUTOTUNE_DIRNAME / run.name
+    print(f"\n[autotune] {run.name} on {cores} core(s), slices of ~{format_duration(slice_s)}:")
+    measured, particles = [], None
+    for threads, conc in splits:
+        t_slice = min(t_full, t_full * slice_s / max(model.predict(dp, t_full, threads).seconds, 1e-9))
+        cmds = [[str(exe), case_name, str(run.variant_dir), "-sv:none", "-svdomainvtk:0", "-svnormals:0",
+                 "-svres:0", "-dirout", str(root / f"{threads}x{conc}_{k}"), f"-ompthreads:{threads}",
+                 f"-tmax:{t_slice:.6g}", f"-tout:{t_slice / AUTOTUNE_SLICE_PARTS:.6g}", *run.solver_flags]
+                for k in range(conc)]
+        with ThreadPoolExecutor(max_workers=conc) as pool:
+            rates = list(pool.map(lambda kc: _calibration_slice(kc[1], run.variant_dir,
+                                                                root / f"{threads}x{conc}_{kc[0]}.log",
+                                                                5 * slice_s + 60), enumerate(cmds)))
+        if not all(rates):
+            print(f"  {conc:>3} x {threads:<3} thread(s): failed (see {root})")
+            continue
+        particles = particles or rates[0]["particles"]
+        steps = sum(r["steps_per_s"] for r in rates)
+        sim = sum(r["sim_per_wall"] for r in rates)
+        measured.append({"threads": threads, "concurrency": conc, "steps_per_s": steps,
+                         "sim_per_wall": sim, "variants_per_hour": 3600.0 * sim / t_full})
+        print(f"  {conc:>3} x {threads:<3} thread(s): {steps:>12,.0f} steps/s total, "
+              f"{steps / conc:>10,.0f} per run, ~{3600.0 * sim / t_full:.1f} variants/h")
+    if not measured:
+        return None
+    shutil.rmtree(root, ignore_errors=True)
+    best = max(measured, key=lambda m: m["steps_per_s"])
+    alone = max((m for m in measured if m["concurrency"] == 1), key=lambda m: m["steps_per_s"], default=best)
+    particles = particles or model.predict(dp, t_full).particles
+    entry = {"dp": dp, "particles": particles, "bucket": _np_bucket(particles), "cores": cores,
+             "threads": best["threads"], "concurrency": best["concurrency"], "serial_threads": alone["threads"],
+             "variants_per_hour": best["variants_per_hour"], "splits": measured,
+             "measured": time.strftime("%Y-%m-%d %H:%M:%S")}
+    tuning.store(entry)
+    print(f"  -> best: {best['concurrency']} x {best['threads']} thread(s); "
+          f"alone: {alone['threads']} thread(s)  (saved to {tuning.path.name})")
+    return entry
+
+def autotune_spec(spec, cores=None, slice_s=30.0, splits=None):
+    """
+    Runs autotune() on the first variant of each dp level in the spec.
+    """
+    xml_path = Path(spec.case)
+    tree_orig, _, _ = load_xml_with_sanitize(xml_path)
+    base = xml_path.stem[:-4] if xml_path.stem.endswith("_Def") else xml_path.stem
+    case_dir = xml_path.parent
+    cfg = spec.run
+    gencase_cache = None
+    if cfg.get("cache", True):
+        gencase_cache = GenCaseCache(case_dir / GENCASE_CACHE_DIRNAME,
+                                     max_bytes=int(cfg.get("cache_gib", 20) * 1024**3))
+    stager = AssetStager(case_dir, cfg.get("staging", "auto")) if (case_dir / "data").is_dir() else None
+    tuning = ThreadTuning(case_dir / TUNING_NAME)
+    seen = {}
+    for point in spec:
+        seen.setdefault(point[0], point)
+    for dp in sorted(seen, reverse=True):
+        autotune(tree_orig, case_dir, base, seen[dp], spec.unit, cores=cores, slice_s=slice_s, splits=splits,
+                 tuning=tuning, gencase_cache=gencase_cache, plan=XmlPatchPlan(tree_orig), stager=stager)
+    print("\n" + tuning.describe())
+    return tuning
+
+def load_tuning(case_dir: Path, cfg):
+    """
+    The case's ThreadTuning if cfg allows it (omp_tuning, CPU mode) and
+    something was measured on this host, else None.
+    """
+    if not cfg.get("omp_tuning", True) or str(cfg.get("mode", "cpu")).lower().startswith("g"):
+        return None
+    tuning = ThreadTuning(case_dir / TUNING_NAME)
+    return tuning if tuning.entries else None
+
+# ---------------------------------------------------------------------------
+# TimeMax prefix sharing: shorter durations as views onto the longest run.
+# ---------------------------------------------------------------------------
+
+VIEW_NAME = "prefix_view.json"
+
+def is_prefix_view(variant_dir: Path):
+    return (variant_dir / VIEW_NAME).exists()
+
+def share_time_prefixes(combos, unit):
+    """
+    Variants that differ only in TimeMax are the same simulation up to the
+    shorter end time (update_mvrotsinu sets duration = TimeMax, so the
+    motion is identical until then). Returns (combos without the shorter
+    ones, {longest variant name: [shorter combos]}). Variants that keep the
+    case's default TimeMax (t < 0) are never shared.
+    """
+    def key(c):
+        return (c[0], c[2], c[3], tuple(getattr(c, "solver_flags", ())))
+    longest = {}
+    for c in combos:
+        if c[1] is not None and c[1] >= 0 and (key(c) not in longest or c[1] > longest[key(c)][1]):
+            longest[key(c)] = c
+    views = {}
+    for c in combos:
+        parent = longest.get(key(c))
+        if parent is not None and c[1] is not None and 0 <= c[1] < parent[1]:
+            views.setdefault(variant_name_for(*parent, unit), []).append(c)
+    if not views:
+        return combos, {}
+    shorter = {variant_name_for(*c, unit) for group in views.values() for c in group}
+    return _SkipNames(combos, shorter, unit), views
+
+def make_prefix_view(case_dir: Path, base: str, parent_dir: Path, combo, unit, plan=None):
+    """
+    Builds the variant folder of a shorter-TimeMax combo from the parent
+    run in parent_dir: Part_Head and Parts 0..N (plus their VTK files)
+    linked into out/, a metrics.jsonl cut at t_end (no wall time, so the
+    cost model ignores it) and prefix_view.json naming the parent.
+    Returns the view's folder, or None if the parent did not reach t_end.
+    An existing out/ in the view's folder is replaced.
+    """
+    name = variant_name_for(*combo, unit)
+    t_end = combo[1]
+    view_dir = case_dir / f"{base}__{name}"
+    restore_archived_output(parent_dir)
+    t0 = warm_start_offset(parent_dir)
+    times = {n: t - t0 for n, t in part_times(parent_dir).items()}
+    eps = 1e-6 * max(1.0, t_end)
+    if max(times.values()) < t_end - eps:
+        print(f"  {name}: parent stopped at t={max(times.values()):g}s, before t={t_end:g}s; no view")
+        return None
+    parts = {n for n, t in times.items() if t <= t_end + eps}
+    last = max(parts)
+    shutil.rmtree(view_dir / "out", ignore_errors=True)
+    data_dir = view_dir / "out" / "data"
+    data_dir.mkdir(parents=True)
+    src_data = parent_dir / "out" / "data"
+    for n in sorted(parts):
+        if (src_data / f"Part_{n:04d}.bi4").exists():
+            _link_or_copy(src_data / f"Part_{n:04d}.bi4", data_dir / f"Part_{n:04d}.bi4")
+    if (src_data / "Part_Head.ibi4").exists():
+        _link_or_copy(src_data / "Part_Head.ibi4", data_dir / "Part_Head.ibi4")
+    for vtk in (parent_dir / "out").glob("*.vtk"):
+        m = re.search(r"_(\d{4,})\.vtk$", vtk.name)
+        if m is None or int(m.group(1)) in parts:
+            _link_or_copy(vtk, view_dir / "out" / vtk.name)
+    logs_dir = view_dir / "logs"
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    summary = {"kind": "summary", "parts": 0, "sim_time": 0.0, "total_steps": 0, "particles_out": 0,
+               "dtmin_adjusted": 0, "return_code": 0, "view_of": parent_dir.name,
+               **({"t_start": t0} if t0 else {})}
+    with (parent_dir / "logs" / "metrics.jsonl").open("r", encoding="utf-8") as src, \
+            (logs_dir / "metrics.jsonl").open("w", encoding="utf-8") as dst:
+        for line in src:
+            rec = json.loads(line)
+            kind = rec.get("kind")
+            if kind == "summary":
+                summary["info"] = dict(rec.get("info") or {}, TimeMax=t0 + t_end)
+                continue
+            if kind == "info":
+                rec["TimeMax"] = t0 + t_end
+            elif kind == "part":
+                if rec["part"] > last:
+                    continue
+                summary.update(parts=summary["parts"] + 1, sim_time=rec["part_time"] - t0,
+                               total_steps=rec["total_steps"])
+            elif kind in ("out", "mem") and rec["part_time"] > t0 + t_end + eps:
+                continue
+            elif kind == "dtmin" and rec["t"] > t0 + t_end + eps:
+                continue
+            if kind == "out":
+                summary["particles_out"] = rec["total_out"]
+            elif kind == "dtmin":
+                summary["dtmin_adjusted"] = rec["count"]
+            dst.write(json.dumps(rec) + "\n")
+        dst.write(json.dumps(summary) + "\n")
+    if t0:
+        shutil.copy2(parent_dir / WARM_START_NAME, view_dir / WARM_START_NAME)
+    else:
+        (view_dir / WARM_START_NAME).unlink(missing_ok=True)
+    if plan is not None:
+        (view_dir / f"{base}_Def.xml").write_bytes(plan.emit(*combo, unit, verbose=False, t_start=t0))
+    (view_dir / VIEW_NAME).write_text(json.dumps({"parent": parent_dir.name, "t_end": t_end, "last_part": last},
+                                                 indent=1), encoding="utf-8")
+    return view_dir
+
+def build_prefix_views(case_dir: Path, base: str, views, unit, plan=None, manifest=None, diag_cfg=None):
+    """
+    make_prefix_view() for every shorter combo whose parent has solver
+    output, then diagnostics on the view if configured. Returns a result
+    dict per view, shaped like run_variant()'s.
+    """
+    results = []
+    for parent_name, group in views.items():
+        parent_dir = case_dir / f"{base}__{parent_name}"
+        if not read_solver_summary(parent_dir):
+            print(f"  No solver output for {parent_name}; its {len(group)} shorter variant(s) were not produced")
+            continue
+        for combo in sorted(group, key=lambda c: c[1]):
+            start_t = time.time()
+            name = variant_name_for(*combo, unit)
+            own_dir = case_dir / f"{base}__{name}"
+            if not is_prefix_view(own_dir) and read_solver_summary(own_dir):
+                print(f"  {name}: has a solver run of its own, left as is")
+                continue
+            view_dir = make_prefix_view(case_dir, base, parent_dir, combo, unit, plan=plan)
+            result = {"name": name, "dir": view_dir, "combo": combo, "ok": view_dir is not None,
+                      "stage": "done" if view_dir is not None else "view", "view_of": parent_name}
+            if view_dir is not None and diag_cfg:
+                result["diagnostics"] = run_post_diagnostics(view_dir, view_dir / "out", diag_cfg)
+            if manifest is not None:
+                manifest.begin(name, combo, unit, f"view:{parent_name}")
+                manifest.variant_end(name, "done" if result["ok"] else "failed", f"view of {parent_name}")
+            result["elapsed"] = time.time() - start_t
+            results.append(result)
+            if result["ok"]:
+                print(f"  {name}: view onto Parts up to {json.loads((view_dir / VIEW_NAME).read_text())['last_part']} "
+                      f"of {parent_name}")
+    return results
+
+# ---------------------------------------------------------------------------
+# Convergence study: dp levels coarse to fine, stop once results converge.
+# ---------------------------------------------------------------------------
+
+CONVERGENCE_TOLERANCE = 0.02
+
+def _ladders(combos):
+    """
+    Groups combos that differ only in dp, each sorted coarse to fine.
+    """
+    ladders = {}
+    for combo in combos:
+        key = (tuple(combo[1:]), tuple(getattr(combo, "solver_flags", ())))
+        ladders.setdefault(key, []).append(combo)
+    return [sorted(ladder, key=lambda c: -c[0]) for ladder in ladders.values()]
+
+def _level_diagnostics(result):
+    path = result.get("diagnostics") or result["dir"] / "out" / "diagnostics.npz"
+    if not Path(path).exists():
+        return None
+    import sloshdiag
+    return sloshdiag.load_diagnostics(path)
+
+def run_convergence(tree_orig, case_dir: Path, base: str, combos, unit, cfg, variant_opts, cost_model=None):
+    """
+    Solves each dp ladder (variants differing only in dp) coarse to fine.
+    After each level the sloshing diagnostics are compared with the previous
+    level's (series L2 error and peak values); once the largest relative
+    change is within cfg["convergence"]["tolerance"] the finer levels are
+    skipped. Prints and saves <base>_convergence.json with the converged
+    values (Richardson-extrapolated when three levels exist), the observed
+    order and the compute avoided. Returns the results of the variants run.
+    """
+    try:
+        import convergence
+    except ImportError as e:
+        print(f"  !! Convergence checks need numpy ({e}); every dp level will be run.")
+        convergence = None
+    conv = cfg.get("convergence") or {}
+    tol = float(conv.get("tolerance", CONVERGENCE_TOLERANCE))
+    keys = tuple(conv.get("quantities") or (convergence.SERIES if convergence else ()))
+    min_levels = max(2, int(conv.get("min_levels", 2)))
+    results, report = [], []
+    for ladder in _ladders(combos):
+        label = variant_name_for(*ladder[0], unit).split("__", 1)[1]
+        print(f"\n{'='*60}\nConvergence study {label}: dp {', '.join(f'{c[0]:g}' for c in ladder)} "
+              f"(tolerance {100 * tol:g}%)\n{'='*60}")
+        levels, converged = [], None
+        for combo in ladder:
+            result = run_variant(tree_orig, case_dir, base, combo, unit, **variant_opts)
+            results.append(result)
+            if cost_model is not None:
+                cost_model.observe(result["dir"])
+            level = {"dp": combo[0], "name": result["name"], "ok": result["ok"], "elapsed": result["elapsed"],
+                     "solver_s": read_solver_summary(result["dir"]).get("wall_time")}
+            diag = _level_diagnostics(result) if (convergence and result["ok"]) else None
+            compared = [lv for lv in levels if "_diag" in lv]
+            if diag is not None:
+                level["_diag"] = diag
+                level["peaks"] = convergence.peak_values(diag)
+                if compared:
+                    level["change"], level["quantity"] = convergence.level_change(compared[-1]["_diag"], diag, keys)
+            levels.append(level)
+            change = level.get("change")
+            print(f"\n[convergence {label}] dp={combo[0]:g} "
+                  + ("failed" if not result["ok"] else
+                     f"max change vs previous level {100 * change:.2f}% ({level['quantity']})" if change is not None
+                     else "no previous level to compare" if diag is not None else "no diagnostics"))
+            if change is not None and change <= tol and len(compared) + 1 >= min_levels:
+                converged = level
+                break
+        skipped = ladder[len(levels):]
+        avoided = sum(cost_model.predict(c[0], c[1]).seconds for c in skipped) if cost_model is not None else None
+        with_diag = [lv for lv in levels if "_diag" in lv]
+        values = {}
+        for name in (with_diag[-1]["peaks"] if with_diag else {}):
+            series = [lv["peaks"][name] for lv in with_diag if name in lv["peaks"]]
+            entry = {"finest": series[-1], "value": series[-1], "order": None, "gci": None}
+            if len(series) >= 3 and len(series) == len(with_diag):
+                rich = convergence.richardson(series[-3], series[-2], series[-1],
+                                              *(lv["dp"] for lv in with_diag[-3:]))
+                if rich:
+                    entry.update(value=rich["extrapolated"], order=rich["order"], gci=rich["gci"])
+            values[name] = entry
+        spent = sum(lv["solver_s"] or lv["elapsed"] for lv in levels)
+        print(f"\nConvergence {label}: " + (f"converged at dp={converged['dp']:g}" if converged else
+                                            f"NOT converged within {100 * tol:g}% at dp={levels[-1]['dp']:g}"))
+        for name, v in values.items():
+            extra = (f" (Richardson, observed order {v['order']:.2f}, GCI {100 * v['gci']:.2f}%)"
+                     if v["order"] is not None else " (finest level)")
+            print(f"  {name:<28} {v['value']:.6g}{extra}")
+        print(f"  Solver time spent: {format_duration(spent)}"
+              + (f"; skipped dp {', '.join(f'{c[0]:g}' for c in skipped)}, ~{format_duration(avoided)} avoided"
+                 if skipped and avoided is not None else ""))
+        report.append({"ladder": label, "tolerance": tol, "converged_dp": converged["dp"] if converged else None,
+                       "levels": [{k: v for k, v in lv.items() if k != "_diag"} for lv in levels],
+                       "skipped_dp": [c[0] for c in skipped], "values": values, "spent_s": spent,
+                       "avoided_s": avoided})
+    out_path = case_dir / f"{base}_convergence.json"
+    out_path.write_text(json.dumps(report, indent=1), encoding="utf-8")
+    total_avoided = sum(r["avoided_s"] or 0.0 for r in report)
+    print(f"\nConvergence report: {out_path} • ~{format_duration(total_avoided)} of solver time avoided")
+    return results
+
+# ---------------------------------------------------------------------------
+# Adaptive freq x ampl sampling: seed grid, GP surrogate, refine where unsure.
+# ---------------------------------------------------------------------------
+
+ADAPTIVE_DEFAULTS = {"metric": "moment", "budget": 30, "tolerance": 0.02, "batch": 1, "grid": 41,
+                     "gradient_weight": 2.0}
+
+def _surfaces(combos):
+    """
+    Groups combos that differ only in freq/ampl: {(dp, t_end, flags): [combos]}.
+    """
+    surfaces = {}
+    for combo in combos:
+        key = (combo[0], combo[1], tuple(getattr(combo, "solver_flags", ())))
+        surfaces.setdefault(key, []).append(combo)
+    return surfaces
+
+def run_adaptive(tree_orig, case_dir: Path, base: str, combos, unit, cfg, variant_opts, cost_model=None,
+                 parallel_opts=None):
+    """
+    Response-surface sampling over (freq, ampl) for each (dp, t_end) in the
+    sweep. The sweep's own freq/ampl values are the seed runs and span the
+    sampling box. After each round a Gaussian process is fitted to the
+    response (cfg["adaptive"]["metric"], from the sloshing diagnostics) and
+    the next `batch` points are taken where its uncertainty, weighted by
+    the slope of the surface, is largest. Stops once the largest predictive
+    std on the candidate grid is within `tolerance` of the response range
+    or `budget` runs (seeds included) have been made. With parallel_opts
+    each batch goes through run_variants_parallel(). Saves the surfaces to
+    <base>_response_surface.npz and a report to <base>_response_surface.json.
+    Returns the results of the variants run.
+    """
+    import sweepspec
+    try:
+        import numpy as np
+        import surrogate
+    except ImportError as e:
+        print(f"  !! Adaptive sampling needs numpy ({e}); running the seed grid only.")
+        return [run_variant(tree_orig, case_dir, base, c, unit, **variant_opts) for c in combos]
+    opts = dict(ADAPTIVE_DEFAULTS, **(cfg.get("adaptive") or {}))
+    metric, budget, tol = opts["metric"], int(opts["budget"]), float(opts["tolerance"])
+    if metric not in surrogate.METRICS:
+        raise ValueError(f"adaptive metric must be one of {', '.join(surrogate.METRICS)}, not {metric!r}")
+    results, report, arrays = [], [], {}
+
+    def run_batch(batch, samples, failed):
+        if parallel_opts is not None:
+            batch_results = run_variants_parallel(tree_orig, case_dir, base, batch, unit, cost_model=cost_model,
+                                                  **parallel_opts, **variant_opts)
+        else:
+            batch_results = [run_variant(tree_orig, case_dir, base, c, unit, **variant_opts) for c in batch]
+        results.extend(batch_results)
+        for result in batch_results:
+            if cost_model is not None:
+                cost_model.observe(result["dir"])
+            diag = _level_diagnostics(result) if result["ok"] else None
+            point = tuple(result["combo"][2:])
+            value = surrogate.response_value(diag, metric) if diag else None
+            if value is None:
+                failed.add(point)
+            else:
+                samples[point] = value
+
+    for (dp, t_end, flags), seeds in _surfaces(combos).items():
+        label = f"{safe_val_tag('dp', dp)}__{safe_val_tag('t', t_end)}"
+        lo = [min(c[2] for c in seeds), min(c[3] for c in seeds)]
+        hi = [max(c[2] for c in seeds), max(c[3] for c in seeds)]
+        axes, grid = surrogate.candidate_grid(lo, hi, int(opts["grid"]))
+        print(f"\n{'='*60}\nAdaptive sampling {label}: freq {lo[0]:g}-{hi[0]:g} Hz, ampl {lo[1]:g}-{hi[1]:g} {unit}, "
+              f"{len(seeds)} seed run(s), budget {budget}, {metric} within {100 * tol:g}%\n{'='*60}")
+        samples, failed, rounds = {}, set(), []
+        run_batch(seeds, samples, failed)
+        gp, stop, worst = None, None, None
+        while True:
+            if len(samples) < 2:
+                stop = "fewer than two usable runs"
+                break
+            x = np.array(list(samples.keys()))
+            y = np.array(list(samples.values()))
+            gp = surrogate.GaussianProcess(lo, np.subtract(hi, lo)).fit(x, y)
+            mean, std = gp.predict(grid)
+            worst = float(std.max() / np.ptp(y)) if np.ptp(y) > 0 else 0.0
+            print(f"\n[adaptive {label}] {len(samples)} run(s): peak {metric} {y.max():.6g} at "
+                  f"f={x[y.argmax()][0]:g}, a={x[y.argmax()][1]:g}; surrogate max std {100 * worst:.2f}% of range")
+            if worst <= tol:
+                stop = "accuracy target reached"
+                break
+            n_run = len(samples) + len(failed)
+            if n_run >= budget:
+                stop = "run budget used"
+                break
+            picks = surrogate.next_points(gp, x, y, axes, grid, batch=min(int(opts["batch"]), budget - n_run),
+                                          gradient_weight=float(opts["gradient_weight"]), exclude=failed)
+            if not picks:
+                stop = "no candidate points left"
+                break
+            rounds.append([{"freq": p[0], "ampl": p[1], "score": sc, "predicted": m, "std": sd}
+                           for p, sc, m, sd in picks])
+            print(f"[adaptive {label}] next: " + ", ".join(f"f={p[0]:g} a={p[1]:g}" for p, *_ in picks))
+            batch = [sweepspec.SweepPoint((dp, t_end, p[0], p[1]), flags) for p, *_ in picks]
+            run_batch(batch, samples, failed)
+        print(f"\nAdaptive sampling {label}: {stop} after {len(samples) + len(failed)} run(s) "
+              f"(a full {len(axes[0])}x{len(axes[1])} grid would be {len(grid)})")
+        entry = {"surface": label, "dp": dp, "t_end": t_end, "solver_flags": list(flags), "metric": metric,
+                 "stop": stop, "runs": len(samples) + len(failed), "seeds": len(seeds), "max_std_rel": worst,
+                 "samples": [{"freq": p[0], "ampl": p[1], "value": v} for p, v in samples.items()],
+                 "failed": [{"freq": p[0], "ampl": p[1]} for p in failed], "rounds": rounds}
+        if gp is not None:
+            shape = (len(axes[0]), len(axes[1]))
+            mean, std = (a.reshape(shape) for a in gp.predict(grid))
+            ridge = mean.argmax(axis=0)
+            entry["resonance"] = [{"ampl": float(a), "freq": float(axes[0][i]), "value": float(mean[i, j])}
+                                  for j, (a, i) in enumerate(zip(axes[1], ridge))]
+            entry["length_scales"] = [float(v) for v in gp.ls]
+            arrays.update({f"{label}__freq": axes[0], f"{label}__ampl": axes[1], f"{label}__mean": mean,
+                           f"{label}__std": std, f"{label}__samples": np.array(
+                               [[p[0], p[1], v] for p, v in samples.items()])})
+            print(f"  Resonance (surrogate peak per amplitude): "
+                  + ", ".join(f"a={r['ampl']:g}: f={r['freq']:g}" for r in entry["resonance"][::max(1, len(ridge) // 5)]))
+        report.append(entry)
+    out_base = case_dir / f"{base}_response_surface"
+    if arrays:
+        np.savez_compressed(out_base.with_suffix(".npz"), **arrays)
+    out_base.with_suffix(".json").write_text(json.dumps(report, indent=1), encoding="utf-8")
+    print(f"\nResponse surfaces: {out_base.with_suffix('.json')}" + (f" and {out_base.with_suffix('.npz').name}"
+                                                                   if arrays else ""))
+    return results
+
+# ---------------------------------------------------------------------------
+# Pre-flight size check: particles, cells and memory per dp before GenCase.
+# ---------------------------------------------------------------------------
+
+PREFLIGHT_DEFAULTS = {"max_np": None, "max_cells": None, "max_mem_gib": None, "action": "refuse", "logs": []}
+
+def physical_memory_bytes():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+class Preflight:
+    """
+    Size of each dp from the _Def.xml geometry alone (preflight.py),
+    calibrated on the CaseNfluid/CaseNbound and allocated memory of the
+    variants already solved in the case directory plus any solver logs
+    listed in opts["logs"]. Limits are opts max_np / max_cells /
+    max_mem_gib; the memory limit defaults to default_mem_gib.
+    """
+    def __init__(self, tree_orig, opts=None, default_mem_gib=None):
+        import preflight
+        self._pf = preflight
+        self.opts = dict(PREFLIGHT_DEFAULTS, **(opts or {}))
+        self.geometry = preflight.CaseGeometry.from_tree(tree_orig)
+        self.calibration = preflight.Calibration()
+        self.max_mem_gib = self.opts["max_mem_gib"] or default_mem_gib
+        self._cache = {}
+
+    @classmethod
+    def from_case_dir(cls, tree_orig, case_dir: Path, base: str, opts=None, default_mem_gib=None):
+        pf = cls(tree_orig, opts, default_mem_gib)
+        with tracing.span("scan.preflight_history", "scan"):
+            for variant_dir in sorted(case_dir.glob(f"{base}__*")):
+                if not is_prefix_view(variant_dir):
+                    pf.observe(read_solver_summary(variant_dir))
+        for log in pf.opts["logs"]:
+            path = Path(log) if Path(log).is_absolute() else case_dir / log
+            try:
+                with path.open("r", encoding="utf-8", errors="replace") as fh:
+                    parser = PartTableParser()
+                    for line in fh:
+                        parser.feed(line)
+            except OSError as e:
+                print(f"  !! Pre-flight calibration log skipped: {e}")
+                continue
+            pf.observe(parser.summary())
+        return pf
+
+    def observe(self, summ):
+        """
+        Adds one solved run (a metrics summary) to the calibration.
+        """
+        info = summ.get("info") or {}
+        dp = info.get("Dp")
+        if not isinstance(dp, (int, float)) or dp <= 0:
+            return False
+        self._cache.clear()
+        return self.calibration.add(self._pf.estimate(self.geometry, float(dp), raw=True), info,
+                                    summ.get("mem_final"))
+
+    def estimate(self, dp):
+        if dp not in self._cache:
+            self._cache[dp] = self._pf.estimate(self.geometry, dp, self.calibration)
+        return self._cache[dp]
+
+    def check(self, dp):
+        """
+        (Estimate, [limits exceeded]) for one dp.
+        """
+        est = self.estimate(dp)
+        over = []
+        max_np, max_cells = self.opts["max_np"], self.opts["max_cells"]
+        if max_np and est.particles > max_np:
+            over.append(f"{est.particles:,} particles > {int(max_np):,}")
+        if max_cells and est.n_cells > max_cells:
+            over.append(f"{est.n_cells:,} cells > {int(max_cells):,}")
+        if self.max_mem_gib and est.mem_bytes > self.max_mem_gib * 1024**3:
+            over.append(f"{est.mem_bytes / 1024**3:,.1f} GiB > {self.max_mem_gib:.3g} GiB")
+        return est, over
+
+    def describe(self):
+        limits = []
+        if self.opts["max_np"]:
+            limits.append(f"{int(self.opts['max_np']):,} particles")
+        if self.opts["max_cells"]:
+            limits.append(f"{int(self.opts['max_cells']):,} cells")
+        if self.max_mem_gib:
+            limits.append(f"{self.max_mem_gib:.3g} GiB")
+        geometry = ""
+        if self.geometry.unsupported:
+            geometry = f"; not replayed: {', '.join(sorted(self.geometry.unsupported))}"
+        return (f"Pre-flight ({self.geometry.dims}D, {self.calibration.describe()}{geometry}), "
+                f"limits: {', '.join(limits) if limits else 'none'}")
+
+def preflight_check(tree_orig, case_dir: Path, base: str, combos, unit, cfg, default_mem_gib=None):
+    """
+    Prints the pre-flight estimate of every dp in combos and returns
+    (Preflight or None, names of the variants over a limit). None when
+    the check is off (preflight = false) or the geometry is unreadable.
+    """
+    opts = cfg.get("preflight", True)
+    if opts is False:
+        return None, set()
+    try:
+        pf = Preflight.from_case_dir(tree_orig, case_dir, base, opts if isinstance(opts, dict) else None,
+                                     default_mem_gib)
+    except (ImportError, ValueError) as e:
+        print(f"Pre-flight check skipped: {e}")
+        return None, set()
+    print("\n" + pf.describe())
+    over, seen = set(), {}
+    for combo in combos:
+        dp = combo[0]
+        if dp not in seen:
+            est, reasons = pf.check(dp)
+            seen[dp] = reasons
+            print(f"  dp={dp:<10g} {est}" + (f"  OVER: {'; '.join(reasons)}" if reasons else ""))
+        if seen[dp]:
+            over.add(variant_name_for(*combo, unit))
+    return pf, over
+
+class _DeferNames:
+    """
+    Re-iterable view of combos with the named variants moved to the end.
+    """
+    def __init__(self, combos, names, unit):
+        self.combos, self.names, self.unit = combos, names, unit
+
+    def __iter__(self):
+        yield from (c for c in self.combos if variant_name_for(*c, self.unit) not in self.names)
+        yield from (c for c in self.combos if variant_name_for(*c, self.unit) in self.names)
+
+    def __len__(self):
+        return len(self.combos)
+
+# ---------------------------------------------------------------------------
+# Results index: one columnar store per case, cross-resolution comparison.
+# ---------------------------------------------------------------------------
+
+INDEX_AGGREGATES = {"max": "nanmax", "min": "nanmin", "mean": "nanmean", "last": None}
+
+def build_results_index(case_dir: Path, base: str):
+    """
+    Refreshes <base>_results.npz from the variant folders (resultsindex.py,
+    needs numpy); only variants whose metrics or diagnostics changed are
+    read again. Returns the ResultsIndex, or None without numpy.
+    """
+    try:
+        import resultsindex
+    except ImportError as e:
+        print(f"  !! Results index skipped (numpy missing?): {e}")
+        return None
+    start_t = time.time()
+    with tracing.span("index"):
+        index, path, rescanned = resultsindex.update_index(case_dir, base)
+    print(f"Results index: {len(index)} variant(s), {len(index.rows['part'])} row(s), {rescanned} read again "
+          f"in {time.time() - start_t:.1f}s -> {path}")
+    return index
+
+def parse_where(items):
+    """
+    {"ampl": 6.0, ...} from ["ampl=6", "dp=0.01,0.005", ...].
+    """
+    where = {}
+    for item in items or ():
+        key, _, value = item.partition("=")
+        values = [float(v) for v in value.split(",") if v.strip()]
+        where[key.strip()] = values[0] if len(values) == 1 else values
+    return where
+
+def query_index(case_dir: Path, base: str, column=None, agg="max", where=None, at=None):
+    """
+    Prints the variants matching where; with column, one value per variant:
+    agg over the series, or the value at the Part nearest to time at.
+    """
+    index = build_results_index(case_dir, base)
+    if index is None:
+        return None
+    import numpy as np
+    where = where or {}
+    if column is None:
+        print(index.table(index.select(**where)))
+        print(f"Columns: {', '.join(index.columns) or '(none)'}")
+        return index
+    if column not in index.rows:
+        print(f"No column {column!r} in the index. Columns: {', '.join(index.columns) or '(none)'}")
+        return index
+    if at is not None:
+        idx, values = index.at_time(column, at, **where)
+        label = f"{column}@t={at:g}"
+    elif INDEX_AGGREGATES[agg] is None:
+        idx, values = index.at_time(column, float("inf"), **where)
+        label = f"last {column}"
+    else:
+        idx, values = index.aggregate(column, getattr(np, INDEX_AGGREGATES[agg]), **where)
+        label = f"{agg} {column}"
+    print(index.table(idx, values, label))
+    return index
+
+def compare_variants(dir_a: Path, dir_b: Path, t, scalars=("vel", "pressure", "rho")):
+    """
+    Prints the difference of the particle fields of two variants at time t
+    (resultsindex.compare_fields; put the coarser variant first).
+    """
+    try:
+        import resultsindex
+    except ImportError as e:
+        print(f"  !! Comparison skipped (numpy missing?): {e}")
+        return None
+    dir_a, dir_b = Path(dir_a).resolve(), Path(dir_b).resolve()
+    for variant_dir in (dir_a, dir_b):
+        restore_archived_output(variant_dir)
+    start_t = time.time()
+    try:
+        res = resultsindex.compare_fields(dir_a / "out" / "data", dir_b / "out" / "data", t, scalars,
+                                          t_offset_a=warm_start_offset(dir_a), t_offset_b=warm_start_offset(dir_b))
+    except (OSError, ValueError) as e:
+        print(f"  !! Cannot compare {dir_a.name} with {dir_b.name}: {e}")
+        return None
+    print(f"{dir_a.name} (t={res['time_a']:g}s) vs {dir_b.name} (t={res['time_b']:g}s): "
+          f"{res['matched']}/{res['n']} particles matched in {time.time() - start_t:.1f}s")
+    print(f"  {'field':<10} {'L2':>12} {'rel L2':>10} {'max':>12} {'mean A':>12} {'mean B':>12}")
+    for s in scalars:
+        r = res[s]
+        print(f"  {s:<10} {r['l2']:>12.5g} {r['rel_l2']:>10.4g} {r['linf']:>12.5g} {r['mean_a']:>12.5g} "
+              f"{r['mean_b']:>12.5g}")
+    return res
+
+# ---------------------------------------------------------------------------
+# Sweep execution (shared by the interactive prompts and sweep spec files).
+# ---------------------------------------------------------------------------
+
+TRACE_SUFFIX = "_trace.json"
+
+def plan_sweep(tree_orig, combos, unit, cfg, cost_model, show=None, tuning=None):
+    """
+    Walks combos once (lazily) and predicts each variant's cost. Prints the
+    first `show` rows (all when None) and returns the totals plus the names
+    of variants over cfg["budget_s"].
+    """
+    parallel = cfg.get("scheduler") == "parallel"
+    gpu = str(cfg.get("mode", "cpu")).startswith("g")
+    max_cores = cfg.get("cores") or os.cpu_count() or 1
+    pipeline_threads = None
+    if cfg.get("scheduler") == "pipeline" and not gpu:
+        pipeline_threads = max(1, (os.cpu_count() or 1) - 1 - int(cfg.get("post_workers", 1)))
+    budget = cfg.get("budget_s") or 0
+    totals = {"count": 0, "particles": 0, "seconds": 0.0, "low": 0.0, "high": 0.0, "largest": None, "over": []}
+    for combo in combos:
+        threads = pipeline_threads
+        if parallel and not gpu:
+            threads = estimate_variant_resources(tree_orig, combo[0], max_cores, tuning)["threads"]
+        elif tuning is not None:
+            threads = tuning.threads_for(combo[0], max_cores=threads or max_cores)
+        pred = cost_model.predict(combo[0], combo[1], threads)
+        name = variant_name_for(*combo, unit)
+        if show is None or totals["count"] < show:
+            flags = " ".join(getattr(combo, "solver_flags", ()))
+            print(f"  {name:<40} ~{pred.particles:>10,} particles ~{pred.steps:>9,} steps  {pred}"
+                  + (f"  [{flags}]" if flags else ""))
+        elif show and totals["count"] == show:
+            print("  ...")
+        totals["count"] += 1
+        totals["particles"] += pred.particles
+        totals["seconds"] += pred.seconds
+        totals["low"] += pred.low
+        totals["high"] += pred.high
+        if totals["largest"] is None or pred.seconds > totals["largest"][1].seconds:
+            totals["largest"] = (name, pred)
+        if budget > 0 and pred.seconds > budget:
+            totals["over"].append(name)
+    return totals
+
+def dry_run(tree_orig, case_dir: Path, base: str, combos, unit, cfg, show=20):
+    """
+    Expands the sweep and prints particle-count and cost estimates without
+    running anything.
+    """
+    cost_model = CostModel.from_case_dir(tree_orig, case_dir, base,
+                                         device="gpu" if str(cfg.get("mode", "cpu")).startswith("g") else "cpu")
+    print(cost_model.describe())
+    tuning = load_tuning(case_dir, cfg)
+    if tuning is not None:
+        print(tuning.describe())
+    totals = plan_sweep(tree_orig, combos, unit, cfg, cost_model, show=show, tuning=tuning)
+    print(f"\nVariants: {totals['count']:,}")
+    print(f"Particles, all variants: ~{totals['particles']:,}")
+    print(f"Predicted solver time, all variants: ~{format_duration(totals['seconds'])} "
+          f"({format_duration(totals['low'])}-{format_duration(totals['high'])})")
+    if totals["largest"]:
+        print(f"Largest variant: {totals['largest'][0]} {totals['largest'][1]}")
+    if totals["over"]:
+        print(f"Over the {format_duration(cfg['budget_s'])} budget: {len(totals['over'])} variant(s)")
+    phys = physical_memory_bytes()
+    _, oversize = preflight_check(tree_orig, case_dir, base, combos, unit, cfg,
+                                  default_mem_gib=cfg.get("memory_gib") or (phys / 1024**3 if phys else None))
+    if oversize:
+        print(f"Over the pre-flight limits: {len(oversize)} variant(s)")
+    totals["oversize"] = sorted(oversize)
+    return totals
+
+def run_sweep(tree_orig, case_dir: Path, base: str, combos, unit, cfg, interactive=False):
+    """
+    Runs every combo with the options in cfg (keys as sweepspec.RUN_DEFAULTS).
+    combos may be a list or anything that can be iterated more than once,
+    such as a SweepSpec; it is walked lazily. interactive asks for the
+    budget on the console instead of reading it from cfg. With cfg["trace"]
+    every stage is traced into <base>_trace.json (also when the sweep
+    stops early) and the top stages are printed.
+    """
+    if not cfg.get("trace"):
+        return _run_sweep(tree_orig, case_dir, base, combos, unit, cfg, interactive)
+    tracing.start()
+    try:
+        with tracing.span("sweep", "sweep"):
+            return _run_sweep(tree_orig, case_dir, base, combos, unit, cfg, interactive)
+    finally:
+        tracer = tracing.stop()
+        path = tracer.export(case_dir / f"{base}{TRACE_SUFFIX}")
+        print("\nTop stages across the sweep:")
+        print(tracer.format_summary())
+        print(f"Trace: {path} (open in https://ui.perfetto.dev or chrome://tracing)")
+
+def _run_sweep(tree_orig, case_dir: Path, base: str, combos, unit, cfg, interactive=False):
+    requested = combos
+    run_solver = cfg.get("solver", True)
+    mode = str(cfg.get("mode", "cpu")).lower()
+    parallel = cfg.get("scheduler") == "parallel"
+    pipelined = cfg.get("scheduler") == "pipeline"
+    gencase_cache = None
+    if cfg.get("cache", True):
+        gencase_cache = GenCaseCache(case_dir / GENCASE_CACHE_DIRNAME,
+                                     max_bytes=int(cfg.get("cache_gib", 20) * 1024**3))
+    plan = XmlPatchPlan(tree_orig)
+    diag_cfg = None
+    study = bool(cfg.get("convergence")) and run_solver
+    adaptive = bool(cfg.get("adaptive")) and run_solver and not study
+    if run_solver and (cfg.get("diagnostics") or study or adaptive):
+        diag_cfg = dict(cfg.get("diagnostics") or {})
+        diag_cfg.setdefault("axis", rotation_axis_point(tree_orig))
+        diag_cfg["probes"] = [tuple(p) for p in diag_cfg.get("probes", ())]
+    manifest = SweepManifest(case_dir / MANIFEST_NAME, case_dir) if cfg.get("manifest", True) else None
+    stager = AssetStager(case_dir, cfg.get("staging", "auto")) if (case_dir / "data").is_dir() else None
+    tuning = load_tuning(case_dir, cfg) if run_solver else None
+    variant_opts = dict(run_solver=run_solver, mode=mode, gencase_cache=gencase_cache, plan=plan,
+                        watchdog_cfg=cfg.get("watchdog") if run_solver else None, diag_cfg=diag_cfg,
+                        manifest=manifest, stager=stager, output=cfg.get("output", "full"))
+    warm = None
+    if run_solver and cfg.get("warm_start"):
+        warm = WarmStarter(tree_orig, case_dir, base, unit, cfg["warm_start"].get("settle_s", 0.5), variant_opts)
+        variant_opts["warm"] = warm
+    quota_bytes = float(cfg.get("quota_gib") or 0) * 1024**3
+    cost_model, totals, n_total = None, None, None
+    phys = physical_memory_bytes()
+    _, oversize = preflight_check(tree_orig, case_dir, base, combos, unit, cfg,
+                                  default_mem_gib=cfg.get("memory_gib") or (phys / 1024**3 if phys else None))
+    deferred = set()
+    if oversize:
+        action = dict(PREFLIGHT_DEFAULTS, **(cfg["preflight"] if isinstance(cfg.get("preflight"), dict) else {}))["action"]
+        print(f"\n⚠ {len(oversize)} variant(s) over the pre-flight limits")
+        if interactive:
+            action = get_choice("Refuse them, defer them to the end of the sweep, or run them anyway (refuse/defer/run)",
+                                "refuse", choices=("refuse", "defer", "run"))
+        if action == "refuse":
+            print(f"  Refusing {len(oversize)} variant(s), they are not run.")
+            combos = _SkipNames(combos, oversize, unit)
+        elif action == "defer":
+            print(f"  Deferring {len(oversize)} variant(s) to the end of the sweep.")
+            combos = _DeferNames(combos, oversize, unit)
+            deferred = oversize
+    views = {}
+    if run_solver and not (study or adaptive) and cfg.get("time_prefix", True):
+        combos, views = share_time_prefixes(combos, unit)
+        if views:
+            print(f"TimeMax prefix sharing: {sum(len(g) for g in views.values())} shorter variant(s) "
+                  f"will be views onto {len(views)} longer run(s)")
+    if adaptive:
+        budget = int(dict(ADAPTIVE_DEFAULTS, **cfg["adaptive"])["budget"])
+        print(f"Adaptive sampling: the sweep's freq/ampl values are the seed runs; up to {budget} run(s) "
+              f"per (dp, TimeMax) surface in total")
+    if run_solver:
+        cost_model = CostModel.from_case_dir(tree_orig, case_dir, base, device="gpu" if mode.startswith("g") else "cpu")
+        print("\n" + cost_model.describe())
+        if tuning is not None:
+            print(tuning.describe())
+            best = max(tuning.entries.values(), key=lambda e: e["concurrency"])
+            if not parallel and best["concurrency"] > 1:
+                print(f"  Note: the best measured split runs {best['concurrency']} solvers at once; "
+                      f"use the parallel scheduler to get it.")
+        if interactive:
+            totals = plan_sweep(tree_orig, combos, unit, cfg, cost_model, show=None, tuning=tuning)
+            print(f"  Predicted solver time, all variants: ~{format_duration(totals['seconds'])}")
+            cfg["budget_s"] = parse_list_or_single("Per-variant solver time budget, s (0 = none)", 0)[0]
+        totals = plan_sweep(tree_orig, combos, unit, cfg, cost_model, show=0, tuning=tuning)
+        if not interactive:
+            print(f"  {totals['count']:,} variant(s), predicted solver time ~{format_duration(totals['seconds'])} "
+                  f"({format_duration(totals['low'])}-{format_duration(totals['high'])})")
+        n_total = totals["count"]
+        over = set(totals["over"])
+        if over:
+            print(f"\n⚠ {len(over)} variant(s) predicted over the {format_duration(cfg['budget_s'])} budget:")
+            for name in sorted(over):
+                print(f"  {name}")
+            if interactive:
+                skip = (input("Skip these variants? (yes/no) [no]: ").strip().lower() or "no").startswith("y")
+            else:
+                skip = cfg.get("skip_over_budget", False)
+            if skip:
+                print(f"  Skipping {len(over)} variant(s).")
+                combos = _SkipNames(combos, over, unit)
+                totals = plan_sweep(tree_orig, combos, unit, cfg, cost_model, show=0, tuning=tuning)
+                n_total = totals["count"]
+    if n_total is None:
+        n_total = len(combos)
+    print("\n" + "="*60)
+    print("Starting batch generation...")
+    print("="*60 + "\n")
+    parallel_opts = dict(max_cores=cfg.get("cores"), max_mem_gib=cfg.get("memory_gib"),
+                         max_jobs=cfg.get("max_jobs"), tuning=tuning, deferred=deferred)
+    if study:
+        if parallel or pipelined:
+            print("Convergence study: dp levels run one after another, the scheduler setting is ignored.")
+        if cfg.get("adaptive"):
+            print("Convergence study: adaptive freq/ampl sampling is ignored.")
+        results = run_convergence(tree_orig, case_dir, base, combos, unit, cfg, variant_opts, cost_model)
+        completed = len(results)
+        total = sum(r["elapsed"] for r in results)
+    elif adaptive:
+        if pipelined:
+            print("Adaptive sampling: rounds run one after another, the pipeline scheduler is not used.")
+        results = run_adaptive(tree_orig, case_dir, base, combos, unit, cfg, variant_opts, cost_model,
+                               parallel_opts=parallel_opts if parallel else None)
+        completed = len(results)
+        total = sum(r["elapsed"] for r in results)
+    elif parallel:
+        results = run_variants_parallel(tree_orig, case_dir, base, combos, unit, cost_model=cost_model,
+                                        **parallel_opts, **variant_opts)
+        completed = len(results)
+        total = sum(r["elapsed"] for r in results)
+    elif pipelined:
+        results = run_variants_pipelined(tree_orig, case_dir, base, combos, unit,
+                                         depth=cfg.get("pipeline_depth", 2), post_workers=cfg.get("post_workers", 1),
+                                         cost_model=cost_model, n_total=n_total, tuning=tuning, **variant_opts)
+        completed = len(results)
+        total = sum(r["elapsed"] for r in results)
+    else:
+        completed, total = 0, 0.0
+    planned_done = 0.0
+    for combo in ([] if parallel or pipelined or study or adaptive else combos):
+        threads, planned = None, None
+        if cost_model is not None:
+            planned = cost_model.predict(combo[0], combo[1])
+        if tuning is not None:
+            threads = tuning.threads_for(combo[0], planned.particles)
+        result = run_variant(tree_orig, case_dir, base, combo, unit, threads=threads, **variant_opts)
+        variant_name = result["name"]
+        elapsed = result["elapsed"]
+        if quota_bytes:
+            enforce_quota(case_dir, base, quota_bytes, archive=cfg.get("quota_archive", True))
+        completed += 1
+        total += elapsed
+        avg = total / completed
+        remaining = n_total - completed
+        if cost_model is not None:
+            cost_model.observe(result["dir"])
+            # Progress display: the plan's totals rescaled by actual/planned
+            # so far (planned = prediction made just before each variant ran).
+            planned_done += planned.seconds
+            scale = total / planned_done if planned_done > 0 else 1.0
+            left = max(0.0, totals["seconds"] - planned_done)
+            frac = left / totals["seconds"] if totals["seconds"] > 0 else 0.0
+            eta = (f"~{format_duration(left * scale)} "
+                   f"({format_duration(totals['low'] * frac * scale)}-{format_duration(totals['high'] * frac * scale)})")
+        else:
+            eta = f"~{avg*remaining:.1f}s"
+        if not result["ok"]:
+            if result["stage"] == "killed":
+                print(f"\n[{variant_name}] STOPPED by watchdog ({result['reason']}): {result['detail']}")
+            elif result["stage"] == "gencase":
+                print(f"\n[{variant_name}] GenCase FAILED, skipping solver for this combo.")
+            else:
+                print(f"\n[{variant_name}] FAILED at {result['stage']}"
+                      + (f" ({result['reason']})" if result.get("reason") else ""))
+            print(f"[{variant_name}] Elapsed {elapsed:.1f}s • Done {completed}/{n_total} • Avg ~{avg:.1f}s • Remaining {eta}")
+            continue
+        print(f"\n[{variant_name}] ✓ COMPLETE")
+        print(f"  Elapsed: {elapsed:.1f}s")
+        print(f"  Progress: {completed}/{n_total}")
+        print(f"  Average time per variant: {avg:.1f}s")
+        print(f"  Estimated remaining: {eta}")
+    if views:
+        print("\nTimeMax prefix views:")
+        results = build_prefix_views(case_dir, base, views, unit, plan=plan, manifest=manifest, diag_cfg=diag_cfg)
+        completed += len(results)
+        total += sum(r["elapsed"] for r in results)
+    print("\n" + "="*60)
+    print("ALL VARIANTS COMPLETE!")
+    print("="*60)
+    print(f"Total variants processed: {completed}")
+    print(f"Total time: {total:.1f}s ({total/60:.1f} minutes)")
+    print(f"Average per variant: {total/max(completed, 1):.1f}s")
+    if cfg.get("render"):
+        with tracing.span("render"):
+            render_sweep(case_dir, base, requested, unit, cfg["render"])
+    if cfg.get("index", True):
+        build_results_index(case_dir, base)
+    if quota_bytes and (parallel or pipelined or study or adaptive):
+        enforce_quota(case_dir, base, quota_bytes, archive=cfg.get("quota_archive", True))
+    if gencase_cache is not None:
+        print(gencase_cache.summary())
+    if manifest is not None:
+        print(manifest.summary())
+    if stager is not None:
+        print(stager.summary())
+    if warm is not None:
+        print(warm.summary())
+    print("\nNext steps:")
+    print("  1. Check the logs/ folder in each variant for solver output")
+    print("  2. Open ParaView and load the .vtk files from out/ folders")
+    print("  3. Compare particle spacing visually between different dp values")
+    print("  4. If dp still doesn't change, check Run.out files for warnings")
+
+class _SkipNames:
+    """
+    Re-iterable view of combos without the named variants (names are
+    taken from combos, so each one removes exactly one variant).
+    """
+    def __init__(self, combos, names, unit):
+        self.combos, self.names, self.unit = combos, names, unit
+
+    def __iter__(self):
+        return (c for c in self.combos if variant_name_for(*c, self.unit) not in self.names)
+
+    def __len__(self):
+        return len(self.combos) - len(self.names)
+
+def run_spec(spec, dry=False, show=20):
+    """
+    Runs (or with dry=True, only plans) a sweepspec.SweepSpec without any
+    prompts.
+    """
+    if not spec.case:
+        raise ValueError("sweep spec has no 'case' (path to *_Def.xml)")
+    xml_path = Path(spec.case)
+    tree_orig, cleaned, preclean_bak = load_xml_with_sanitize(xml_path)
+    if cleaned:
+        print(f"Note: XML had leading junk; cleaned and saved. Backup at: {preclean_bak}")
+    base = xml_path.stem[:-4] if xml_path.stem.endswith("_Def") else xml_path.stem
+    print(f"Sweep: {spec.describe()}")
+    print(f"Base case name: {base}")
+    print(f"Case directory: {xml_path.parent}")
+    cfg = dict(spec.run)
+    if dry:
+        return dry_run(tree_orig, xml_path.parent, base, spec, spec.unit, cfg, show=show)
+    return run_sweep(tree_orig, xml_path.parent, base, spec, spec.unit, cfg)
+
+# ---------------------------------------------------------------------------
+# Multi-node mode: coordinator/worker queue on the shared case directory.
+# ---------------------------------------------------------------------------
+
+QUEUE_DIRNAME = ".sweep_queue"
+
+def _queue_job_id(rank, name):
+    return f"{rank:06d}-{name}"
+
+def submit_spec(spec, wait=False, poll_s=30.0, lease_s=None):
+    """
+    Coordinator: writes every variant of the spec as a job into
+    <case dir>/.sweep_queue (longest predicted first). Variants already
+    queued or done are left alone, so resubmitting a grown spec is safe.
+    Specs with warm_start are refused (SpecError): workers run every job
+    cold, so queued runs would silently differ from local ones.
+    """
+    import workqueue
+    import sweepspec
+    if spec.run.get("warm_start"):
+        raise sweepspec.SpecError("warm_start is not supported with --submit (queue workers cannot share "
+                                  "settling runs); remove it from [run] or run the spec locally")
+    xml_path = Path(spec.case)
+    tree_orig, _, _ = load_xml_with_sanitize(xml_path)
+    base = xml_path.stem[:-4] if xml_path.stem.endswith("_Def") else xml_path.stem
+    case_dir = xml_path.parent
+    queue = workqueue.WorkQueue(case_dir / QUEUE_DIRNAME, lease_s=lease_s)
+    queue.create({"case": str(xml_path), "base": base, "unit": spec.unit, "run": spec.run})
+    known = {p.stem.split("-", 1)[1] for p in queue.jobs.glob("*.json")}
+    # Workers run on other hosts: only explicit limits apply, not this one's memory.
+    _, oversize = preflight_check(tree_orig, case_dir, base, spec, spec.unit, spec.run,
+                                  default_mem_gib=spec.run.get("memory_gib"))
+    if oversize:
+        print(f"⚠ Not queueing {len(oversize)} variant(s) over the pre-flight limits")
+    cost_model = CostModel.from_case_dir(tree_orig, case_dir, base,
+                                         device="gpu" if str(spec.run.get("mode", "cpu")).startswith("g") else "cpu")
+    ranked = sorted(((cost_model.predict(p[0], p[1]).seconds, variant_name_for(*p, spec.unit), p)
+                     for p in spec), key=lambda item: -item[0])
+    added = refused = 0
+    for rank, (seconds, name, point) in enumerate(ranked):
+        if name in known:
+            continue
+        if name in oversize:
+            refused += 1
+            continue
+        job = {"name": name, "combo": list(point), "solver_flags": list(getattr(point, "solver_flags", ())),
+               "predicted_s": seconds}
+        added += queue.submit(_queue_job_id(rank, name), job)
+    print(f"Queue {queue.root}: {added} job(s) added, {len(ranked) - added - refused} already known")
+    print(f"Start workers on any host with:  python Simulate.py --worker \"{case_dir}\"")
+    if wait:
+        watch_queue(queue.root, poll_s)
+    return queue
+
+def watch_queue(queue_root: Path, poll_s=30.0):
+    import workqueue
+    queue = workqueue.WorkQueue(queue_root)
+    while True:
+        s = queue.status()
+        print(f"[queue] {s['done']} done, {s['failed']} failed, {s['running']} running, "
+              f"{s['pending']} pending, {s['expired']} expired lease(s) • workers: {len(queue.workers())}")
+        if queue.drained():
+            return s
+        time.sleep(poll_s)
+
+def run_worker(queue_root: Path, threads=None, poll_s=10.0, keep_alive=False):
+    """
+    Worker: claims jobs from the queue until it is drained (or forever with
+    keep_alive), runs each through run_variant() and records the result.
+    Each job's console output goes to <variant>/logs/runner.log.
+    """
+    import contextlib
+    import workqueue
+    import sweepspec
+    queue_root = Path(queue_root)
+    if (queue_root / QUEUE_DIRNAME).is_dir():
+        queue_root = queue_root / QUEUE_DIRNAME
+    queue = workqueue.WorkQueue(queue_root)
+    qcfg = queue.config()
+    if not qcfg:
+        print(f"No queue at {queue_root} (submit one with --spec ... --submit)")
+        return []
+    if qcfg["run"].get("warm_start"):
+        print(f"Queue {queue_root} asks for warm_start, which workers do not support; not running it cold")
+        return []
+    xml_path = Path(qcfg["case"])
+    case_dir, base, unit, cfg = xml_path.parent, qcfg["base"], qcfg["unit"], qcfg["run"]
+    tree_orig, _, _ = load_xml_with_sanitize(xml_path)
+    run_solver = cfg.get("solver", True)
+    diag_cfg = None
+    if run_solver and cfg.get("diagnostics"):
+        diag_cfg = dict(cfg["diagnostics"])
+        diag_cfg.setdefault("axis", rotation_axis_point(tree_orig))
+        diag_cfg["probes"] = [tuple(p) for p in diag_cfg.get("probes", ())]
+    gencase_cache = None
+    if cfg.get("cache", True):
+        gencase_cache = GenCaseCache(case_dir / GENCASE_CACHE_DIRNAME,
+                                     max_bytes=int(cfg.get("cache_gib", 20) * 1024**3))
+    stager = AssetStager(case_dir, cfg.get("staging", "auto")) if (case_dir / "data").is_dir() else None
+    # No SQLite manifest here: SQLite locking is not reliable on NFS; the
+    # queue's done/ and failed/ records take its place.
+    variant_opts = dict(run_solver=run_solver, mode=str(cfg.get("mode", "cpu")).lower(),
+                        gencase_cache=gencase_cache, plan=XmlPatchPlan(tree_orig),
+                        watchdog_cfg=cfg.get("watchdog") if run_solver else None, diag_cfg=diag_cfg,
+                        stager=stager, output=cfg.get("output", "full"))
+    tuning = load_tuning(case_dir, cfg) if threads is None and run_solver else None
+    if tuning is not None:
+        print(tuning.describe())
+    quota_bytes = float(cfg.get("quota_gib") or 0) * 1024**3
+    print(f"[worker {queue.worker}] queue {queue_root}")
+    results = []
+    while True:
+        lease = queue.claim()
+        if lease is None:
+            if queue.drained() and not keep_alive:
+                break
+            time.sleep(poll_s)
+            continue
+        job = lease.job
+        point = sweepspec.SweepPoint(job["combo"], job.get("solver_flags", ()))
+        print(f"[worker {queue.worker}] claimed {job['name']} (attempt {lease.attempt})")
+        lease.start_heartbeat()
+        log_path = case_dir / f"{base}__{job['name']}" / "logs" / "runner.log"
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with log_path.open("w", encoding="utf-8") as lf, contextlib.redirect_stdout(lf):
+                job_threads = threads
+                if tuning is not None:
+                    job_threads = tuning.threads_for(point[0], lattice_particle_estimate(tree_orig, point[0]))
+                result = run_variant(tree_orig, case_dir, base, point, unit, threads=job_threads, **variant_opts)
+        except Exception as e:
+            result = {"name": job["name"], "ok": False, "stage": "crashed", "elapsed": 0.0, "error": repr(e)}
+        if lease.lost:
+            lease.release()
+            print(f"[worker {queue.worker}] lost the lease on {job['name']} (taken over), result discarded")
+            continue
+        record = {k: (str(v) if isinstance(v, Path) else v) for k, v in result.items()}
+        queue.complete(lease, record, ok=result["ok"])
+        results.append(result)
+        status = "✓" if result["ok"] else f"✗ ({result.get('reason') or result['stage']})"
+        print(f"[worker {queue.worker}] {job['name']} {status} in {result['elapsed']:.1f}s")
+        if quota_bytes:
+            # Leave variants other workers are (re)running alone.
+            busy = {job_id.split("-", 1)[1] for job_id in queue.workers().values()}
+            enforce_quota(case_dir, base, quota_bytes, protect=busy, archive=cfg.get("quota_archive", True))
+    print(f"[worker {queue.worker}] queue drained, ran {len(results)} job(s)")
+    if stager is not None:
+        print(stager.summary())
+    return results
+
+def cli(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="DualSPHysics sloshing sweep runner. Without --spec the "
+                                             "sweep is configured through interactive prompts.")
+    ap.add_argument("--spec", help="sweep spec file (.toml or .json), runs without prompts")
+    ap.add_argument("--dry-run", action="store_true", help="expand the spec and estimate cost, run nothing")
+    ap.add_argument("--show", type=int, default=20, help="variants listed by --dry-run")
+    ap.add_argument("--trace", action="store_true", help="trace every stage into <case>_trace.json")
+    ap.add_argument("--submit", action="store_true", help="queue the spec's variants for --worker processes")
+    ap.add_argument("--wait", action="store_true", help="with --submit: follow the queue until it is drained")
+    ap.add_argument("--lease-s", type=float, help="with --submit: seconds without heartbeat before a job is requeued")
+    ap.add_argument("--worker", metavar="CASE_DIR", help="run jobs from the queue in CASE_DIR")
+    ap.add_argument("--threads", type=int, help="with --worker: OpenMP threads per solver run")
+    ap.add_argument("--keep-alive", action="store_true", help="with --worker: keep polling when the queue is empty")
+    ap.add_argument("--queue-status", metavar="CASE_DIR", help="print the queue state in CASE_DIR and exit")
+    ap.add_argument("--vtk", nargs="+", metavar="VARIANT_DIR",
+                    help="convert the saved Parts of finished variants to VTK (out/vtk) and exit")
+    ap.add_argument("--render", nargs="+", metavar="VARIANT_DIR",
+                    help="render PNG frames of the variants' particles (needs numpy) and exit")
+    ap.add_argument("--scalar", default="vel", choices=("vel", "pressure", "rho", "z", "idp"),
+                    help="with --render: particle colour")
+    ap.add_argument("--width", type=int, default=1200, help="with --render: pixels per variant")
+    ap.add_argument("--tile", metavar="OUT_DIR", help="with --render: variants side by side into OUT_DIR")
+    ap.add_argument("--t-start", type=float, help="with --vtk/--render: first simulated time to convert")
+    ap.add_argument("--t-end", type=float, help="with --vtk/--render: last simulated time to convert")
+    ap.add_argument("--stride", type=int, default=1, help="with --vtk/--render: convert every n-th Part")
+    ap.add_argument("--workers", type=int, help="with --vtk/--render: parallel processes")
+    ap.add_argument("--index", metavar="CASE_XML",
+                    help="refresh the sweep's results index (<case>_results.npz), print the variants and exit")
+    ap.add_argument("--column", help="with --index: value per variant, e.g. surface_z_0, moment, steps_per_s")
+    ap.add_argument("--agg", default="max", choices=tuple(INDEX_AGGREGATES), help="with --index --column: reduction")
+    ap.add_argument("--at", type=float, help="with --index --column: value at this time instead; with --compare: time")
+    ap.add_argument("--where", nargs="+", metavar="PARAM=VALUE", help="with --index: e.g. ampl=6 dp=0.01,0.005")
+    ap.add_argument("--compare", nargs=2, metavar=("VARIANT_A", "VARIANT_B"),
+                    help="difference of the particle fields of two variants (coarser first) at --at and exit")
+    ap.add_argument("--quota", nargs=2, metavar=("CASE_XML", "GIB"),
+                    help="shrink the variant folders of CASE_XML's sweep to GIB and exit")
+    ap.add_argument("--no-archive", action="store_true", help="with --quota: only drop VTK, never pack out/data")
+    ap.add_argument("--autotune", metavar="SPEC",
+                    help="measure the best OpenMP threads x concurrent-runs split for each dp of SPEC and exit")
+    ap.add_argument("--cores", type=int, help="with --autotune: cores to split (default: all)")
+    ap.add_argument("--slice-s", type=float, default=30.0, help="with --autotune: wall seconds per calibration slice")
+    ap.add_argument("--splits", help="with --autotune: splits to try, e.g. 24x1,12x2,6x4 (threads x runs)")
+    args = ap.parse_args(argv)
+    if args.vtk:
+        for variant_dir in args.vtk:
+            materialise_vtk(Path(variant_dir), t_start=args.t_start, t_end=args.t_end,
+                            stride=args.stride, workers=args.workers)
+        return None
+    if args.render:
+        render_variants(args.render, out_dir=Path(args.tile) if args.tile else None, tile=bool(args.tile),
+                        scalar=args.scalar, width=args.width, t_start=args.t_start, t_end=args.t_end,
+                        stride=args.stride, workers=args.workers)
+        return None
+    if args.index:
+        xml_path = Path(args.index).resolve()
+        base = xml_path.name[:-len("_Def.xml")] if xml_path.name.endswith("_Def.xml") else xml_path.stem
+        query_index(xml_path.parent, base, column=args.column, agg=args.agg, where=parse_where(args.where), at=args.at)
+        return None
+    if args.compare:
+        compare_variants(*args.compare, t=args.at or 0.0)
+        return None
+    if args.quota:
+        xml_path = Path(args.quota[0]).resolve()
+        base = xml_path.name[:-len("_Def.xml")] if xml_path.name.endswith("_Def.xml") else xml_path.stem
+        enforce_quota(xml_path.parent, base, float(args.quota[1]) * 1024**3, archive=not args.no_archive)
+        return None
+    if args.worker:
+        return run_worker(Path(args.worker), threads=args.threads, keep_alive=args.keep_alive)
+    if args.queue_status:
+        import workqueue
+        root = Path(args.queue_status)
+        root = root / QUEUE_DIRNAME if (root / QUEUE_DIRNAME).is_dir() else root
+        print(workqueue.WorkQueue(root).status())
+        return None
+    if not (args.spec or args.autotune):
+        return main()
+    import sweepspec
+    spec_path = args.autotune or args.spec
+    try:
+        spec = sweepspec.SweepSpec.load(spec_path)
+    except (OSError, ValueError) as e:
+        print(f"Cannot load sweep spec {spec_path}: {e}")
+        sys.exit(2)
+    if args.autotune:
+        return autotune_spec(spec, cores=args.cores, slice_s=args.slice_s,
+                             splits=parse_splits(args.splits) if args.splits else None)
+    if args.trace:
+        spec.run["trace"] = True
+    if args.submit:
+        try:
+            return submit_spec(spec, wait=args.wait, lease_s=args.lease_s)
+        except sweepspec.SpecError as e:
+            print(f"Cannot submit sweep spec {spec_path}: {e}")
+            sys.exit(2)
+    run_spec(spec, dry=args.dry_run, show=args.show)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    cli()
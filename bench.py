@@ -0,0 +1,411 @@
+"""
+Offline microbenchmarks for the batch runner (no DualSPHysics binaries needed).
+
+    python bench.py xml [--xml path\\to\\Case_Def.xml] [--synthetic 5000] [--variants 20]
+    python bench.py bi4 [--particles 200000] [--parts 20] [--ascii]   (needs numpy)
+    python bench.py sweep [--variants 10,100,1000] [--solver-s 0] [--parts 20] [--cache] [--ops]
+
+The sweep benchmark runs Simulate.run_variant() end to end against the
+stand-in executables in fakesph.py and reports per-stage runner overhead
+(stage wall time minus the stand-ins' own run time), runner CPU time per
+stage (parsing and relaying solver output overlaps the child, so it shows
+up here rather than as wall overhead), filesystem operations per variant
+and peak RSS.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import Simulate
+import fakesph
+
+def synthetic_case_xml(n_entries: int) -> ET.ElementTree:
+    """
+    Sloshing-tank style case with n_entries drawbox commands and one
+    drawfilestl per ten boxes, to stand in for large real-world case files.
+    """
+    lines = [
+        '<case><casedef>',
+        '<constantsdef><gravity x="0" y="0" z="-9.81" /><rhop0 value="1000" /></constantsdef>',
+        '<mkconfig boundcount="240" fluidcount="9" />',
+        '<geometry><definition dp="0.01"><pointmin x="-0.6" y="0" z="-0.5" /><pointmax x="0.6" y="0" z="1" /></definition>',
+        '<commands><mainlist><setshapemode>actual | dp | bound</setshapemode>',
+    ]
+    for i in range(n_entries):
+        lines.append(f'<setmkbound mk="{i % 200}" /><drawbox><boxfill>solid</boxfill>'
+                     f'<point x="{i * 1e-4:g}" y="0" z="0" /><size x="0.01" y="0" z="0.01" /></drawbox>')
+        if i % 10 == 0:
+            lines.append(f'<drawfilestl file="data/part_{i}.stl"><drawscale x="0.001" y="0.001" z="0.001" /></drawfilestl>')
+    lines += [
+        '<setmkfluid mk="0" /><fillbox x="0" y="0" z="0.1"><modefill>void</modefill>'
+        '<point x="-0.45" y="-1" z="0.08" /><size x="0.9" y="2" z="0.4" /></fillbox>',
+        '</mainlist></commands></geometry>',
+        '<motion><objreal ref="11"><begin mov="1" start="0" /><mvrotsinu id="1" duration="2" anglesunits="degrees">'
+        '<freq v="1" /><ampl v="5" /><axisp1 x="0" y="-1" z="0.2" /><axisp2 x="0" y="1" z="0.2" /></mvrotsinu></objreal></motion>',
+        '</casedef><execution>',
+        '<constants><gravity x="0" y="0" z="-9.81" /></constants><special />',
+        '<parameters><parameter key="TimeMax" value="2" /><parameter key="TimeOut" value="0.01" /></parameters>',
+        '</execution></case>',
+    ]
+    return ET.ElementTree(ET.fromstring("".join(lines)))
+
+def _legacy_emit(tree_orig, dp, t_end, f_in, ampl_val, unit):
+    clone = Simulate.clone_tree(tree_orig)
+    upd_tree = ET.ElementTree(ET.fromstring(ET.tostring(clone.getroot())))
+    Simulate.preserve_critical_xml_sections(upd_tree, tree_orig)
+    Simulate.update_dp(upd_tree, dp)
+    if t_end >= 0:
+        Simulate.update_time_max(upd_tree, t_end)
+    Simulate.update_mvrotsinu(upd_tree, f_in, ampl_val, unit, t_end)
+    return ET.tostring(upd_tree.getroot(), encoding="utf-8", xml_declaration=True)
+
+def bench_xml(args):
+    if args.xml:
+        tree, _, _ = Simulate.load_xml_with_sanitize(Path(args.xml))
+        label = args.xml
+    else:
+        tree = synthetic_case_xml(args.synthetic)
+        label = f"synthetic ({args.synthetic} drawbox entries)"
+    n_nodes = sum(1 for _ in tree.getroot().iter())
+    combos = [(0.01 / (1 + i % 4), 2.0 + i % 3, 0.5 + 0.1 * i, 6.0) for i in range(args.variants)]
+    print(f"Case: {label} • {n_nodes:,} elements • {len(combos)} variant(s)")
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink):
+        t0 = time.perf_counter()
+        legacy = [_legacy_emit(tree, *c, "degrees") for c in combos]
+        t_legacy = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        plan = Simulate.XmlPatchPlan(tree)
+        t_compile = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        planned = [plan.emit(*c, "degrees", verbose=False) for c in combos]
+        t_plan = time.perf_counter() - t0
+    mismatches = sum(1 for a, b in zip(legacy, planned) if a != b)
+    print(f"  clone + update_*   : {t_legacy:8.3f}s  ({1e3 * t_legacy / len(combos):.2f} ms/variant)")
+    print(f"  patch plan compile : {t_compile:8.3f}s  (once)")
+    print(f"  patch plan emit    : {t_plan:8.3f}s  ({1e3 * t_plan / len(combos):.2f} ms/variant)")
+    if t_plan > 0:
+        print(f"  speed-up           : {t_legacy / (t_plan + t_compile):.1f}x (including compile)")
+    print(f"  output mismatches  : {mismatches}")
+
+def write_legacy_vtk(path, pos, vel, rho, idp, ascii=False):
+    """
+    Legacy VTK polydata with the same fields PartVTK writes per particle.
+    """
+    import numpy as np
+    n = len(pos)
+    with open(path, "wb") as fh:
+        def put(text):
+            fh.write(text.encode())
+        def arr(a, fmt):
+            if ascii:
+                np.savetxt(fh, a.reshape(n, -1), fmt=fmt)
+            else:
+                fh.write(a.astype(a.dtype.newbyteorder(">")).tobytes())
+                fh.write(b"\n")
+        put(f"# vtk DataFile Version 3.0\nPartFluid\n{'ASCII' if ascii else 'BINARY'}\nDATASET POLYDATA\n")
+        put(f"POINTS {n} float\n")
+        arr(pos.astype("f4"), "%g")
+        put(f"POINT_DATA {n}\nSCALARS Idp unsigned_int\nLOOKUP_TABLE default\n")
+        arr(idp.astype("u4"), "%d")
+        put("VECTORS Vel float\n")
+        arr(vel.astype("f4"), "%g")
+        put("SCALARS Rhop float\nLOOKUP_TABLE default\n")
+        arr(rho.astype("f4"), "%g")
+
+def read_legacy_vtk(path):
+    import numpy as np
+    fields = {}
+    with open(path, "rb") as fh:
+        fh.readline(); fh.readline()
+        ascii = fh.readline().strip() == b"ASCII"
+        n = 0
+        def block(count, dtype):
+            if ascii:
+                return np.loadtxt(fh, dtype=dtype, max_rows=count // (3 if count > n else 1)).ravel()
+            a = np.frombuffer(fh.read(count * np.dtype(dtype).itemsize), dtype=np.dtype(dtype).newbyteorder(">"))
+            fh.readline()
+            return a
+        while True:
+            line = fh.readline()
+            if not line:
+                break
+            words = line.split()
+            if not words:
+                continue
+            if words[0] == b"POINTS":
+                n = int(words[1])
+                fields["pos"] = block(3 * n, "f4").reshape(n, 3)
+            elif words[0] == b"SCALARS":
+                dtype = "u4" if words[2] == b"unsigned_int" else "f4"
+                fh.readline()
+                fields[words[1].decode()] = block(n, dtype)
+            elif words[0] == b"VECTORS":
+                fields[words[1].decode()] = block(3 * n, "f4").reshape(n, 3)
+    return fields
+
+def bench_bi4(args):
+    import numpy as np
+    import partdata
+    tmp = Path(tempfile.mkdtemp(prefix="bench_bi4_"))
+    try:
+        n_bound = max(1, args.particles // 10)
+        data_dir = partdata.write_synthetic_run(tmp / "data", n_fluid=args.particles - n_bound,
+                                                n_bound=n_bound, n_parts=args.parts)
+        head, parts = partdata.open_run(data_dir)
+        vtk_files = []
+        for pf in parts:
+            vtk = tmp / f"PartAll_{pf.number:04d}.vtk"
+            write_legacy_vtk(vtk, pf.pos, pf.vel, pf.rho, pf.idp, ascii=args.ascii)
+            vtk_files.append(vtk)
+            pf.close()
+        bi4_bytes = sum(p.stat().st_size for p in data_dir.glob("Part_*.bi4"))
+        vtk_bytes = sum(p.stat().st_size for p in vtk_files)
+        print(f"{args.parts} part(s) x {args.particles:,} particles • bi4 {bi4_bytes/1e6:.1f} MB • "
+              f"VTK ({'ascii' if args.ascii else 'binary'}) {vtk_bytes/1e6:.1f} MB")
+
+        t0 = time.perf_counter()
+        check = 0.0
+        head, parts = partdata.open_run(data_dir)
+        for pf in parts:
+            check += float(pf.pos[:, 2].sum() + pf.vel[:, 0].sum() + pf.rho.sum()) + int(pf.type_mask("fluid").sum())
+            pf.close()
+        t_bi4 = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for vtk in vtk_files:
+            f = read_legacy_vtk(vtk)
+            check += float(f["pos"][:, 2].sum() + f["Vel"][:, 0].sum() + f["Rhop"].sum())
+        t_vtk = time.perf_counter() - t0
+
+        n_total = args.particles * args.parts
+        print(f"  partdata (mmap views) : {t_bi4:8.3f}s  {n_total / t_bi4 / 1e6:8.2f} Mparticles/s  "
+              f"{bi4_bytes / t_bi4 / 1e6:8.1f} MB/s")
+        print(f"  legacy VTK parse      : {t_vtk:8.3f}s  {n_total / t_vtk / 1e6:8.2f} Mparticles/s  "
+              f"{vtk_bytes / t_vtk / 1e6:8.1f} MB/s")
+        if t_bi4 > 0:
+            print(f"  speed-up              : {t_vtk / t_bi4:.1f}x")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+# Audit events counted as filesystem operations (sys.addaudithook).
+FS_EVENTS = {
+    "open", "os.listdir", "os.scandir", "glob.glob", "os.mkdir", "os.remove", "os.rmdir", "os.rename",
+    "os.replace", "os.link", "os.symlink", "os.chmod", "os.utime", "os.truncate",
+    "shutil.copyfile", "shutil.copymode", "shutil.copystat", "shutil.copytree", "shutil.rmtree",
+    "shutil.move", "subprocess.Popen",
+}
+# Stage name -> Simulate functions timed as that stage, and the stand-in tool it waits on.
+STAGES = {
+    "prepare": (("prepare_variant",), None),
+    "gencase": (("run_gencase", "run_gencase_cached"), "gencase"),
+    "solver":  (("run_dual",), "dualsphysics"),
+    "convert": (("ensure_vtk_with_partvtk",), "partvtk"),
+}
+
+class StageMeter:
+    """
+    Wraps the Simulate stage functions to time them (wall and runner CPU)
+    and attributes every audited filesystem operation to the stage running
+    at the time.
+    """
+    def __init__(self):
+        self.wall = {s: 0.0 for s in STAGES}
+        self.cpu = {s: 0.0 for s in STAGES}
+        self.calls = {s: 0 for s in STAGES}
+        self.ops = {s: {} for s in list(STAGES) + ["other"]}
+        self.current = None
+        self.active = False
+        self._saved = {}
+        sys.addaudithook(self._audit)
+
+    def _audit(self, event, args):
+        if self.active and event in FS_EVENTS:
+            ops = self.ops[self.current or "other"]
+            ops[event] = ops.get(event, 0) + 1
+
+    def _wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            if self.current is not None:
+                return fn(*args, **kwargs)
+            self.current = stage
+            t0, c0 = time.perf_counter(), time.process_time()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.wall[stage] += time.perf_counter() - t0
+                self.cpu[stage] += time.process_time() - c0
+                self.calls[stage] += 1
+                self.current = None
+        return timed
+
+    def __enter__(self):
+        for stage, (names, _) in STAGES.items():
+            for name in names:
+                self._saved[name] = getattr(Simulate, name)
+                setattr(Simulate, name, self._wrap(stage, self._saved[name]))
+        self.active = True
+        return self
+
+    def __exit__(self, *exc):
+        self.active = False
+        for name, fn in self._saved.items():
+            setattr(Simulate, name, fn)
+
+def _peak_rss_kib():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+def _make_case(root: Path, args) -> Path:
+    case_dir = root / "case"
+    (case_dir / "data").mkdir(parents=True)
+    synthetic_case_xml(args.synthetic).write(case_dir / "Bench_Def.xml", encoding="utf-8", xml_declaration=True)
+    for i in range(args.data_files):
+        (case_dir / "data" / f"part_{i * 10}.stl").write_bytes(b"\0" * (args.data_kb * 1024))
+    return case_dir
+
+def sweep_combos(n, dp_levels):
+    dps = [0.01 / (1 + k) for k in range(dp_levels)]
+    return [(dps[i % dp_levels], 1.0, round(0.5 + 0.01 * (i // 100), 4), round(1.0 + 0.1 * (i % 100), 4))
+            for i in range(n)]
+
+def spawn_baseline(exes, tmp: Path, child_log: Path, repeats=5):
+    """
+    Process start-up cost of a stand-in (wall time of a no-op PartVTK run
+    minus its self-reported run time). Charged to the stand-ins, not the runner.
+    """
+    empty = tmp / "empty"
+    empty.mkdir(exist_ok=True)
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        subprocess.run([str(exes["partvtk"]), str(empty)], stdout=subprocess.DEVNULL, check=True)
+    wall = time.perf_counter() - t0
+    with child_log.open("r", encoding="utf-8") as fh:
+        own = sum(r["end"] - r["start"] for r in map(json.loads, fh))
+    child_log.unlink()
+    return max(0.0, (wall - own) / repeats)
+
+def bench_sweep_once(n, args):
+    tmp = Path(tempfile.mkdtemp(prefix="bench_sweep_"))
+    try:
+        case_dir = _make_case(tmp, args)
+        child_log = tmp / "children.jsonl"
+        cfg = {"gencase_s": args.gencase_s, "solver_s": args.solver_s, "partvtk_s": args.partvtk_s,
+               "parts": args.parts, "part_kb": args.part_kb, "vtk_kb": args.vtk_kb, "bi4_kb": args.part_kb,
+               "solver_vtk": not args.binx, "log": str(child_log)}
+        cfg_path = tmp / "fakesph.json"
+        cfg_path.write_text(json.dumps(cfg), encoding="utf-8")
+        exes = fakesph.write_launchers(tmp / "bin", cfg_path)
+        spawn_s = spawn_baseline(exes, tmp, child_log)
+        saved_exes = (Simulate.GENCASE_EXE, Simulate.DUAL_CPU_EXE, Simulate.PARTVTK_EXE)
+        Simulate.GENCASE_EXE, Simulate.DUAL_CPU_EXE, Simulate.PARTVTK_EXE = (
+            str(exes["gencase"]), str(exes["dualsphysics"]), str(exes["partvtk"]))
+        tree, _, _ = Simulate.load_xml_with_sanitize(case_dir / "Bench_Def.xml")
+        opts = {"plan": Simulate.XmlPatchPlan(tree) if not args.legacy_xml else None}
+        if args.cache:
+            opts["gencase_cache"] = Simulate.GenCaseCache(case_dir / Simulate.GENCASE_CACHE_DIRNAME)
+        if args.staging:
+            opts["stager"] = Simulate.AssetStager(case_dir, args.staging)
+        if args.manifest:
+            opts["manifest"] = Simulate.SweepManifest(case_dir / Simulate.MANIFEST_NAME, case_dir)
+        combos = sweep_combos(n, args.dp_levels)
+        meter = StageMeter()
+        try:
+            with open(os.devnull, "w", encoding="utf-8") as sink, contextlib.redirect_stdout(sink), meter:
+                t0 = time.perf_counter()
+                for combo in combos:
+                    Simulate.run_variant(tree, case_dir, "Bench", combo, "degrees", **opts)
+                wall = time.perf_counter() - t0
+        finally:
+            Simulate.GENCASE_EXE, Simulate.DUAL_CPU_EXE, Simulate.PARTVTK_EXE = saved_exes
+            if args.manifest:
+                opts["manifest"].close()
+        child_s = {tool: 0.0 for tool in fakesph.TOOLS}
+        child_rss = 0
+        with child_log.open("r", encoding="utf-8") as fh:
+            for line in fh:
+                rec = json.loads(line)
+                child_s[rec["tool"]] += rec["end"] - rec["start"]
+                child_rss = max(child_rss, rec.get("peak_rss_kib") or 0)
+        return {"variants": n, "wall": wall, "meter": meter, "child_s": child_s, "spawn_s": spawn_s,
+                "peak_rss_kib": _peak_rss_kib(), "child_peak_rss_kib": child_rss}
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def bench_sweep(args):
+    sizes = [int(v) for v in args.variants.split(",")]
+    print(f"Stand-in sweep: synthetic case ({args.synthetic} drawbox entries), data/ {args.data_files} x "
+          f"{args.data_kb} KiB, {args.parts} Part(s)/run, sleeps gencase/solver/partvtk "
+          f"{args.gencase_s:g}/{args.solver_s:g}/{args.partvtk_s:g}s")
+    for n in sorted(sizes):
+        r = bench_sweep_once(n, args)
+        m = r["meter"]
+        rss = f"{r['peak_rss_kib'] / 1024:.0f} MiB" if r["peak_rss_kib"] else "n/a"
+        print(f"\n{n} variant(s): {r['wall']:.2f}s wall, {n / r['wall'] * 3600:,.0f} variants/hour, "
+              f"runner peak RSS {rss}, child peak RSS {r['child_peak_rss_kib'] / 1024:.0f} MiB")
+        print(f"  stand-in process start-up: {1e3 * r['spawn_s']:.1f} ms (excluded from overhead)")
+        print(f"  {'stage':<9}{'wall':>10}{'child':>10}{'overhead':>10}{'ms/variant':>12}"
+              f"{'runner cpu':>12}{'fs ops/variant':>16}")
+        for stage, (_, tool) in STAGES.items():
+            spawns = m.ops[stage].get("subprocess.Popen", 0)
+            child = (r["child_s"].get(tool, 0.0) if tool else 0.0) + spawns * r["spawn_s"]
+            overhead = max(0.0, m.wall[stage] - child)
+            ops = sum(m.ops[stage].values())
+            print(f"  {stage:<9}{m.wall[stage]:>9.2f}s{child:>9.2f}s{overhead:>9.2f}s"
+                  f"{1e3 * overhead / n:>12.2f}{m.cpu[stage]:>11.2f}s{ops / n:>16.1f}")
+        if args.ops:
+            for stage, ops in m.ops.items():
+                if ops:
+                    top = ", ".join(f"{k} {v / n:.1f}" for k, v in sorted(ops.items(), key=lambda kv: -kv[1]))
+                    print(f"  {stage} ops/variant: {top}")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("xml", help="per-variant XML patching: clone/update_* vs compiled patch plan")
+    p.add_argument("--xml", help="real case _Def.xml to benchmark (default: synthetic case)")
+    p.add_argument("--synthetic", type=int, default=5000, help="drawbox entries in the synthetic case")
+    p.add_argument("--variants", type=int, default=20)
+    p.set_defaults(func=bench_xml)
+    p = sub.add_parser("bi4", help="Part_????.bi4 load throughput: partdata reader vs parsing PartVTK-style VTK")
+    p.add_argument("--particles", type=int, default=200000)
+    p.add_argument("--parts", type=int, default=20)
+    p.add_argument("--ascii", action="store_true", help="compare against ASCII instead of binary VTK")
+    p.set_defaults(func=bench_bi4)
+    p = sub.add_parser("sweep", help="end-to-end runner overhead against stand-in GenCase/DualSPHysics/PartVTK")
+    p.add_argument("--variants", default="10,100", help="comma-separated sweep sizes, e.g. 10,100,1000,10000")
+    p.add_argument("--dp-levels", type=int, default=2)
+    p.add_argument("--synthetic", type=int, default=200, help="drawbox entries in the synthetic case")
+    p.add_argument("--data-files", type=int, default=10, help="files in the case data/ folder")
+    p.add_argument("--data-kb", type=int, default=256)
+    p.add_argument("--parts", type=int, default=20, help="Parts written per solver run")
+    p.add_argument("--part-kb", type=int, default=64)
+    p.add_argument("--vtk-kb", type=int, default=64)
+    p.add_argument("--gencase-s", type=float, default=0.0, help="stand-in GenCase sleep")
+    p.add_argument("--solver-s", type=float, default=0.0, help="stand-in solver sleep")
+    p.add_argument("--partvtk-s", type=float, default=0.0, help="stand-in PartVTK sleep")
+    p.add_argument("--binx", action="store_true", help="solver writes .binx so PartVTK runs")
+    p.add_argument("--cache", action="store_true", help="use the GenCase cache")
+    p.add_argument("--manifest", action="store_true", help="use the sweep manifest")
+    p.add_argument("--legacy-xml", action="store_true", help="clone/update_* instead of the patch plan")
+    p.add_argument("--staging", choices=Simulate.STAGING_MODES, help="stage data/ with AssetStager (default: copytree)")
+    p.add_argument("--ops", action="store_true", help="break filesystem operations down by type")
+    p.set_defaults(func=bench_sweep)
+    args = ap.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Mesh-convergence checks between the sloshing diagnostics (sloshdiag .npz)
+of one case solved at successive dp levels:
+
+    series_errors   relative L2 / Linf difference of each time series
+                    between two levels, on their common time window (the
+                    finer level interpolated onto the coarser one's times)
+    peak_values     scalar quantities tracked per level: peak |moment|,
+                    peak surface height per gauge, peak pressure per probe
+    richardson      observed order of convergence and extrapolated value
+                    from three levels (Celik et al. 2008 procedure, so the
+                    refinement ratios need not be equal)
+
+Requires numpy.
+"""
+import math
+
+import numpy as np
+
+SERIES = ("moment", "surface_z", "pressure")
+# Series and peaks smaller than this (in their own units) are round-off,
+# e.g. the moment of a case at rest, and are left out of the comparison.
+ZERO = 1e-9
+
+def _series(diag, key):
+    """
+    (time, values[T, k]) for one diagnostics series, or None if it is
+    missing, all NaN or all round-off.
+    """
+    if key not in diag or diag[key].size == 0:
+        return None
+    values = np.asarray(diag[key], dtype=np.float64).reshape(len(diag["time"]), -1)
+    if not np.isfinite(values).any() or np.nanmax(np.abs(values)) < ZERO:
+        return None
+    return np.asarray(diag["time"], dtype=np.float64), values
+
+def series_errors(coarse, fine, keys=SERIES):
+    """
+    {key: {"l2": relative L2, "linf": relative Linf}} of coarse against
+    fine, over the time window both levels cover. Columns (gauges, probes)
+    are pooled; NaN samples are ignored.
+    """
+    out = {}
+    for key in keys:
+        a, b = _series(coarse, key), _series(fine, key)
+        if a is None or b is None or a[1].shape[1] != b[1].shape[1]:
+            continue
+        (ta, va), (tb, vb) = a, b
+        lo, hi = max(ta[0], tb[0]), min(ta[-1], tb[-1])
+        sel = (ta >= lo) & (ta <= hi)
+        if sel.sum() < 2:
+            continue
+        ref = np.column_stack([np.interp(ta[sel], tb, vb[:, j]) for j in range(vb.shape[1])])
+        diff = va[sel] - ref
+        ok = np.isfinite(diff)
+        if not ok.any():
+            continue
+        norm = np.sqrt(np.mean(ref[ok] ** 2))
+        scale = np.max(np.abs(ref[ok]))
+        out[key] = {
+            "l2": float(np.sqrt(np.mean(diff[ok] ** 2)) / norm) if norm > 0 else float("inf"),
+            "linf": float(np.max(np.abs(diff[ok])) / scale) if scale > 0 else float("inf"),
+        }
+    return out
+
+def peak_values(diag):
+    """
+    {name: value} of the scalar quantities compared across levels.
+    """
+    out = {}
+    if _series(diag, "moment") is not None:
+        out["moment_peak"] = float(np.nanmax(np.abs(diag["moment"])))
+    s = _series(diag, "surface_z")
+    if s is not None:
+        for j, x in enumerate(np.asarray(diag.get("gauge_x", np.arange(s[1].shape[1])), dtype=np.float64)):
+            if np.isfinite(s[1][:, j]).any():
+                out[f"surface_z_max[x={x:g}]"] = float(np.nanmax(s[1][:, j]))
+    s = _series(diag, "pressure")
+    if s is not None:
+        for j, (x, z) in enumerate(np.asarray(diag["probes"], dtype=np.float64).reshape(-1, 2)):
+            if np.isfinite(s[1][:, j]).any():
+                out[f"pressure_max[{x:g}:{z:g}]"] = float(np.nanmax(s[1][:, j]))
+    return out
+
+def richardson(f_coarse, f_mid, f_fine, dp_coarse, dp_mid, dp_fine, max_iter=50):
+    """
+    Observed order p, extrapolated value and fine-grid GCI (relative, safety
+    factor 1.25) from three levels. Returns None when the differences are
+    zero or the levels oscillate (no monotone convergence to extrapolate).
+    """
+    e32, e21 = f_coarse - f_mid, f_mid - f_fine
+    if e21 == 0 or e32 == 0 or e32 / e21 < 0:
+        return None
+    r21, r32 = dp_mid / dp_fine, dp_coarse / dp_mid
+    if r21 <= 1 or r32 <= 1:
+        return None
+    p = abs(math.log(abs(e32 / e21))) / math.log(r21)
+    for _ in range(max_iter):
+        try:
+            q = math.log((r21 ** p - 1.0) / (r32 ** p - 1.0))
+        except (ValueError, ZeroDivisionError):
+            return None
+        p_new = abs(math.log(abs(e32 / e21)) + q) / math.log(r21)
+        if abs(p_new - p) < 1e-8:
+            p = p_new
+            break
+        p = p_new
+    if p <= 0:
+        return None
+    extrapolated = (r21 ** p * f_fine - f_mid) / (r21 ** p - 1.0)
+    gci = 1.25 * abs(e21 / f_fine) / (r21 ** p - 1.0) if f_fine else float("inf")
+    return {"order": p, "extrapolated": extrapolated, "gci": gci}
+
+def level_change(coarse, fine, keys=SERIES):
+    """
+    Largest relative change between two levels over the series L2 errors
+    and the peak values, with the name of the quantity it came from.
+    """
+    worst = (0.0, None)
+    for key, err in series_errors(coarse, fine, keys).items():
+        worst = max(worst, (err["l2"], f"{key} (L2)"), key=lambda w: w[0])
+    pa, pb = peak_values(coarse), peak_values(fine)
+    for name in pa.keys() & pb.keys():
+        if not any(name.startswith(k) for k in keys):
+            continue
+        rel = abs(pa[name] - pb[name]) / abs(pb[name]) if pb[name] else (0.0 if pa[name] == 0 else float("inf"))
+        worst = max(worst, (rel, name), key=lambda w: w[0])
+    return worst
@@ -0,0 +1,221 @@
+"""
+Stand-in GenCase / DualSPHysics / PartVTK executables for offline benchmarks.
+
+    python fakesph.py --config cfg.json gencase <case> -save:all [-dp 0.01]
+    python fakesph.py --config cfg.json dualsphysics <xml stem> <case dir> ... -dirout <out>
+    python fakesph.py --config cfg.json partvtk <out dir> <case> <out dir> -savevtk
+    python fakesph.py --config cfg.json partvtk -dirin <data dir> -savevtk <prefix>
+
+Output mimics the real tools closely enough for Simulate.py: GenCase writes
+<dp>.xml/<dp>.bi4/Run.out, the solver prints a DualSPHysics-style header and
+PART table and writes dummy out/data/Part_????.bi4 (plus .vtk or .binx), and
+PartVTK turns .binx (or, with -dirin, Part_????.bi4) into .vtk. With
+-partbegin:N the solver continues after Part N, numbering and timing its
+Parts from there. Sizes and sleeps come from the JSON config
+(see DEFAULTS). Each run appends one JSON line to config["log"] with its own
+wall time and peak RSS so the harness can separate runner overhead from
+child time.
+"""
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+START = time.time()
+
+DEFAULTS = {
+    "gencase_s": 0.0,       # sleep per GenCase run
+    "solver_s": 0.0,        # total sleep per solver run, spread over the Parts
+    "partvtk_s": 0.0,       # sleep per PartVTK run
+    "ref_dp": 0.01,         # particle count scales as (ref_dp / dp) ** dims
+    "ref_np": 15000,
+    "dims": 2,
+    "parts": 20,
+    "time_max": 1.0,
+    "bi4_kb": 64,           # GenCase <dp>.bi4
+    "part_kb": 64,          # each out/data/Part_????.bi4
+    "vtk_kb": 64,           # each .vtk
+    "solver_vtk": True,     # solver writes .vtk itself; False writes .binx for PartVTK
+    "out_every": 5,         # "Particles out" line every N Parts (0 = never)
+    "omp_serial_frac": None,  # Amdahl serial fraction: solver_s is the 1-thread time (None = ignore threads)
+    "cores": None,          # with omp_serial_frac: concurrent runs slow down once their threads exceed this
+    "busy_dir": None,       # where concurrent runs register their threads (default: next to the log)
+    "log": None,
+}
+
+def _dummy(path: Path, kb: int):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("wb") as fh:
+        fh.truncate(max(0, int(kb)) * 1024)
+
+def _arg(argv, flag, default=None):
+    return argv[argv.index(flag) + 1] if flag in argv else default
+
+def case_np(cfg, dp):
+    return max(1, int(cfg["ref_np"] * (cfg["ref_dp"] / dp) ** cfg["dims"]))
+
+def gencase(cfg, argv):
+    base = argv[0]
+    dp = float(_arg(argv, "-dp", cfg["ref_dp"]))
+    xml = Path(f"{base}.xml")
+    text = xml.read_text(encoding="utf-8", errors="ignore") if xml.exists() else "<case />"
+    Path(f"{dp:g}.xml").write_text(text, encoding="utf-8")
+    _dummy(Path(f"{dp:g}.bi4"), cfg["bi4_kb"])
+    np_total = case_np(cfg, dp)
+    Path("Run.out").write_text(f"Dp: {dp:g}\nTotal particles: {np_total:,}\n", encoding="utf-8")
+    print(f"GenCase stand-in: {base} dp={dp:g} -> {np_total:,} particles")
+    time.sleep(cfg["gencase_s"])
+    return 0
+
+def _threads_in(path: Path):
+    try:
+        return int(path.read_text() or 0)
+    except (OSError, ValueError):
+        return 0
+
+def dualsphysics(cfg, argv):
+    dirout = Path(_arg(argv, "-dirout", "out"))
+    data_dir = dirout / "data"
+    data_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        dp = float(argv[0])
+    except (IndexError, ValueError):
+        dp = cfg["ref_dp"]
+    np_total = case_np(cfg, dp)
+    n_bound = max(1, np_total // 10)
+    kernel_h = 1.2 * dp * (2 ** 0.5 if cfg["dims"] == 2 else 3 ** 0.5)
+    threads = next((a.split(":", 1)[1] for a in argv if a.startswith("-ompthreads:")), os.cpu_count() or 1)
+    parts, t_max = int(cfg["parts"]), float(cfg["time_max"])
+    tmax = next((float(a.split(":", 1)[1]) for a in argv if a.startswith("-tmax:")), None)
+    if tmax is not None:
+        tout = next((float(a.split(":", 1)[1]) for a in argv if a.startswith("-tout:")), t_max / parts)
+        cfg["solver_s"] = float(cfg["solver_s"]) * tmax / t_max
+        parts, t_max = max(1, int(round(tmax / tout))), tmax
+    begin = next((int(a.split(":", 1)[1]) for a in argv if a.startswith("-partbegin:")), 0)
+    busy = None
+    if cfg["omp_serial_frac"] is not None:
+        f = float(cfg["omp_serial_frac"])
+        cfg["solver_s"] = float(cfg["solver_s"]) * (f + (1.0 - f) / int(threads))
+        if cfg["cores"]:
+            busy_dir = Path(cfg["busy_dir"] or Path(cfg["log"] or dirout).parent / ".fake_busy")
+            busy_dir.mkdir(parents=True, exist_ok=True)
+            busy = busy_dir / str(os.getpid())
+            busy.write_text(str(threads))
+    sv = next((a.split(":", 1)[1].split(",") for a in argv if a.startswith("-sv:")), ["vtk"])
+    solver_vtk = cfg["solver_vtk"] and "vtk" in sv
+    steps_per_part = max(1, int(277.0 * t_max / parts / kernel_h))
+    header = [
+        " <DUALSPHYSICS5> Copyright (c) 2025 by", " (stand-in)", "",
+        f"CaseNp={np_total:,}", f"CaseNbound={n_bound:,}", "CaseNfixed=0", f"CaseNmoving={n_bound:,}",
+        "CaseNfloat=0", f"CaseNfluid={np_total - n_bound:,}", f"Dp={dp:g}",
+        f"KernelH={kernel_h:.6f}  (CoefficientH=1.2; H/Dp={kernel_h / dp:.5f})",
+        "CteB=33634.29", "Gamma=7", "RhopZero=1000", f"DtIni={0.2 * kernel_h / 36.0:.15g}",
+        f"DtMin={0.01 * kernel_h / 36.0:.15g}", f"MassFluid={1000 * dp ** cfg['dims']:g}",
+        f"TimeMax={t_max:g}", f"TimePart={t_max / parts:g}",
+        "MapCells=(177,1,221)  (39,117 cells)", f'RunMode="Pos-Double - OpenMP(Threads:{threads})"', "",
+        f"Initial allocated memory in CPU: {np_total * 135:,} ({np_total * 135 / 1024**2:.2f} MiB)  (5 particle arrays)",
+        f"Part_0000        {np_total:,} (100.0%) particles successfully stored", "",
+        "PART   PartTime   TotalSteps   Steps    Particles    Cells        Time/Sec   Finish time        ",
+        "=====  =========  ===========  =======  ===========  ===========  =========  ===================",
+    ]
+    for line in header:
+        print(line, flush=True)
+    _dummy(data_dir / "Part_Head.ibi4", 1)
+    if not begin:
+        _dummy(data_dir / "Part_0000.bi4", cfg["part_kb"])
+    total_out, total_steps, np_now = 0, 0, np_total
+    sleep = float(cfg["solver_s"]) / parts
+    time_per_sec = max(0.01, float(cfg["solver_s"]) / t_max)
+    finish = datetime.now() + timedelta(seconds=float(cfg["solver_s"]))
+    for part in range(begin + 1, begin + parts + 1):
+        if busy is not None:
+            in_use = sum(_threads_in(p) for p in busy.parent.iterdir())
+            slow = max(1.0, in_use / float(cfg["cores"]))
+            time.sleep(sleep * slow)
+            time_per_sec = max(0.01, sleep * slow * parts / t_max)
+        else:
+            time.sleep(sleep)
+        total_steps += steps_per_part
+        _dummy(data_dir / f"Part_{part:04d}.bi4", cfg["part_kb"])
+        if solver_vtk:
+            _dummy(dirout / f"PartFluid_{part:04d}.vtk", cfg["vtk_kb"])
+        elif not cfg["solver_vtk"]:
+            _dummy(dirout / f"Part_{part:04d}.binx", cfg["part_kb"])
+        print(f"{part:05d}   {part * t_max / parts:.6f}  {total_steps:>11,}  {steps_per_part:>7,}  "
+              f"{np_now:>11,}  {4000 + part:>11,}  {time_per_sec:>9.2f}  "
+              f"{finish:%d-%m-%Y %H:%M:%S}", flush=True)
+        if cfg["out_every"] and part % int(cfg["out_every"]) == 0:
+            total_out += 1
+            np_now -= 1
+            print(f"  Particles out: 1  (total out: {total_out})  -  Current np: {np_now:,}", flush=True)
+    if busy is not None:
+        busy.unlink()
+    print("\nFinished execution (code=0).", flush=True)
+    return 0
+
+def partvtk(cfg, argv):
+    if "-dirin" in argv:
+        parts = sorted(Path(_arg(argv, "-dirin", ".")).glob("Part_[0-9]*.bi4"))
+        prefix = Path(_arg(argv, "-savevtk", "PartFluid"))
+        prefix.parent.mkdir(parents=True, exist_ok=True)
+        time.sleep(cfg["partvtk_s"])
+        for p in parts:
+            _dummy(prefix.parent / f"{prefix.name}_{p.stem.split('_')[-1]}.vtk", cfg["vtk_kb"])
+        print(f"PartVTK stand-in: {len(parts)} Part(s) converted")
+        return 0
+    out_dir = Path(argv[0])
+    binx = sorted(out_dir.glob("*.binx"))
+    time.sleep(cfg["partvtk_s"])
+    for b in binx:
+        _dummy(out_dir / f"PartFluid_{b.stem.split('_')[-1]}.vtk", cfg["vtk_kb"])
+    print(f"PartVTK stand-in: {len(binx)} file(s) converted")
+    return 0
+
+def _peak_rss_kib():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+TOOLS = {"gencase": gencase, "dualsphysics": dualsphysics, "partvtk": partvtk}
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    cfg = dict(DEFAULTS)
+    if argv[:1] == ["--config"]:
+        cfg.update(json.loads(Path(argv[1]).read_text(encoding="utf-8")))
+        argv = argv[2:]
+    tool, args = argv[0], argv[1:]
+    rc = TOOLS[tool](cfg, args)
+    if cfg.get("log"):
+        rec = {"tool": tool, "start": START, "end": time.time(), "peak_rss_kib": _peak_rss_kib()}
+        with open(cfg["log"], "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(rec) + "\n")
+    return rc
+
+def write_launchers(bin_dir, config_path):
+    """
+    Creates gencase/dualsphysics/partvtk launchers in bin_dir (.cmd on
+    Windows, executable shell scripts elsewhere). Returns {tool: path}.
+    """
+    bin_dir = Path(bin_dir)
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    script = Path(__file__).resolve()
+    out = {}
+    for tool in TOOLS:
+        if os.name == "nt":
+            path = bin_dir / f"{tool}.cmd"
+            path.write_text(f'@"{sys.executable}" "{script}" --config "{config_path}" {tool} %*\r\n')
+        else:
+            path = bin_dir / tool
+            path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{script}" --config "{config_path}" {tool} "$@"\n')
+            path.chmod(0o755)
+        out[tool] = path
+    return out
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,449 @@
+"""
+Native reader for DualSPHysics binary particle output in out/data/:
+
+    Part_Head.ibi4    case/run constants (CaseNp, CaseNfixed, Dp, ...)
+    Part_????.bi4     particle data per saved instant (Idp, Pos, Vel, Rhop)
+    PartOut_???.obi4  particles excluded during the run, one item per PART
+
+All three use DualSPHysics' JBinaryData container: a 24-byte file head,
+then items ("\\nITEM\\n"), value blocks ("\\nVALUES") and arrays ("\\nARRAY"),
+with strings stored as <uint32 length><bytes>. Headers are decoded field
+by field in file order; anything that does not fit the layout (unknown
+type, size mismatch, truncation) raises ValueError rather than being
+skipped. Arrays are indexed without reading their data; each field is
+exposed on first access as a zero-copy numpy view over a read-only mmap
+of the file.
+
+Requires numpy (not needed by Simulate.py itself unless post-processing
+features are used).
+"""
+import mmap
+import struct
+from pathlib import Path
+
+import numpy as np
+
+HEAD_SIZE  = 24
+HEAD_TITLE = b"#FileJBinaryData"
+
+CODE_ITEM   = b"\nITEM\n"
+CODE_VALUES = b"\nVALUES"
+CODE_ARRAY  = b"\nARRAY"
+
+# JBinaryData type codes (TpTypeData in DualSPHysics' TypesDef.h).
+TYPE_TEXT = 1
+TYPE_BOOL = 2
+TYPE_DTYPES = {
+    3: np.dtype("<i1"), 4: np.dtype("<u1"), 5: np.dtype("<i2"), 6: np.dtype("<u2"),
+    7: np.dtype("<i4"), 8: np.dtype("<u4"), 9: np.dtype("<i8"), 10: np.dtype("<u8"),
+    11: np.dtype("<f4"), 12: np.dtype("<f8"),
+    20: np.dtype(("<i4", 3)), 21: np.dtype(("<u4", 3)), 22: np.dtype(("<f4", 3)), 23: np.dtype(("<f8", 3)),
+    24: np.dtype(("<i4", 4)), 25: np.dtype(("<u4", 4)), 26: np.dtype(("<f4", 4)), 27: np.dtype(("<f8", 4)),
+}
+DTYPE_TYPES = {v: k for k, v in TYPE_DTYPES.items()}
+
+# Field names used by the solver for the same quantity across versions.
+FIELD_ALIASES = {
+    "pos": ("Posd", "Pos"),
+    "vel": ("Vel",),
+    "rho": ("Rhop", "Rho"),
+    "idp": ("Idp",),
+}
+
+class ArrayInfo:
+    __slots__ = ("name", "type", "count", "offset", "dtype")
+
+    def __init__(self, name, type_code, count, offset):
+        self.name = name
+        self.type = type_code
+        self.count = count
+        self.offset = offset
+        self.dtype = TYPE_DTYPES[type_code]
+
+    @property
+    def nbytes(self):
+        return self.count * self.dtype.itemsize
+
+class BinaryItem:
+    def __init__(self, name):
+        self.name = name
+        self.values = {}
+        self.arrays = {}
+
+class BinaryDataFile:
+    """
+    Index of one JBinaryData file. Only headers are read; array data is
+    skipped and later viewed in place through array(). Raises ValueError
+    for a file that is not JBinaryData, truncated or malformed.
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self._fh = self.path.open("rb")
+        size = self.path.stat().st_size
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.size = size
+        if size < HEAD_SIZE or bytes(self._mm[:len(HEAD_TITLE)]) != HEAD_TITLE:
+            self.close()
+            raise ValueError(f"{self.path}: not a JBinaryData file")
+        self.items = []
+        self._index()
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            try:
+                self._mm.close()
+            except BufferError:
+                # numpy views still reference the map; it is released with them.
+                pass
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _u32(self, pos):
+        return struct.unpack_from("<I", self._mm, pos)[0]
+
+    def _i32(self, pos):
+        return struct.unpack_from("<i", self._mm, pos)[0]
+
+    def _fail(self, pos, what):
+        raise ValueError(f"{self.path}: {what} at offset {pos}")
+
+    def _need(self, pos, n, what):
+        if pos + n > self.size:
+            self._fail(pos, f"truncated {what}")
+
+    def _str(self, pos):
+        self._need(pos, 4, "string length")
+        n = self._u32(pos)
+        if n > 4096:
+            self._fail(pos, f"implausible string length {n}")
+        self._need(pos + 4, n, "string")
+        return bytes(self._mm[pos + 4:pos + 4 + n]).decode("latin-1"), pos + 4 + n
+
+    def _code(self, pos, code):
+        found, end = self._str(pos)
+        if found.encode("latin-1") != code:
+            self._fail(pos, f"expected {code.strip().decode()} block, found {found!r}")
+        return end
+
+    def _index(self):
+        pos = HEAD_SIZE
+        while pos < self.size:
+            pos = self._read_item(pos)
+
+    def _read_item(self, pos, depth=0):
+        """
+        One item and its sub-items, decoded field by field:
+
+            "\\nITEM\\n" name hide:i32 hidevalues:i32 fmtfloat fmtdouble
+            narrays:u32 nitems:u32 "\\nVALUES" nvalues:u32 value*nvalues
+            array*narrays item*nitems
+        """
+        if depth > 16:
+            self._fail(pos, "items nested too deep")
+        pos = self._code(pos, CODE_ITEM)
+        name, pos = self._str(pos)
+        self._need(pos, 8, "item header")
+        _, pos = self._str(pos + 8)
+        _, pos = self._str(pos)
+        self._need(pos, 8, "item header")
+        narrays, nitems = struct.unpack_from("<II", self._mm, pos)
+        item = BinaryItem(name)
+        self.items.append(item)
+        pos = self._read_values(self._code(pos + 8, CODE_VALUES), item.values)
+        for _ in range(narrays):
+            pos = self._read_array(self._code(pos, CODE_ARRAY), item.arrays)
+        for _ in range(nitems):
+            pos = self._read_item(pos, depth + 1)
+        return pos
+
+    def _read_value(self, pos, type_code):
+        if type_code == TYPE_TEXT:
+            return self._str(pos)
+        if type_code == TYPE_BOOL:
+            self._need(pos, 4, "value")
+            return bool(self._i32(pos)), pos + 4
+        dt = TYPE_DTYPES.get(type_code)
+        if dt is None:
+            self._fail(pos, f"unknown value type {type_code}")
+        self._need(pos, dt.itemsize, "value")
+        v = np.frombuffer(self._mm, dtype=dt.base, count=max(1, dt.itemsize // dt.base.itemsize), offset=pos)
+        v = v.item(0) if dt.shape == () else tuple(v.tolist())
+        return v, pos + dt.itemsize
+
+    def _read_values(self, pos, out):
+        self._need(pos, 4, "value count")
+        n = self._u32(pos)
+        if n > 10000:
+            self._fail(pos, f"implausible value count {n}")
+        pos += 4
+        for _ in range(n):
+            self._need(pos, 4, "value type")
+            type_code = self._i32(pos)
+            name, p = self._str(pos + 4)
+            value, pos = self._read_value(p, type_code)
+            out[name] = value
+        return pos
+
+    def _read_array(self, pos, out):
+        """
+        name hide:i32 type:i32 count:u32 datasize:u32 data[datasize]; a
+        text array holds its count strings in those datasize bytes.
+        """
+        name, pos = self._str(pos)
+        self._need(pos, 16, f"header of array {name!r}")
+        _, type_code, count, nbytes = struct.unpack_from("<iiII", self._mm, pos)
+        head, pos = pos, pos + 16
+        if type_code == TYPE_TEXT:
+            self._need(pos, nbytes, f"data of array {name!r}")
+            q = pos
+            for _ in range(count):
+                _, q = self._str(q)
+            if q != pos + nbytes:
+                self._fail(head, f"text array {name!r}: {count} string(s) do not fill its {nbytes} bytes")
+            return q
+        dt = TYPE_DTYPES.get(type_code)
+        if dt is None:
+            self._fail(head, f"unknown type {type_code} of array {name!r}")
+        if nbytes != count * dt.itemsize:
+            self._fail(head, f"array {name!r} of {count} x {dt} should take {count * dt.itemsize} bytes, "
+                             f"header says {nbytes}")
+        self._need(pos, nbytes, f"data of array {name!r}")
+        out[name] = ArrayInfo(name, type_code, count, pos)
+        return pos + nbytes
+
+    def values(self):
+        merged = {}
+        for item in self.items:
+            merged.update(item.values)
+        return merged
+
+    def array_names(self):
+        names = []
+        for item in self.items:
+            names.extend(n for n in item.arrays if n not in names)
+        return names
+
+    def view(self, info: ArrayInfo):
+        return np.frombuffer(self._mm, dtype=info.dtype, count=info.count, offset=info.offset)
+
+    def array(self, name):
+        """
+        Array `name` as a read-only numpy view. Files split into several
+        pieces are concatenated (which copies).
+        """
+        parts = [self.view(item.arrays[name]) for item in self.items if name in item.arrays]
+        if not parts:
+            raise KeyError(f"{self.path.name}: no array {name!r} (have {self.array_names()})")
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+class PartHead:
+    """
+    Part_Head.ibi4: case constants used to classify particles by Idp.
+    """
+    def __init__(self, path):
+        with BinaryDataFile(path) as bd:
+            self.values = bd.values()
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    @property
+    def dp(self):
+        return self.values.get("Dp")
+
+    def bounds(self):
+        nfixed = int(self.values.get("CaseNfixed", 0))
+        nmoving = int(self.values.get("CaseNmoving", 0))
+        nfloat = int(self.values.get("CaseNfloat", 0))
+        return nfixed, nfixed + nmoving, nfixed + nmoving + nfloat
+
+class PartFile:
+    """
+    One Part_????.bi4. Fields load lazily on first access:
+
+        pf = PartFile("out/data/Part_0042.bi4", head)
+        pf.pos[:, 2].max(); pf.type_mask("fluid")
+    """
+    def __init__(self, path, head: PartHead = None):
+        self.path = Path(path)
+        self.head = head
+        self._bd = None
+        self._cache = {}
+
+    def _data(self):
+        if self._bd is None:
+            self._bd = BinaryDataFile(self.path)
+        return self._bd
+
+    def close(self):
+        self._cache.clear()
+        if self._bd is not None:
+            self._bd.close()
+            self._bd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def values(self):
+        return self._data().values()
+
+    @property
+    def number(self):
+        try:
+            return int(self.path.stem.split("_")[-1])
+        except ValueError:
+            return None
+
+    @property
+    def time(self):
+        v = self.values
+        for key in ("TimeStep", "Time", "TimeSim"):
+            if key in v:
+                return float(v[key])
+        return None
+
+    def field(self, name):
+        if name not in self._cache:
+            bd = self._data()
+            available = bd.array_names()
+            for candidate in FIELD_ALIASES.get(name, (name,)):
+                if candidate in available:
+                    self._cache[name] = bd.array(candidate)
+                    break
+            else:
+                raise KeyError(f"{self.path.name}: no field {name!r} (have {available})")
+        return self._cache[name]
+
+    @property
+    def pos(self):
+        return self.field("pos")
+
+    @property
+    def vel(self):
+        return self.field("vel")
+
+    @property
+    def rho(self):
+        return self.field("rho")
+
+    @property
+    def idp(self):
+        return self.field("idp")
+
+    def type_mask(self, kind="fluid"):
+        """
+        Boolean mask by particle kind ("fixed", "moving", "floating",
+        "bound", "fluid") from Idp and the Part_Head particle counts.
+        """
+        if self.head is None:
+            raise ValueError("type_mask() needs the PartHead of the run")
+        fixed_end, moving_end, float_end = self.head.bounds()
+        idp = self.idp
+        if kind == "fixed":
+            return idp < fixed_end
+        if kind == "moving":
+            return (idp >= fixed_end) & (idp < moving_end)
+        if kind == "floating":
+            return (idp >= moving_end) & (idp < float_end)
+        if kind == "bound":
+            return idp < float_end
+        if kind == "fluid":
+            return idp >= float_end
+        raise ValueError(f"unknown particle kind {kind!r}")
+
+def list_part_files(data_dir):
+    return sorted(Path(data_dir).glob("Part_[0-9][0-9][0-9][0-9]*.bi4"))
+
+def open_run(data_dir):
+    """
+    (PartHead or None, [PartFile, ...]) for an out/data directory.
+    """
+    data_dir = Path(data_dir)
+    head_path = data_dir / "Part_Head.ibi4"
+    head = PartHead(head_path) if head_path.exists() else None
+    return head, [PartFile(p, head) for p in list_part_files(data_dir)]
+
+def read_part_out(path):
+    """
+    Excluded particles from a PartOut_???.obi4: list of (values, {field: array})
+    per stored PART, arrays as views.
+    """
+    bd = BinaryDataFile(path)
+    out = []
+    for item in bd.items:
+        if item.arrays:
+            out.append((item.values, {name: bd.view(info) for name, info in item.arrays.items()}))
+    return out
+
+# ---------------------------------------------------------------------------
+# Writer (same container layout) for synthetic test/benchmark files.
+# ---------------------------------------------------------------------------
+
+def _pack_str(s):
+    b = s.encode("latin-1") if isinstance(s, str) else s
+    return struct.pack("<I", len(b)) + b
+
+def _pack_value(name, value):
+    if isinstance(value, bool):
+        return struct.pack("<i", TYPE_BOOL) + _pack_str(name) + struct.pack("<i", int(value))
+    if isinstance(value, str):
+        return struct.pack("<i", TYPE_TEXT) + _pack_str(name) + _pack_str(value)
+    if isinstance(value, int):
+        return struct.pack("<i", 8 if value >= 0 else 7) + _pack_str(name) + struct.pack("<I" if value >= 0 else "<i", value)
+    return struct.pack("<i", 12) + _pack_str(name) + struct.pack("<d", float(value))
+
+def write_binary_data(path, items):
+    """
+    items: [(item_name, {value_name: value}, {array_name: ndarray}), ...]
+    """
+    with open(path, "wb") as fh:
+        fh.write(HEAD_TITLE + bytes([1, 0, 0, 0]) + struct.pack("<I", 1))
+        for name, values, arrays in items:
+            fh.write(_pack_str(CODE_ITEM) + _pack_str(name) + struct.pack("<ii", 0, 0))
+            fh.write(_pack_str("%f") + _pack_str("%f") + struct.pack("<II", len(arrays), 0))
+            fh.write(_pack_str(CODE_VALUES) + struct.pack("<I", len(values)))
+            for k, v in values.items():
+                fh.write(_pack_value(k, v))
+            for aname, arr in arrays.items():
+                arr = np.ascontiguousarray(arr)
+                dt = np.dtype((arr.dtype.newbyteorder("<"), arr.shape[1])) if arr.ndim == 2 else arr.dtype.newbyteorder("<")
+                type_code = DTYPE_TYPES[dt]
+                fh.write(_pack_str(CODE_ARRAY) + _pack_str(aname))
+                fh.write(struct.pack("<iiII", 0, type_code, arr.shape[0], arr.nbytes))
+                fh.write(arr.astype(dt.base, copy=False).tobytes())
+
+def write_synthetic_run(data_dir, n_fluid=10000, n_bound=1000, n_parts=3, dp=0.002, time_out=0.01, seed=0):
+    """
+    Part_Head.ibi4 plus n_parts Part_????.bi4 with a settled-looking fluid
+    block above a moving boundary layer. Returns data_dir.
+    """
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    n = n_fluid + n_bound
+    write_binary_data(data_dir / "Part_Head.ibi4", [("LS0000", {
+        "CaseName": "Synthetic", "Dp": dp, "CaseNp": n, "CaseNfixed": 0, "CaseNmoving": n_bound,
+        "CaseNfloat": 0, "CaseNfluid": n_fluid, "CaseNbound": n_bound, "Data2D": True,
+    }, {})])
+    rng = np.random.default_rng(seed)
+    nx = max(1, int(np.sqrt(n_fluid * 2)))
+    ij = np.arange(n_fluid)
+    fluid = np.stack([(ij % nx) * dp - nx * dp / 2, np.zeros(n_fluid), 0.08 + (ij // nx) * dp], axis=1)
+    bound = np.stack([np.linspace(-0.45, 0.45, n_bound), np.zeros(n_bound), np.full(n_bound, 0.08 - dp)], axis=1)
+    for k in range(n_parts):
+        pos = np.vstack([bound, fluid + rng.normal(0, dp * 0.05, fluid.shape) * [1, 0, 1]]).astype("<f8")
+        vel = rng.normal(0, 0.01, (n, 3)).astype("<f4")
+        rho = (1000 + rng.normal(0, 1, n)).astype("<f4")
+        idp = np.arange(n, dtype="<u4")
+        write_binary_data(data_dir / f"Part_{k:04d}.bi4", [("PART", {
+            "TimeStep": k * time_out, "Step": k * 100, "Npok": n,
+        }, {"Idp": idp, "Posd": pos, "Vel": vel, "Rhop": rho})])
+    return data_dir
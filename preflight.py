@@ -0,0 +1,480 @@
+"""
+Pre-flight size estimate of a case from its _Def.xml, without GenCase:
+
+    CaseGeometry   the <geometry> commands (setmkfluid/setmkbound/setmkvoid,
+                   drawbox with boxfill faces and layers, fillbox, move,
+                   matrixreset, runlist) replayed on the particle lattice
+    count()        fluid/bound particle counts for one dp. Boxes are painted
+                   onto a grid compressed to the shapes' own edges (and
+                   fillbox flood-fills it), so the cost does not depend on dp
+    map_cells()    the solver's cell grid (MapCells): particle bounds plus
+                   the Domain* parameters, cells of size 2h
+    Calibration    actual/estimated ratios from solver logs (CaseNfluid,
+                   CaseNbound, allocated bytes per particle)
+    estimate()     all of the above for one dp, as an Estimate
+
+Shapes that cannot be replayed (cylinders, STL files, rotations...) make
+the counts approximate; calibration against logged runs then carries the
+estimate. Standard library only.
+"""
+import math
+import re
+from bisect import bisect_right
+from collections import deque
+from dataclasses import dataclass
+
+# From a 14,641-particle 2D CPU log: "Updated allocated memory in CPU:
+# 3,258,505" and "Requested CPU memory for 39,117 cells: 0.6 MiB".
+BYTES_PER_PARTICLE = 223
+BYTES_PER_CELL = 16
+# Index tolerance when snapping shape edges to lattice nodes.
+EPS = 1e-6
+# Largest compressed grid painted exactly; bigger cases sum shapes instead.
+MAX_GRID_CELLS = 2_000_000
+
+FACES = {"left": (0, 0), "right": (0, 1), "front": (1, 0), "back": (1, 1), "bottom": (2, 0), "top": (2, 1)}
+FLUID, BOUND = 1, 2
+_RE_DOMAIN = re.compile(r"^\s*default\s*(?:([+-])\s*([0-9.eE+-]+)\s*(%)?)?\s*$", re.IGNORECASE)
+
+def _xyz(node, default=0.0):
+    if node is None:
+        return None
+    return tuple(float(node.attrib.get(a, default)) for a in "xyz")
+
+@dataclass
+class Estimate:
+    dp: float
+    particles: int
+    fluid: int
+    bound: int
+    cells: tuple
+    n_cells: int
+    mem_bytes: int
+    kernel_h: float
+    approximate: bool = False
+
+    def __str__(self):
+        cells = "x".join(str(c) for c in self.cells)
+        return (f"~{self.particles:,} particles ({self.fluid:,} fluid, {self.bound:,} bound), "
+                f"MapCells {cells} ({self.n_cells:,}), ~{self.mem_bytes / 1024**2:,.1f} MiB"
+                + (" [approximate geometry]" if self.approximate else ""))
+
+class CaseGeometry:
+    """
+    The dp-independent part of a case definition: lattice reference and
+    limits, 2D/3D, the ordered paint/fill operations and the execution
+    parameters that size the cell grid.
+    """
+    def __init__(self, root):
+        gdef = root.find(".//geometry/definition")
+        if gdef is None or gdef.find("./pointmin") is None or gdef.find("./pointmax") is None:
+            raise ValueError("no <geometry><definition> pointmin/pointmax in the case")
+        self.pmin, self.pmax = _xyz(gdef.find("./pointmin")), _xyz(gdef.find("./pointmax"))
+        self.ref = _xyz(gdef.find("./pointref")) or (0.0, 0.0, 0.0)
+        self.flat = tuple(abs(hi - lo) < 1e-12 for lo, hi in zip(self.pmin, self.pmax))
+        self.dims = 3 - sum(self.flat) if not all(self.flat) else 3
+        self.ops = []
+        self.unsupported = set()
+        lists = {lst.get("name"): lst for lst in root.findall(".//geometry/commands/list")}
+        main = root.find(".//geometry/commands/mainlist")
+        if main is not None:
+            self._walk(main, lists, {"mk": FLUID, "offset": (0.0, 0.0, 0.0)}, depth=0)
+        self.params = {p.get("key"): p.get("value") for p in root.findall(".//execution/parameters/parameter")}
+        self.coefh = self._constant(root, "coefh", 1.0)
+        self.hdp = self._constant(root, "hdp", 0.0)
+
+    @classmethod
+    def from_tree(cls, tree):
+        return cls(tree.getroot())
+
+    @staticmethod
+    def _constant(root, tag, default):
+        node = root.find(f".//constantsdef/{tag}")
+        try:
+            return float(node.get("value")) if node is not None else default
+        except (TypeError, ValueError):
+            return default
+
+    @property
+    def approximate(self):
+        return bool(self.unsupported) or not self.ops
+
+    def _walk(self, node, lists, state, depth):
+        for cmd in node:
+            tag = cmd.tag
+            if tag == "setmkfluid":
+                state["mk"] = FLUID
+            elif tag == "setmkbound":
+                state["mk"] = BOUND
+            elif tag == "setmkvoid":
+                state["mk"] = 0
+            elif tag == "move":
+                d = _xyz(cmd)
+                state["offset"] = tuple(o + v for o, v in zip(state["offset"], d))
+            elif tag == "matrixreset":
+                state["offset"] = (0.0, 0.0, 0.0)
+            elif tag == "runlist" and depth < 8 and cmd.get("name") in lists:
+                self._walk(lists[cmd.get("name")], lists, state, depth + 1)
+            elif tag == "drawbox":
+                self._drawbox(cmd, state)
+            elif tag == "fillbox":
+                self._fillbox(cmd, state)
+            elif tag.startswith("draw") or tag.startswith("fill") or tag in ("rotate", "scale", "rotateline",
+                                                                            "mirror", "matrixstack"):
+                self.unsupported.add(tag)
+
+    def _box(self, cmd, state):
+        point, size = _xyz(cmd.find("./point")), _xyz(cmd.find("./size"))
+        if point is None or size is None:
+            self.unsupported.add(cmd.tag)
+            return None
+        lo = tuple(p + o for p, o in zip(point, state["offset"]))
+        return tuple(min(a, a + s) for a, s in zip(lo, size)), tuple(max(a, a + s) for a, s in zip(lo, size))
+
+    def _drawbox(self, cmd, state):
+        box = self._box(cmd, state)
+        if box is None:
+            return
+        fill = (cmd.findtext("./boxfill") or "solid").strip().lower()
+        faces = None
+        if fill != "solid":
+            names = [f.strip() for f in fill.split("|") if f.strip()]
+            faces = set(FACES.values()) if "all" in names else {FACES[f] for f in names if f in FACES}
+            if any(f not in FACES and f != "all" for f in names):
+                self.unsupported.add(f"boxfill {fill}")
+        layers = cmd.find("./layers")
+        vdp = [0.0]
+        if layers is not None:
+            try:
+                vdp = [float(v) for v in layers.get("vdp", "0").split(",") if v.strip()]
+            except ValueError:
+                self.unsupported.add("layers")
+        self.ops.append(("draw", state["mk"], box, faces, vdp))
+
+    def _fillbox(self, cmd, state):
+        box = self._box(cmd, state)
+        if box is None:
+            return
+        mode = (cmd.findtext("./modefill") or "void").strip().lower()
+        if mode != "void":
+            self.unsupported.add(f"modefill {mode}")
+        seed = tuple(float(cmd.get(a, 0.0)) + o for a, o in zip("xyz", state["offset"]))
+        self.ops.append(("fill", state["mk"], box, seed))
+
+    # -- lattice -------------------------------------------------------------
+
+    def _limits(self, dp):
+        """
+        Node index range [lo, hi) of the definition on each axis.
+        """
+        out = []
+        for a in range(3):
+            if self.flat[a]:
+                out.append((0, 1))
+            else:
+                lo = math.ceil((min(self.pmin[a], self.pmax[a]) - self.ref[a]) / dp - EPS)
+                hi = math.floor((max(self.pmin[a], self.pmax[a]) - self.ref[a]) / dp + EPS)
+                out.append((lo, hi + 1))
+        return out
+
+    def _index_box(self, lo, hi, dp, limits):
+        """
+        Half-open node index box of [lo, hi] clipped to the definition, or
+        None if it holds no node. Flat axes hold the one plane node when
+        the shape spans it.
+        """
+        box = []
+        for a in range(3):
+            if self.flat[a]:
+                inside = lo[a] - 1e-9 <= self.pmin[a] <= hi[a] + 1e-9
+                rng = (0, 1) if inside else (0, 0)
+            else:
+                i0 = math.ceil((lo[a] - self.ref[a]) / dp - EPS)
+                i1 = math.floor((hi[a] - self.ref[a]) / dp + EPS) + 1
+                rng = (max(i0, limits[a][0]), min(i1, limits[a][1]))
+            if rng[1] <= rng[0]:
+                return None
+            box.append(rng)
+        return tuple(box)
+
+    def _pieces(self, op, dp, limits):
+        """
+        Index boxes painted by one drawbox: the whole box, or one slab per
+        selected face, for every layer.
+        """
+        _, mk, (lo, hi), faces, vdp = op
+        out = []
+        for d in vdp:
+            grow = d * dp
+            lo_d = tuple(v if self.flat[a] else v - grow for a, v in enumerate(lo))
+            hi_d = tuple(v if self.flat[a] else v + grow for a, v in enumerate(hi))
+            box = self._index_box(lo_d, hi_d, dp, limits)
+            if box is None:
+                continue
+            if faces is None:
+                out.append(box)
+                continue
+            for axis, side in sorted(faces):
+                if self.flat[axis]:
+                    continue
+                rng = list(box)
+                edge = box[axis][side] - side
+                rng[axis] = (edge, edge + 1)
+                out.append(tuple(rng))
+        return out
+
+    def count(self, dp):
+        """
+        (fluid, bound, node index bounds of all particles or None). Exact
+        for boxes on the lattice; shapes not replayed are left out.
+        """
+        limits = self._limits(dp)
+        ops = []
+        for op in self.ops:
+            if op[0] == "draw":
+                ops.append(("draw", op[1], self._pieces(op, dp, limits)))
+            else:
+                box = self._index_box(*op[2], dp, limits)
+                seed = tuple(0 if self.flat[a] else round((op[3][a] - self.ref[a]) / dp) for a in range(3))
+                if box is not None:
+                    ops.append(("fill", op[1], box, seed))
+        cuts = [{lim[0], lim[1]} for lim in limits]
+        for op in ops:
+            for box in (op[2] if op[0] == "draw" else [op[2]]):
+                for a in range(3):
+                    cuts[a].update(box[a])
+            if op[0] == "fill":
+                for a in range(3):
+                    cuts[a].update((op[3][a], op[3][a] + 1))
+        cuts = [sorted(c for c in axis_cuts if limits[a][0] <= c <= limits[a][1])
+                for a, axis_cuts in enumerate(cuts)]
+        shape = tuple(len(c) - 1 for c in cuts)
+        if shape[0] * shape[1] * shape[2] > MAX_GRID_CELLS:
+            return self._count_loose(ops)
+        grid = _Grid(cuts)
+        for op in ops:
+            if op[0] == "draw":
+                for box in op[2]:
+                    grid.paint(box, op[1])
+            else:
+                grid.fill(op[2], op[3], op[1])
+        return grid.totals()
+
+    @staticmethod
+    def _count_loose(ops):
+        """
+        Sum of shape sizes for cases too fragmented to paint; overlaps and
+        fills are not resolved, so this overestimates bound particles.
+        """
+        counts = {FLUID: 0, BOUND: 0}
+        for op in ops:
+            for box in (op[2] if op[0] == "draw" else [op[2]]):
+                if op[1]:
+                    counts[op[1]] += _volume(box)
+        return counts[FLUID], counts[BOUND], None
+
+    def fallback_count(self, dp):
+        """
+        Lattice nodes of the whole definition box, for cases without any
+        shape that can be replayed.
+        """
+        return _volume(self._limits(dp))
+
+    # -- cell grid -----------------------------------------------------------
+
+    def kernel_h(self, dp):
+        if self.hdp > 0:
+            return self.hdp * dp
+        return self.coefh * math.sqrt(self.dims * dp * dp)
+
+    def map_cells(self, dp, bounds):
+        """
+        MapCells for particle node bounds (from count()): the particle box
+        plus a 5% h border, widened by the DomainPosmin/DomainPosmax
+        parameters, divided into cells of 2h (CellMode full).
+        """
+        h = self.kernel_h(dp)
+        if bounds is None:
+            bounds = self._limits(dp)
+        cells = []
+        for a, axis in enumerate("XYZ"):
+            if self.flat[a]:
+                lo = hi = self.pmin[a]
+            else:
+                lo = self.ref[a] + bounds[a][0] * dp
+                hi = self.ref[a] + (bounds[a][1] - 1) * dp
+            lo -= 0.05 * h
+            hi += 0.05 * h
+            size = hi - lo
+            lo = _domain_limit(self.params.get(f"DomainPosmin{axis}"), lo, -size)
+            hi = _domain_limit(self.params.get(f"DomainPosmax{axis}"), hi, size)
+            cells.append(max(1, math.ceil((hi - lo) / (2.0 * h) - EPS)))
+        return tuple(cells)
+
+def _domain_limit(value, default, size):
+    """
+    Solver domain limit from a DomainPosmin*/DomainPosmax* value: a number,
+    "default", "default + d" or "default + p%" (of the particle box size).
+    """
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    m = _RE_DOMAIN.match(value)
+    if not m:
+        return default
+    if not m.group(1):
+        return default
+    d = float(m.group(2))
+    if m.group(3):
+        d = d / 100.0 * abs(size)
+    return default + d if m.group(1) == "+" else default - d
+
+def _volume(box):
+    return (box[0][1] - box[0][0]) * (box[1][1] - box[1][0]) * (box[2][1] - box[2][0])
+
+class _Grid:
+    """
+    Node lattice compressed to the given cut positions: every cell stands
+    for a block of nodes that all shapes treat alike.
+    """
+    def __init__(self, cuts):
+        self.cuts = cuts
+        self.shape = tuple(len(c) - 1 for c in cuts)
+        self.cells = bytearray(self.shape[0] * self.shape[1] * self.shape[2])
+
+    def _range(self, a, lo, hi):
+        c = self.cuts[a]
+        return bisect_right(c, lo) - 1, bisect_right(c, hi - 1)
+
+    def _flat(self, i, j, k):
+        return (i * self.shape[1] + j) * self.shape[2] + k
+
+    def paint(self, box, mk):
+        (i0, i1), (j0, j1), (k0, k1) = (self._range(a, *box[a]) for a in range(3))
+        for i in range(i0, i1):
+            for j in range(j0, j1):
+                row = self._flat(i, j, 0)
+                self.cells[row + k0:row + k1] = bytes([mk]) * (k1 - k0)
+
+    def fill(self, box, seed, mk):
+        """
+        Flood-fills void cells inside box connected to the seed node.
+        """
+        rng = [self._range(a, *box[a]) for a in range(3)]
+        start = []
+        for a in range(3):
+            if not box[a][0] <= seed[a] < box[a][1]:
+                return
+            start.append(bisect_right(self.cuts[a], seed[a]) - 1)
+        start = tuple(start)
+        if self.cells[self._flat(*start)]:
+            return
+        seen = {start}
+        todo = deque([start])
+        while todo:
+            cell = todo.popleft()
+            self.cells[self._flat(*cell)] = mk
+            for a in range(3):
+                for step in (-1, 1):
+                    nxt = list(cell)
+                    nxt[a] += step
+                    nxt = tuple(nxt)
+                    if not rng[a][0] <= nxt[a] < rng[a][1] or nxt in seen or self.cells[self._flat(*nxt)]:
+                        continue
+                    seen.add(nxt)
+                    todo.append(nxt)
+
+    def totals(self):
+        counts = {FLUID: 0, BOUND: 0}
+        lo, hi = [None] * 3, [None] * 3
+        c = self.cuts
+        for i in range(self.shape[0]):
+            for j in range(self.shape[1]):
+                row = self._flat(i, j, 0)
+                for k in range(self.shape[2]):
+                    mk = self.cells[row + k]
+                    if not mk:
+                        continue
+                    counts[mk] += (c[0][i + 1] - c[0][i]) * (c[1][j + 1] - c[1][j]) * (c[2][k + 1] - c[2][k])
+                    for a, idx in enumerate((i, j, k)):
+                        lo[a] = c[a][idx] if lo[a] is None else min(lo[a], c[a][idx])
+                        hi[a] = c[a][idx + 1] if hi[a] is None else max(hi[a], c[a][idx + 1])
+        bounds = tuple(zip(lo, hi)) if lo[0] is not None else None
+        return counts[FLUID], counts[BOUND], bounds
+
+class Calibration:
+    """
+    Log-mean actual/estimated ratios from logged runs. add() takes one
+    run's estimate and its solver header values (CaseNfluid, CaseNbound,
+    CaseNp) and the allocated memory the solver reported.
+    """
+    def __init__(self):
+        self.logs = {"fluid": [], "bound": [], "np": [], "bytes": []}
+        self.runs = 0
+
+    def add(self, est: Estimate, info, mem_bytes=None):
+        fluid, bound, np_case = info.get("CaseNfluid"), info.get("CaseNbound"), info.get("CaseNp")
+        if not isinstance(np_case, int) or np_case <= 0:
+            return False
+        for key, actual, predicted in (("fluid", fluid, est.fluid), ("bound", bound, est.bound),
+                                       ("np", np_case, est.particles)):
+            if isinstance(actual, int) and actual > 0 and predicted > 0:
+                self.logs[key].append(math.log(actual / predicted))
+        if isinstance(mem_bytes, int) and mem_bytes > 0:
+            self.logs["bytes"].append(math.log(mem_bytes / np_case))
+        self.runs += 1
+        return True
+
+    def ratio(self, key):
+        values = self.logs[key]
+        return math.exp(sum(values) / len(values)) if values else None
+
+    def spread(self, key="np"):
+        """
+        Largest deviation of a single run's ratio from the mean, as a factor.
+        """
+        values = self.logs[key]
+        if len(values) < 2:
+            return None
+        mean = sum(values) / len(values)
+        return math.exp(max(abs(v - mean) for v in values))
+
+    def describe(self):
+        if not self.runs:
+            return "uncalibrated (no solver logs yet)"
+        parts = []
+        for key, label in (("fluid", "fluid"), ("bound", "bound"), ("np", "CaseNp")):
+            r = self.ratio(key)
+            if r is not None:
+                parts.append(f"{label} x{r:.3f}")
+        bpp = self.ratio("bytes")
+        if bpp is not None:
+            parts.append(f"{bpp:.0f} B/particle")
+        return f"calibrated on {self.runs} run(s): " + ", ".join(parts)
+
+def estimate(geometry: CaseGeometry, dp, calibration: Calibration = None, raw=False):
+    """
+    Estimate for one dp. raw=True skips calibration (what add() compares
+    logged runs against).
+    """
+    fluid, bound, bounds = geometry.count(dp)
+    approximate = geometry.approximate
+    if fluid + bound == 0:
+        fluid, bound, bounds, approximate = geometry.fallback_count(dp), 0, None, True
+    cells = geometry.map_cells(dp, bounds)
+    bpp = BYTES_PER_PARTICLE
+    if calibration is not None and not raw:
+        rf, rb, rn = calibration.ratio("fluid"), calibration.ratio("bound"), calibration.ratio("np")
+        if rf is not None and (rb is not None or not bound):
+            fluid, bound = fluid * rf, bound * (rb or 1.0)
+        elif rn is not None:
+            fluid, bound = fluid * rn, bound * rn
+        bpp = calibration.ratio("bytes") or bpp
+    fluid, bound = int(round(fluid)), int(round(bound))
+    n_cells = cells[0] * cells[1] * cells[2]
+    particles = fluid + bound
+    return Estimate(dp, particles, fluid, bound, cells, n_cells, int(particles * bpp + n_cells * BYTES_PER_CELL),
+                    geometry.kernel_h(dp), approximate)
@@ -0,0 +1,330 @@
+"""
+Headless PNG frames of particle output (out/data/Part_????.bi4, via
+partdata), with no VTK, GUI or imaging library:
+
+    scan_run      one pass over the Parts (in a process pool) that fixes the
+                  camera (bounds of every particle over the whole run) and
+                  the colour scale (0.5-99.5 percentiles of the scalar over
+                  the fluid) of a run, so frames do not jump or flicker
+    render_part   one Part rasterised to an RGB array: boundary particles
+                  grey, fluid coloured by the scalar, drawn back to front
+                  along the depth axis, plus a colour bar and the time
+    render_frames frames of one run, or several runs tiled side by side on
+                  a common time axis, rendered in a process pool
+    write_png     minimal PNG encoder (zlib)
+
+Scalars: vel (|velocity|), pressure (Tait EOS from the densities and the
+Part_Head constants), rho, z, idp. Requires numpy.
+"""
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+import numpy as np
+
+import partdata
+
+SCALARS = ("vel", "pressure", "rho", "z", "idp")
+UNITS = {"vel": "M/S", "pressure": "PA", "rho": "KG/M3", "z": "M", "idp": ""}
+# Colour map control points (ParaView's "Cool to Warm" and a viridis-like map).
+CMAPS = {
+    "coolwarm": [(59, 76, 192), (124, 159, 249), (192, 212, 245), (221, 221, 221), (242, 203, 183),
+                 (238, 133, 105), (180, 4, 38)],
+    "viridis": [(68, 1, 84), (59, 82, 139), (33, 145, 140), (94, 201, 98), (253, 231, 37)],
+    "gray": [(30, 30, 30), (235, 235, 235)],
+}
+BACKGROUND = (42, 44, 52)
+BOUND_COLOUR = (150, 150, 150)
+TEXT_COLOUR = (235, 235, 235)
+
+# 3x5 bitmap font, rows top to bottom. Lower case is drawn as upper case.
+_GLYPHS = {
+    "0": "111101101101111", "1": "010110010010111", "2": "111001111100111", "3": "111001111001111",
+    "4": "101101111001001", "5": "111100111001111", "6": "111100111101111", "7": "111001001010010",
+    "8": "111101111101111", "9": "111101111001111", "A": "010101111101101", "B": "110101110101110",
+    "C": "011100100100011", "D": "110101101101110", "E": "111100110100111", "F": "111100110100100",
+    "G": "011100101101011", "H": "101101111101101", "I": "111010010010111", "J": "001001001101010",
+    "K": "101101110101101", "L": "100100100100111", "M": "101111111101101", "N": "110101101101101",
+    "O": "010101101101010", "P": "110101110100100", "Q": "010101101110011", "R": "110101110101101",
+    "S": "011100010001110", "T": "111010010010010", "U": "101101101101111", "V": "101101101101010",
+    "W": "101101111111101", "X": "101101010101101", "Y": "101101010010010", "Z": "111001010100111",
+    ".": "000000000000010", "-": "000000111000000", "=": "000111000111000", ":": "000010000010000",
+    "_": "000000000000111", "+": "000010111010000", "/": "001001010100100", "(": "001010010010001",
+    ")": "100010010010100", " ": "000000000000000",
+}
+
+@dataclass
+class View:
+    """
+    Fixed camera and colour scale of one run. axes are the (horizontal,
+    vertical, depth) position components; lo/hi the world box on screen.
+    """
+    scalar: str
+    lo: tuple
+    hi: tuple
+    vmin: float
+    vmax: float
+    dp: float
+    width: int = 1200
+    axes: tuple = (0, 2, 1)
+    cmap: str = "coolwarm"
+    t_offset: float = 0.0
+    label: str = ""
+
+    @property
+    def text_scale(self):
+        return max(2, self.width // 400)
+
+    @property
+    def layout(self):
+        """
+        (margin, top strip, colour bar strip, plot width, plot height) in pixels.
+        """
+        margin = max(8, self.width // 60)
+        top = 7 * self.text_scale + 2 * margin
+        bar = 14 * self.text_scale + 2 * margin
+        plot_w = max(16, self.width - bar - 2 * margin)
+        span_x = max(self.hi[0] - self.lo[0], 1e-12)
+        plot_h = max(16, int(round((self.hi[1] - self.lo[1]) * plot_w / span_x)))
+        return margin, top, bar, plot_w, plot_h
+
+    @property
+    def height(self):
+        margin, top, _, _, plot_h = self.layout
+        return top + plot_h + margin
+
+def _head_constants(head):
+    if head is None:
+        return None, 7.0, 1000.0
+    return head.get("B") or head.get("CteB"), head.get("Gamma", 7.0), head.get("RhopZero", 1000.0)
+
+def part_scalar(pf, head, scalar):
+    """
+    Scalar per particle of an open PartFile.
+    """
+    if scalar == "vel":
+        v = np.asarray(pf.vel, dtype=np.float64)
+        return np.sqrt(np.einsum("ij,ij->i", v, v))
+    if scalar in ("pressure", "rho"):
+        rho = np.asarray(pf.rho, dtype=np.float64)
+        if scalar == "rho":
+            return rho
+        cte_b, gamma, rho0 = _head_constants(head)
+        return cte_b * ((rho / rho0) ** gamma - 1.0) if cte_b else rho - rho0
+    if scalar == "z":
+        return np.asarray(pf.pos[:, 2], dtype=np.float64)
+    if scalar == "idp":
+        return np.asarray(pf.idp, dtype=np.float64)
+    raise ValueError(f"unknown scalar {scalar!r} (expected one of {', '.join(SCALARS)})")
+
+def _open(part_path, head_path):
+    head = partdata.PartHead(head_path) if head_path else None
+    return head, partdata.PartFile(part_path, head)
+
+def _scan_part(part_path, head_path, scalar, axes):
+    head, pf = _open(part_path, head_path)
+    with pf:
+        pos = np.asarray(pf.pos, dtype=np.float64)[:, list(axes[:2])]
+        fluid = pf.type_mask("fluid") if head is not None else slice(None)
+        values = part_scalar(pf, head, scalar)[fluid]
+        values = values[np.isfinite(values)]
+        lo, hi = (np.percentile(values, [0.5, 99.5]) if values.size else (np.nan, np.nan))
+        return {"time": pf.time, "lo": pos.min(axis=0), "hi": pos.max(axis=0), "vlo": float(lo), "vhi": float(hi)}
+
+def scan_run(data_dir, parts=None, scalar="vel", width=1200, axes=(0, 2, 1), cmap="coolwarm", workers=1,
+             t_offset=0.0, label="", pad=0.04):
+    """
+    (View, [(part path, time)]) for the Parts of one run (all when parts is
+    None, else those Part numbers).
+    """
+    data_dir = Path(data_dir)
+    paths = partdata.list_part_files(data_dir)
+    if parts is not None:
+        wanted = set(parts)
+        paths = [p for p in paths if partdata.PartFile(p).number in wanted]
+    if not paths:
+        raise FileNotFoundError(f"No Part_????.bi4 files in {data_dir}")
+    head_path = data_dir / "Part_Head.ibi4"
+    head_path = str(head_path) if head_path.exists() else None
+    args = ([str(p) for p in paths], [head_path] * len(paths), [scalar] * len(paths), [tuple(axes)] * len(paths))
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(_scan_part, *args, chunksize=max(1, len(paths) // (4 * workers))))
+    else:
+        rows = [_scan_part(*a) for a in zip(*args)]
+    lo = np.min([r["lo"] for r in rows], axis=0)
+    hi = np.max([r["hi"] for r in rows], axis=0)
+    margin = pad * max(hi - lo)
+    vlo = np.nanmin([r["vlo"] for r in rows])
+    vhi = np.nanmax([r["vhi"] for r in rows])
+    if not np.isfinite(vlo) or not np.isfinite(vhi):
+        vlo, vhi = 0.0, 1.0
+    if vhi <= vlo:
+        vhi = vlo + (abs(vlo) or 1.0) * 1e-3
+    dp = partdata.PartHead(head_path).dp if head_path else None
+    view = View(scalar, tuple(map(float, lo - margin)), tuple(map(float, hi + margin)), float(vlo), float(vhi),
+                float(dp or max(hi - lo) / 200.0), int(width), tuple(axes), cmap, t_offset, label)
+    return view, [(str(p), r["time"]) for p, r in zip(paths, rows)]
+
+def colours(values, vmin, vmax, cmap="coolwarm"):
+    """
+    uint8 RGB per value, linear between the colour map's control points.
+    """
+    stops = np.asarray(CMAPS[cmap], dtype=np.float64)
+    x = np.clip((np.asarray(values, dtype=np.float64) - vmin) / (vmax - vmin), 0.0, 1.0)
+    x = np.nan_to_num(x, nan=0.0) * (len(stops) - 1)
+    i = np.minimum(x.astype(np.int64), len(stops) - 2)
+    f = (x - i)[:, None]
+    return (stops[i] * (1.0 - f) + stops[i + 1] * f + 0.5).astype(np.uint8)
+
+def _disk(radius):
+    r = int(radius)
+    d = np.arange(-r, r + 1)
+    dx, dy = np.meshgrid(d, d)
+    keep = dx * dx + dy * dy <= radius * radius + 0.25
+    return dx[keep], dy[keep]
+
+def _splat(img, px, py, rgb, radius):
+    h, w = img.shape[:2]
+    for ox, oy in zip(*_disk(radius)):
+        x, y = px + ox, py + oy
+        ok = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+        img[y[ok], x[ok]] = rgb[ok]
+
+def draw_text(img, x, y, text, scale=2, colour=TEXT_COLOUR):
+    """
+    Draws text with the 3x5 font, top-left at (x, y); returns the end x.
+    """
+    h, w = img.shape[:2]
+    for ch in str(text).upper():
+        glyph = _GLYPHS.get(ch, _GLYPHS[" "])
+        for k, bit in enumerate(glyph):
+            if bit == "1":
+                gx, gy = x + (k % 3) * scale, y + (k // 3) * scale
+                img[max(gy, 0):min(gy + scale, h), max(gx, 0):min(gx + scale, w)] = colour
+        x += 4 * scale
+    return x
+
+def _colour_bar(img, view, x0, y0, height):
+    s = view.text_scale
+    bar_w = 4 * s
+    ramp = colours(np.linspace(view.vmax, view.vmin, height), view.vmin, view.vmax, view.cmap)
+    img[y0:y0 + height, x0:x0 + bar_w] = ramp[:, None, :]
+    for frac in (0.0, 0.5, 1.0):
+        value = view.vmax - frac * (view.vmax - view.vmin)
+        y = min(y0 + int(frac * (height - 1)) - 2 * s, y0 + height - 5 * s)
+        draw_text(img, x0 + bar_w + s, max(y, 0), f"{value:.3g}", max(1, s // 2 + 1))
+    unit = UNITS.get(view.scalar, "")
+    draw_text(img, x0, max(y0 - 7 * s, 0), view.scalar + (f" ({unit})" if unit else ""), max(1, s // 2 + 1))
+
+def render_part(part_path, head_path, view: View):
+    """
+    RGB uint8 array [view.height, view.width, 3] of one Part.
+    """
+    head, pf = _open(part_path, head_path)
+    with pf:
+        pos = np.asarray(pf.pos, dtype=np.float64)
+        fluid = pf.type_mask("fluid") if head is not None else np.ones(len(pos), dtype=bool)
+        values = part_scalar(pf, head, view.scalar)
+        t = pf.time
+    margin, top, bar, plot_w, plot_h = view.layout
+    img = np.empty((view.height, view.width, 3), dtype=np.uint8)
+    img[:] = BACKGROUND
+    a, b, depth = view.axes
+    scale = plot_w / max(view.hi[0] - view.lo[0], 1e-12)
+    px = (margin + (pos[:, a] - view.lo[0]) * scale).astype(np.int64)
+    py = (top + plot_h - 1 - (pos[:, b] - view.lo[1]) * scale).astype(np.int64)
+    radius = max(0.0, 0.5 * view.dp * scale)
+    order = np.argsort(-pos[:, depth], kind="stable")
+    bound = order[~fluid[order]]
+    wet = order[fluid[order]]
+    _splat(img, px[bound], py[bound], np.broadcast_to(np.array(BOUND_COLOUR, np.uint8), (len(bound), 3)), radius)
+    _splat(img, px[wet], py[wet], colours(values[wet], view.vmin, view.vmax, view.cmap), radius)
+    s = view.text_scale
+    x = draw_text(img, margin, margin, view.label, s) if view.label else margin
+    if t is not None:
+        draw_text(img, x + (4 * s if view.label else 0), margin, f"t={t - view.t_offset:.3f}S", s)
+    _colour_bar(img, view, view.width - bar + margin, top + 7 * s, max(plot_h - 14 * s, 10))
+    return img
+
+def write_png(path, rgb):
+    """
+    Writes an RGB uint8 array as an 8-bit truecolour PNG.
+    """
+    rgb = np.ascontiguousarray(rgb, dtype=np.uint8)
+    h, w = rgb.shape[:2]
+    raw = np.zeros((h, 1 + 3 * w), dtype=np.uint8)
+    raw[:, 1:] = rgb.reshape(h, 3 * w)
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+    with open(path, "wb") as fh:
+        fh.write(b"\x89PNG\r\n\x1a\n")
+        fh.write(chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0)))
+        fh.write(chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)))
+        fh.write(chunk(b"IEND", b""))
+    return path
+
+def _render_frame(out_path, tiles):
+    """
+    One output PNG from [(part path, head path, View), ...] side by side.
+    """
+    images = [render_part(*tile) for tile in tiles]
+    if len(images) == 1:
+        return str(write_png(out_path, images[0]))
+    height = max(im.shape[0] for im in images)
+    gap = 4
+    frame = np.empty((height, sum(im.shape[1] for im in images) + gap * (len(images) - 1), 3), dtype=np.uint8)
+    frame[:] = (0, 0, 0)
+    x = 0
+    for im in images:
+        frame[:im.shape[0], x:x + im.shape[1]] = im
+        frame[im.shape[0]:, x:x + im.shape[1]] = BACKGROUND
+        x += im.shape[1] + gap
+    return str(write_png(out_path, frame))
+
+def frame_jobs(runs, out_dir, prefix="frame", shared_scale=False):
+    """
+    [(out path, tiles)] for runs = [(View, [(part path, time)]), ...].
+    One run gives one frame per Part (named by Part number). Several runs
+    are matched on the time axis of the run with the most Parts: each tile
+    shows its run's Part nearest in (offset-corrected) time.
+    """
+    out_dir = Path(out_dir)
+    views = [view for view, _ in runs]
+    if shared_scale and len(views) > 1:
+        vmin, vmax = min(v.vmin for v in views), max(v.vmax for v in views)
+        views = [replace(v, vmin=vmin, vmax=vmax) for v in views]
+    heads = []
+    for _, parts in runs:
+        head = Path(parts[0][0]).with_name("Part_Head.ibi4")
+        heads.append(str(head) if head.exists() else None)
+    if len(runs) == 1:
+        return [(str(out_dir / f"{prefix}_{partdata.PartFile(p).number:04d}.png"), [(p, heads[0], views[0])])
+                for p, _ in runs[0][1]]
+    clock = max(range(len(runs)), key=lambda k: len(runs[k][1]))
+    jobs = []
+    for n, (_, t_clock) in enumerate(runs[clock][1]):
+        t_clock = (t_clock or 0.0) - views[clock].t_offset
+        tiles = []
+        for k, (_, parts) in enumerate(runs):
+            times = np.array([(t if t is not None else np.nan) - views[k].t_offset for _, t in parts])
+            i = int(np.nanargmin(np.abs(times - t_clock))) if np.isfinite(times).any() else min(n, len(parts) - 1)
+            tiles.append((parts[i][0], heads[k], views[k]))
+        jobs.append((str(out_dir / f"{prefix}_{n:04d}.png"), tiles))
+    return jobs
+
+def render_frames(jobs, workers=1):
+    """
+    Renders frame_jobs() output; returns the PNG paths written.
+    """
+    if not jobs:
+        return []
+    for out_path, _ in jobs:
+        Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_render_frame, *zip(*jobs), chunksize=max(1, len(jobs) // (4 * workers))))
+    return [_render_frame(*job) for job in jobs]
@@ -0,0 +1,459 @@
+"""
+Sweep-wide results index and cross-variant field comparison.
+
+    parse_variant_name  parameters from a variant folder name as written by
+                        Simulate.safe_val_tag(): <base>__dp-..__t-..__f-..__a-..
+                        and <base>__settle__dp-..__t-.. (warm-start settling)
+    ResultsIndex        one columnar store per case: a variant table (name,
+                        kind, dp, t_end, freq, ampl, parent, ...) and a row
+                        table keyed by (variant, part, time) holding the PART
+                        metrics and the diagnostics series (surface_z_<i>,
+                        com_x/y/z, pressure_<i>, moment, ...). Saved as one
+                        .npz of plain arrays; rebuilt incrementally, only for
+                        variants whose logs or diagnostics changed.
+    compare_fields      aligns the particles of two runs (different dp) at
+                        one time by nearest neighbour (scipy cKDTree when
+                        installed, else a numpy cell grid) and reports L2 /
+                        max differences of vel, pressure, rho.
+
+Times are measured from the start of the excitation (warm-start offsets
+removed), like the diagnostics. Requires numpy.
+"""
+import json
+import math
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+
+import partdata
+
+INDEX_SUFFIX = "_results.npz"
+# Files written by Simulate.py into each variant folder.
+METRICS = Path("logs") / "metrics.jsonl"
+DIAGNOSTICS = Path("out") / "diagnostics.npz"
+WARM_START_NAME = "warm_start.json"
+VIEW_NAME = "prefix_view.json"
+
+PARAMS = ("dp", "t_end", "freq", "ampl")
+_TAGS = {"dp": "dp", "t": "t_end", "f": "freq", "a": "ampl"}
+_TAG = re.compile(r"^(dp|t|f|a)-(neg)?([0-9][0-9pe+\-]*?)(deg|rad)?$")
+# Per-Part metrics copied into the row table.
+PART_FIELDS = ("steps", "total_steps", "particles", "cells", "steps_per_s", "sim_per_wall")
+VARIANT_COLUMNS = ("name", "kind", "parent", "ampl_unit") + PARAMS + ("t_offset", "n_parts", "sim_time", "np",
+                                                                      "kernel_h", "signature")
+
+def tag_value(core):
+    """
+    Inverse of safe_val_tag()'s number formatting ("0p005" -> 0.005).
+    """
+    return float(core.replace("p", "."))
+
+def parse_variant_name(name):
+    """
+    {"base", "kind" ("run" or "settle"), dp, t_end, freq, ampl, "ampl_unit"}
+    from a variant folder name, or None if it is not one. Parameters that
+    a settling folder does not have are NaN.
+    """
+    fields = name.split("__")
+    if len(fields) < 3:
+        return None
+    kind = "run"
+    if fields[1] == "settle":
+        kind, fields = "settle", [fields[0]] + fields[2:]
+    out = {"base": fields[0], "kind": kind, "ampl_unit": ""}
+    out.update({p: math.nan for p in PARAMS})
+    for field in fields[1:]:
+        m = _TAG.match(field)
+        if m is None or _TAGS[m.group(1)] in out and not math.isnan(out[_TAGS[m.group(1)]]):
+            return None
+        value = tag_value(m.group(3))
+        out[_TAGS[m.group(1)]] = -value if m.group(2) else value
+        if m.group(1) == "a":
+            out["ampl_unit"] = m.group(4) or ""
+    needed = ("dp", "t_end") if kind == "settle" else PARAMS
+    return out if not any(math.isnan(out[p]) for p in needed) else None
+
+def _signature(variant_dir):
+    """
+    Changes whenever the metrics or diagnostics of a variant are rewritten.
+    """
+    sig = []
+    for rel in (METRICS, DIAGNOSTICS, Path(VIEW_NAME), Path(WARM_START_NAME)):
+        try:
+            st = os.stat(variant_dir / rel)
+            sig.append(f"{st.st_mtime_ns}:{st.st_size}")
+        except OSError:
+            sig.append("-")
+    return "|".join(sig)
+
+def _read_json(path):
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def _diagnostic_columns(diag):
+    """
+    Flat per-Part columns from a diagnostics.npz.
+    """
+    n = len(diag["time"])
+    cols = {"time": np.asarray(diag["time"], dtype=np.float64)}
+    for key in ("n_fluid", "ang_mom", "moment"):
+        if key in diag:
+            cols[key] = np.asarray(diag[key], dtype=np.float64).reshape(n)
+    for key in ("surface_z", "pressure"):
+        if key in diag:
+            values = np.asarray(diag[key], dtype=np.float64).reshape(n, -1)
+            for i in range(values.shape[1]):
+                cols[f"{key}_{i}"] = values[:, i]
+    if "com" in diag:
+        com = np.asarray(diag["com"], dtype=np.float64).reshape(n, 3)
+        for i, axis in enumerate("xyz"):
+            cols[f"com_{axis}"] = com[:, i]
+    return cols
+
+def scan_variant(variant_dir, params):
+    """
+    (variant row, {column: array}) for one variant folder.
+    """
+    variant_dir = Path(variant_dir)
+    t_offset = float(_read_json(variant_dir / WARM_START_NAME).get("t", 0.0))
+    view = _read_json(variant_dir / VIEW_NAME)
+    info, summary, parts = {}, {}, {}
+    try:
+        with (variant_dir / METRICS).open("r", encoding="utf-8") as fh:
+            for line in fh:
+                rec = json.loads(line)
+                kind = rec.get("kind")
+                if kind == "part":
+                    parts[rec["part"]] = rec
+                elif kind == "info":
+                    info = rec
+                elif kind == "summary":
+                    summary = rec
+    except (OSError, ValueError):
+        pass
+    numbers = sorted(set(parts) | ({0} if parts else set()))
+    rows = {"part": np.array(numbers, dtype=np.int64),
+            "time": np.array([parts[n]["part_time"] - t_offset if n in parts else 0.0 for n in numbers])}
+    for key in PART_FIELDS:
+        rows[key] = np.array([float(parts.get(n, {}).get(key, math.nan)) for n in numbers])
+    if (variant_dir / DIAGNOSTICS).exists():
+        try:
+            with np.load(variant_dir / DIAGNOSTICS) as data:
+                raw = {k: data[k] for k in data.files}
+            diag, diag_parts = _diagnostic_columns(raw), np.asarray(raw["part"], dtype=np.int64)
+        except (OSError, ValueError, KeyError):
+            diag, diag_parts = {}, None
+        if diag_parts is not None:
+            merged = np.union1d(rows["part"], diag_parts)
+            at = np.searchsorted(merged, rows["part"])
+            out = {"part": merged}
+            for key, values in rows.items():
+                if key != "part":
+                    out[key] = np.full(len(merged), math.nan)
+                    out[key][at] = values
+            at = np.searchsorted(merged, diag_parts)
+            for key, values in diag.items():
+                if key not in out:
+                    out[key] = np.full(len(merged), math.nan)
+                out[key][at] = values
+            rows = out
+    variant = dict(params, name=variant_dir.name,
+                   kind="view" if view else params["kind"], parent=view.get("parent", ""),
+                   t_offset=t_offset, n_parts=len(rows["part"]),
+                   sim_time=float(summary.get("sim_time", math.nan)),
+                   np=float(info.get("CaseNp", math.nan)), kernel_h=float(info.get("KernelH", math.nan)),
+                   signature=_signature(variant_dir))
+    return variant, rows
+
+class ResultsIndex:
+    """
+    Columnar results of every variant of a case. variants holds one array
+    per VARIANT_COLUMNS entry; rows holds "variant" (index into variants),
+    "part", "time" and every metric/diagnostic column (NaN where a variant
+    does not have it).
+    """
+    def __init__(self, variants=None, rows=None):
+        self.variants = variants or {c: np.array([], dtype=object if c in ("name", "kind", "parent", "ampl_unit",
+                                                                           "signature") else np.float64)
+                                     for c in VARIANT_COLUMNS}
+        self.rows = rows or {"variant": np.array([], dtype=np.int64), "part": np.array([], dtype=np.int64),
+                             "time": np.array([])}
+
+    def __len__(self):
+        return len(self.variants["name"])
+
+    @property
+    def columns(self):
+        return sorted(set(self.rows) - {"variant", "part", "time"})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            variants = {k[2:]: data[k] for k in data.files if k.startswith("v.")}
+            rows = {k[2:]: data[k] for k in data.files if k.startswith("r.")}
+        for key in ("name", "kind", "parent", "ampl_unit", "signature"):
+            variants[key] = variants[key].astype(object)
+        return cls(variants, rows)
+
+    def save(self, path):
+        """
+        Writes the index via a temporary file; returns the path.
+        """
+        path = Path(path)
+        arrays = {f"v.{k}": (v.astype(str) if v.dtype == object else v) for k, v in self.variants.items()}
+        arrays.update({f"r.{k}": v for k, v in self.rows.items()})
+        tmp = path.with_name(path.stem + ".tmp.npz")
+        np.savez_compressed(tmp, **arrays)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def build(cls, case_dir, base, previous=None):
+        """
+        Index of every <base>__* variant folder in case_dir. Variants whose
+        signature matches previous (an older ResultsIndex) are copied from
+        it instead of being read again. Returns (index, variants rescanned).
+        """
+        case_dir = Path(case_dir)
+        old = {}
+        if previous is not None:
+            for i, name in enumerate(previous.variants["name"]):
+                old[name] = i
+        variant_rows, row_blocks, rescanned = [], [], 0
+        for variant_dir in sorted(case_dir.glob(f"{base}__*")):
+            params = parse_variant_name(variant_dir.name)
+            if params is None or params["base"] != base or not variant_dir.is_dir():
+                continue
+            i = old.get(variant_dir.name)
+            if i is not None and previous.variants["signature"][i] == _signature(variant_dir):
+                variant = {c: previous.variants[c][i] for c in VARIANT_COLUMNS}
+                mask = previous.rows["variant"] == i
+                rows = {k: v[mask] for k, v in previous.rows.items() if k != "variant"}
+                rows = {k: v for k, v in rows.items() if k in ("part", "time") or not np.all(np.isnan(v))}
+            else:
+                variant, rows = scan_variant(variant_dir, params)
+                rescanned += 1
+            row_blocks.append(rows)
+            variant_rows.append(variant)
+        variants = {c: np.array([v[c] for v in variant_rows],
+                                dtype=object if c in ("name", "kind", "parent", "ampl_unit", "signature")
+                                else np.float64)
+                    for c in VARIANT_COLUMNS}
+        columns = sorted({k for block in row_blocks for k in block} - {"part", "time"})
+        n = [len(block["part"]) for block in row_blocks]
+        rows = {"variant": np.repeat(np.arange(len(row_blocks), dtype=np.int64), n),
+                "part": np.concatenate([b["part"] for b in row_blocks]) if row_blocks else np.array([], np.int64),
+                "time": np.concatenate([b["time"] for b in row_blocks]) if row_blocks else np.array([])}
+        for col in columns:
+            rows[col] = (np.concatenate([b.get(col, np.full(len(b["part"]), math.nan)) for b in row_blocks])
+                         if row_blocks else np.array([]))
+        return cls(variants, rows), rescanned
+
+    def select(self, kind=None, **where):
+        """
+        Indices of the variants matching where (parameter=value or a list
+        of values, compared with a relative tolerance of 1e-9).
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if kind is not None:
+            mask &= np.isin(self.variants["kind"].astype(str), np.atleast_1d(kind))
+        for key, want in where.items():
+            if key not in PARAMS:
+                raise KeyError(f"unknown parameter {key!r} (expected one of {', '.join(PARAMS)})")
+            values = self.variants[key]
+            mask &= np.any([np.isclose(values, w, rtol=1e-9, atol=0.0) for w in np.atleast_1d(want)], axis=0)
+        return np.flatnonzero(mask)
+
+    def series(self, variant, column):
+        """
+        (time, values) of one column for a variant (index or name).
+        """
+        if isinstance(variant, str):
+            variant = int(np.flatnonzero(self.variants["name"] == variant)[0])
+        if column not in self.rows:
+            raise KeyError(f"no column {column!r} (have: {', '.join(self.columns)})")
+        mask = self.rows["variant"] == variant
+        return self.rows["time"][mask], self.rows[column][mask]
+
+    def at_time(self, column, t, kind=None, **where):
+        """
+        (variant indices, values) of column at the Part nearest t per variant.
+        """
+        idx = self.select(kind, **where)
+        out = np.full(len(idx), math.nan)
+        for k, i in enumerate(idx):
+            times, values = self.series(i, column)
+            if len(times):
+                out[k] = values[int(np.argmin(np.abs(times - t)))]
+        return idx, out
+
+    def aggregate(self, column, func=np.nanmax, t_start=None, t_end=None, kind=None, **where):
+        """
+        (variant indices, func(column) per variant) over [t_start, t_end].
+        E.g. peak free-surface height per variant at ampl=6:
+        aggregate("surface_z_0", np.nanmax, ampl=6).
+        """
+        idx = self.select(kind, **where)
+        if column not in self.rows:
+            raise KeyError(f"no column {column!r} (have: {', '.join(self.columns)})")
+        values = self.rows[column]
+        time_ok = np.ones(len(values), dtype=bool)
+        if t_start is not None:
+            time_ok &= self.rows["time"] >= t_start
+        if t_end is not None:
+            time_ok &= self.rows["time"] <= t_end
+        order = np.argsort(self.rows["variant"], kind="stable")
+        starts = np.searchsorted(self.rows["variant"][order], idx, side="left")
+        ends = np.searchsorted(self.rows["variant"][order], idx, side="right")
+        out = np.full(len(idx), math.nan)
+        for k, (a, b) in enumerate(zip(starts, ends)):
+            rows = order[a:b][time_ok[order[a:b]]]
+            picked = values[rows]
+            if len(picked) and not np.all(np.isnan(picked)):
+                out[k] = func(picked)
+        return idx, out
+
+    def table(self, idx, values=None, column=""):
+        """
+        Text table of the parameters of the variants idx (plus values).
+        """
+        lines = [f"{'variant':<44} {'kind':<6} {'dp':>9} {'t_end':>7} {'freq':>7} {'ampl':>7} {'parts':>6}"
+                 + (f" {column:>14}" if values is not None else "")]
+        for k, i in enumerate(idx):
+            v = self.variants
+            lines.append(f"{v['name'][i]:<44} {v['kind'][i]:<6} {v['dp'][i]:>9g} {v['t_end'][i]:>7g} "
+                         f"{v['freq'][i]:>7g} {v['ampl'][i]:>7g} {int(v['n_parts'][i]):>6}"
+                         + (f" {values[k]:>14.6g}" if values is not None else ""))
+        return "\n".join(lines)
+
+def update_index(case_dir, base):
+    """
+    Builds or refreshes <case_dir>/<base>_results.npz. Returns (index,
+    path, variants rescanned).
+    """
+    path = Path(case_dir) / f"{base}{INDEX_SUFFIX}"
+    previous = None
+    if path.exists():
+        try:
+            previous = ResultsIndex.load(path)
+        except (OSError, ValueError, KeyError):
+            previous = None
+    index, rescanned = ResultsIndex.build(case_dir, base, previous)
+    if rescanned or previous is None or len(previous) != len(index):
+        index.save(path)
+    return index, path, rescanned
+
+# ---------------------------------------------------------------------------
+# Cross-resolution field comparison
+# ---------------------------------------------------------------------------
+
+def cell_grid_nearest(points, queries, cell):
+    """
+    (distance, index into points) of the nearest point to each query,
+    searching the query's cell and its neighbours of a uniform grid with
+    spacing cell. Queries with no point within one cell get (inf, -1).
+    """
+    points = np.asarray(points, dtype=np.float64)
+    queries = np.asarray(queries, dtype=np.float64)
+    lo = np.minimum(points.min(axis=0), queries.min(axis=0)) - cell
+    dims = np.floor((np.maximum(points.max(axis=0), queries.max(axis=0)) + cell - lo) / cell).astype(np.int64) + 1
+    strides = np.cumprod(np.concatenate([[1], dims[:-1]]))
+
+    def keys(ijk):
+        return (ijk * strides).sum(axis=1)
+    pcell = np.floor((points - lo) / cell).astype(np.int64)
+    pkeys = keys(pcell)
+    order = np.argsort(pkeys, kind="stable")
+    skeys = pkeys[order]
+    qcell = np.floor((queries - lo) / cell).astype(np.int64)
+    best_d2 = np.full(len(queries), np.inf)
+    best_i = np.full(len(queries), -1, dtype=np.int64)
+    dim = points.shape[1]
+    offsets = np.stack(np.meshgrid(*[np.arange(-1, 2)] * dim, indexing="ij"), axis=-1).reshape(-1, dim)
+    for off in offsets:
+        nk = keys(qcell + off)
+        start = np.searchsorted(skeys, nk, side="left")
+        count = np.searchsorted(skeys, nk, side="right") - start
+        for j in range(int(count.max()) if len(count) else 0):
+            q = np.flatnonzero(count > j)
+            cand = order[start[q] + j]
+            d2 = np.einsum("ij,ij->i", points[cand] - queries[q], points[cand] - queries[q])
+            better = d2 < best_d2[q]
+            best_d2[q[better]] = d2[better]
+            best_i[q[better]] = cand[better]
+    dist = np.sqrt(best_d2)
+    far = dist > cell
+    dist[far], best_i[far] = np.inf, -1
+    return dist, best_i
+
+def nearest(points, queries, max_dist):
+    """
+    cell_grid_nearest() with scipy's cKDTree when it is installed.
+    """
+    try:
+        from scipy.spatial import cKDTree
+    except ImportError:
+        return cell_grid_nearest(points, queries, max_dist)
+    dist, idx = cKDTree(points).query(queries, distance_upper_bound=max_dist)
+    idx = np.where(np.isfinite(dist), idx, -1)
+    return dist, idx
+
+def _nearest_part(data_dir, t, t_offset):
+    head, parts = partdata.open_run(data_dir)
+    if not parts:
+        raise FileNotFoundError(f"No Part_????.bi4 files in {data_dir}")
+    times = np.full(len(parts), math.nan)
+    for i, pf in enumerate(parts):
+        try:
+            times[i] = (pf.time if pf.time is not None else math.nan) - t_offset
+        except (OSError, ValueError):
+            pass
+    if np.all(np.isnan(times)):
+        raise ValueError(f"No readable Part with a time in {data_dir}")
+    pick = int(np.nanargmin(np.abs(times - t)))
+    for i, pf in enumerate(parts):
+        if i != pick:
+            pf.close()
+    return head, parts[pick]
+
+def compare_fields(data_a, data_b, t, scalars=("vel", "pressure", "rho"), t_offset_a=0.0, t_offset_b=0.0,
+                   max_dist=None):
+    """
+    Fluid fields of run B sampled at the fluid particles of run A (its
+    nearest particle, at the Parts nearest to t) and compared:
+    {"time_a", "time_b", "n", "matched", scalar: {"l2", "rel_l2", "linf",
+    "mean_a", "mean_b"}}. Make A the coarser run so that every A particle
+    has B particles close by. max_dist defaults to twice the larger dp;
+    A particles with no B particle that close (spray, a different surface
+    shape) are left out and counted in n - matched.
+    """
+    import render
+    head_a, pa = _nearest_part(data_a, t, t_offset_a)
+    head_b, pb = _nearest_part(data_b, t, t_offset_b)
+    with pa, pb:
+        fa, fb = pa.type_mask("fluid"), pb.type_mask("fluid")
+        pos_a = np.asarray(pa.pos, dtype=np.float64)[fa]
+        pos_b = np.asarray(pb.pos, dtype=np.float64)[fb]
+        fields_a = {s: render.part_scalar(pa, head_a, s)[fa] for s in scalars}
+        fields_b = {s: render.part_scalar(pb, head_b, s)[fb] for s in scalars}
+        time_a, time_b = pa.time, pb.time
+    if max_dist is None:
+        max_dist = 2.0 * max(head_a.dp or 0.0, head_b.dp or 0.0) or 1e-3
+    _, idx = nearest(pos_b, pos_a, max_dist)
+    ok = idx >= 0
+    out = {"time_a": time_a - t_offset_a, "time_b": time_b - t_offset_b, "n": int(len(pos_a)),
+           "matched": int(ok.sum())}
+    for s in scalars:
+        a, b = fields_a[s][ok], fields_b[s][idx[ok]]
+        diff = a - b
+        norm = math.sqrt(float(np.mean(a * a))) if len(a) else math.nan
+        l2 = math.sqrt(float(np.mean(diff * diff))) if len(a) else math.nan
+        out[s] = {"l2": l2, "rel_l2": l2 / norm if norm else math.nan,
+                  "linf": float(np.max(np.abs(diff))) if len(a) else math.nan,
+                  "mean_a": float(np.mean(a)) if len(a) else math.nan,
+                  "mean_b": float(np.mean(b)) if len(a) else math.nan}
+    return out
@@ -0,0 +1,302 @@
+"""
+Sloshing diagnostics from the solver's Part_????.bi4 files (via partdata):
+
+    surface_z   free-surface height at fixed gauge x positions (max fluid z
+                inside a +/- half-width window around each gauge)
+    com         fluid centre of mass
+    pressure    Shepard-filtered pressure at wall probe points (Tait EOS from
+                the particle densities, Wendland kernel over a cell list)
+    ang_mom     fluid angular momentum about the rotation axis (y component)
+    moment      sloshing moment on the tank about the axis: gravity torque
+                of the fluid minus d(ang_mom)/dt
+
+Parts are processed one at a time (optionally in a process pool), so memory
+stays bounded by a single Part; everything is vectorised over particles.
+Results go to one compressed .npz per variant. DiagnosticsTail does the same
+in-situ, Part by Part while the solver is still running.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+import partdata
+
+GRAVITY = 9.81
+
+def wendland(q):
+    """Unnormalised quintic Wendland kernel for q = r/h (zero for q >= 2)."""
+    t = np.clip(1.0 - 0.5 * q, 0.0, None)
+    return t ** 4 * (2.0 * q + 1.0)
+
+def _surface_heights(x, z, gauges, half_width):
+    """Max z per gauge window; windows must not overlap."""
+    order = np.argsort(gauges)
+    edges = np.empty(2 * len(gauges))
+    edges[0::2] = gauges[order] - half_width
+    edges[1::2] = gauges[order] + half_width
+    idx = np.searchsorted(edges, x, side="right")
+    inside = (idx % 2) == 1
+    top = np.full(len(gauges), -np.inf)
+    np.maximum.at(top, idx[inside] // 2, z[inside])
+    out = np.empty_like(top)
+    out[order] = top
+    out[~np.isfinite(out)] = np.nan
+    return out
+
+def _probe_pressure(x, z, p, probes, h):
+    """Shepard-normalised kernel average of p at each (x, z) probe."""
+    radius = 2.0 * h
+    cx = np.floor(x / radius).astype(np.int64)
+    cz = np.floor(z / radius).astype(np.int64)
+    keys = cx * 1_000_003 + cz
+    order = np.argsort(keys, kind="stable")
+    skeys = keys[order]
+    out = np.full(len(probes), np.nan)
+    for k, (px, pz) in enumerate(probes):
+        pcx, pcz = int(np.floor(px / radius)), int(np.floor(pz / radius))
+        cells = np.array([(pcx + i) * 1_000_003 + (pcz + j) for i in (-1, 0, 1) for j in (-1, 0, 1)])
+        lo = np.searchsorted(skeys, cells, side="left")
+        hi = np.searchsorted(skeys, cells, side="right")
+        if not np.any(hi > lo):
+            continue
+        cand = order[np.concatenate([np.arange(a, b) for a, b in zip(lo, hi)])]
+        q = np.hypot(x[cand] - px, z[cand] - pz) / h
+        w = wendland(q)
+        wsum = w.sum()
+        if wsum > 0:
+            out[k] = float((w * p[cand]).sum() / wsum)
+    return out
+
+def part_diagnostics(part_path, head_path, gauges, half_width, probes, h, axis, cte_b, gamma, rho0):
+    """
+    Diagnostics row for one Part file. Top-level so it can run in a
+    process pool.
+    """
+    head = partdata.PartHead(head_path) if head_path else None
+    with partdata.PartFile(part_path, head) as pf:
+        fluid = pf.type_mask("fluid") if head is not None else slice(None)
+        pos = pf.pos[fluid]
+        vel = pf.vel[fluid]
+        x, z = pos[:, 0].astype(np.float64), pos[:, 2].astype(np.float64)
+        row = {
+            "time": pf.time if pf.time is not None else np.nan,
+            "n_fluid": len(x),
+            "com": pos.mean(axis=0) if len(x) else np.full(3, np.nan),
+            "surface_z": _surface_heights(x, z, gauges, half_width) if len(gauges) else np.empty(0),
+        }
+        dx, dz = x - axis[0], z - axis[1]
+        row["ang_mom"] = float((dz * vel[:, 0] - dx * vel[:, 2]).sum())
+        row["grav_torque"] = float(GRAVITY * dx.sum())
+        if len(probes) and cte_b:
+            rho = pf.rho[fluid].astype(np.float64)
+            p = cte_b * ((rho / rho0) ** gamma - 1.0)
+            row["pressure"] = _probe_pressure(x, z, p, probes, h)
+        else:
+            row["pressure"] = np.full(len(probes), np.nan)
+    return row
+
+def _resolve(data_dir, gauges=(), probes=(), axis=(0.0, 0.0), dp=None, kernel_h=None, half_width=None,
+             cte_b=None, gamma=7.0, rho0=1000.0, mass_fluid=None):
+    """
+    Fills the constants the caller left out from Part_Head.ibi4. Returns
+    (head_path or None, part_diagnostics() arguments after the two paths,
+    dp, fluid particle mass).
+    """
+    head_path = Path(data_dir) / "Part_Head.ibi4"
+    head = partdata.PartHead(head_path) if head_path.exists() else None
+    dp = dp or (head.dp if head is not None else None) or 0.01
+    h = kernel_h or 1.7 * dp
+    half_width = half_width or 2.0 * dp
+    if head is not None:
+        cte_b = cte_b or head.get("B") or head.get("CteB")
+        gamma = head.get("Gamma", gamma)
+        rho0 = head.get("RhopZero", rho0)
+        mass_fluid = mass_fluid or head.get("MassFluid")
+    gauges = np.asarray(gauges, dtype=np.float64)
+    probes = np.asarray(probes, dtype=np.float64).reshape(-1, 2)
+    args = (gauges, half_width, probes, h, tuple(axis), cte_b, gamma, rho0)
+    return (str(head_path) if head is not None else None), args, dp, mass_fluid or (1000.0 * dp * dp)
+
+def _assemble(rows, numbers, gauges, probes, axis, dp, mass, t_offset=0.0):
+    """
+    Time series arrays from per-Part rows (in Part order).
+    """
+    time_s = np.array([r["time"] for r in rows]) - t_offset
+    ang_mom = mass * np.array([r["ang_mom"] for r in rows])
+    grav_torque = mass * np.array([r["grav_torque"] for r in rows])
+    dl_dt = np.gradient(ang_mom, time_s) if len(rows) > 1 and np.all(np.diff(time_s) > 0) else np.zeros_like(ang_mom)
+    return {
+        "time": time_s,
+        "part": np.array(numbers),
+        "n_fluid": np.array([r["n_fluid"] for r in rows]),
+        "gauge_x": gauges,
+        "surface_z": np.array([r["surface_z"] for r in rows]).reshape(len(rows), len(gauges)),
+        "com": np.array([r["com"] for r in rows]).reshape(len(rows), 3),
+        "probes": probes,
+        "pressure": np.array([r["pressure"] for r in rows]).reshape(len(rows), len(probes)),
+        "ang_mom": ang_mom,
+        "moment": grav_torque - dl_dt,
+        "axis": np.asarray(axis, dtype=np.float64),
+        "dp": np.float64(dp),
+    }
+
+def _save(out_file, result):
+    """
+    Writes the .npz via a temporary file, so readers never see half of it.
+    """
+    out_file = Path(out_file)
+    tmp = out_file.with_name(out_file.stem + ".tmp.npz")
+    np.savez_compressed(tmp, **result)
+    os.replace(tmp, out_file)
+
+def run_diagnostics(data_dir, out_file, gauges=(), probes=(), axis=(0.0, 0.0), dp=None, kernel_h=None,
+                    half_width=None, cte_b=None, gamma=7.0, rho0=1000.0, mass_fluid=None, workers=1,
+                    chunksize=8, t_offset=0.0):
+    """
+    Compute the time series for every Part in data_dir and save them to
+    out_file (.npz). Returns the dict of arrays written. t_offset is
+    subtracted from the Part times (warm-started runs).
+    """
+    parts = partdata.list_part_files(data_dir)
+    if not parts:
+        raise FileNotFoundError(f"No Part_????.bi4 files in {data_dir}")
+    head_path, args, dp, mass = _resolve(data_dir, gauges, probes, axis, dp, kernel_h, half_width, cte_b,
+                                         gamma, rho0, mass_fluid)
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(part_diagnostics, [str(p) for p in parts],
+                                 *[[a] * len(parts) for a in (head_path,) + args], chunksize=chunksize))
+    else:
+        rows = [part_diagnostics(str(p), head_path, *args) for p in parts]
+    result = _assemble(rows, [partdata.PartFile(p).number for p in parts], args[0], args[2], axis, dp, mass,
+                       t_offset)
+    _save(out_file, result)
+    return result
+
+class DiagnosticsTail:
+    """
+    In-situ run_diagnostics(): a background thread that watches data_dir
+    while the solver is still writing it and processes each Part once it
+    is complete, i.e. the next Part exists or its size has not changed for
+    settle_s. out_file is rewritten (atomically, at most every flush_s)
+    with the series so far, so partial results can be read mid-run.
+
+    params_fn() returns run_diagnostics() keyword arguments, or None while
+    they are not known yet (e.g. before the solver has printed its header);
+    Parts wait until it does. Errors in the background thread (unreadable
+    Part_Head, failed write) are kept in .error and retried on the next
+    poll; stop() processes what is left once the solver has exited, writes
+    the final file and raises if that still fails.
+    """
+    def __init__(self, data_dir, out_file, params_fn, poll_s=1.0, settle_s=2.0, flush_s=5.0):
+        self.data_dir, self.out_file, self.params_fn = Path(data_dir), Path(out_file), params_fn
+        self.poll_s, self.settle_s, self.flush_s = poll_s, settle_s, flush_s
+        self.rows = {}
+        self.errors = 0
+        self.error = None
+        self._sizes = {}
+        self._args = None
+        self._saved = 0.0
+        self._dirty = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"insitu-{self.data_dir.parent.parent.name}",
+                                        daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _ready_parts(self, final):
+        parts = partdata.list_part_files(self.data_dir) if self.data_dir.is_dir() else []
+        ready = []
+        now = time.time()
+        for k, path in enumerate(parts):
+            if path in self.rows:
+                continue
+            if final or k + 1 < len(parts):
+                ready.append(path)
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            if self._sizes.get(path) == st.st_size and now - st.st_mtime >= self.settle_s:
+                ready.append(path)
+            self._sizes[path] = st.st_size
+        return ready
+
+    def _setup(self, final):
+        if self._args is not None:
+            return True
+        try:
+            kwargs = self.params_fn()
+            if not final and (kwargs is None or not (self.data_dir / "Part_Head.ibi4").exists()):
+                return False
+            kw = dict(kwargs or {})
+            t_offset = kw.pop("t_offset", 0.0)
+            for key in ("workers", "chunksize"):
+                kw.pop(key, None)
+            self._head_path, self._args, self._dp, self._mass = _resolve(self.data_dir, **kw)
+        except (OSError, ValueError, KeyError) as e:
+            if final:
+                raise
+            # The solver may still be writing Part_Head: try again next poll.
+            self.error = e
+            return False
+        self._t_offset = t_offset
+        return True
+
+    def _process(self, final=False):
+        if not self._setup(final):
+            return
+        for path in self._ready_parts(final):
+            try:
+                self.rows[path] = part_diagnostics(str(path), self._head_path, *self._args)
+                self._dirty = True
+            except (OSError, ValueError, KeyError):
+                if final:
+                    self.errors += 1
+                    self.rows[path] = None
+        if self._dirty and (final or time.time() - self._saved >= self.flush_s):
+            self.save()
+
+    def result(self):
+        done = sorted((p, r) for p, r in self.rows.items() if r is not None)
+        if not done:
+            return None
+        args = self._args
+        return _assemble([r for _, r in done], [partdata.PartFile(p).number for p, _ in done], args[0], args[2],
+                         args[4], self._dp, self._mass, self._t_offset)
+
+    def save(self):
+        result = self.result()
+        if result is not None:
+            _save(self.out_file, result)
+        self._saved = time.time()
+        self._dirty = False
+        return result
+
+    def _loop(self):
+        while not self._stop.wait(self.poll_s):
+            try:
+                self._process()
+            except (OSError, ValueError, KeyError) as e:
+                self.error = e
+
+    def stop(self):
+        """
+        Ends the watch, processes the remaining Parts and returns the
+        final series (None if there were no Parts).
+        """
+        self._stop.set()
+        self._thread.join()
+        self._process(final=True)
+        return self.result()
+
+def load_diagnostics(path):
+    with np.load(path) as data:
+        return {k: data[k] for k in data.files}
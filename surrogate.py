@@ -0,0 +1,151 @@
+"""
+Response-surface model for adaptive (freq, ampl) sampling:
+
+    response_value   scalar response of one variant from its sloshing
+                     diagnostics (peak |moment|, peak free-surface rise,
+                     peak probe pressure)
+    GaussianProcess  GP regression with a squared-exponential kernel on
+                     inputs scaled to the unit box; length scales picked by
+                     maximising the log marginal likelihood over a grid
+    candidate_grid   the points new samples are chosen from
+    next_points      where to sample next: predictive standard deviation,
+                     weighted up where the mean surface is steep, picked in
+                     batches by "kriging believer" (each pick is added at
+                     its predicted mean before the next one)
+
+Requires numpy.
+"""
+import numpy as np
+
+METRICS = ("moment", "surface_z", "pressure")
+LENGTH_SCALES = np.geomspace(0.05, 2.0, 12)
+
+def response_value(diag, metric="moment"):
+    """
+    The response of one variant, or None if its diagnostics lack it.
+    surface_z is the largest rise above the first sample over all gauges.
+    """
+    if metric == "moment":
+        values = np.abs(np.asarray(diag.get("moment", ()), dtype=np.float64))
+    elif metric == "surface_z":
+        z = np.asarray(diag.get("surface_z", ()), dtype=np.float64)
+        values = (z - z[:1]) if z.ndim == 2 and z.size else np.empty(0)
+    elif metric == "pressure":
+        values = np.asarray(diag.get("pressure", ()), dtype=np.float64)
+    else:
+        raise ValueError(f"unknown response metric {metric!r} (expected one of {', '.join(METRICS)})")
+    if values.size == 0 or not np.isfinite(values).any():
+        return None
+    return float(np.nanmax(values))
+
+def _sq_dist(a, b, ls):
+    d = (a[:, None, :] - b[None, :, :]) / ls
+    return np.einsum("ijk,ijk->ij", d, d)
+
+class GaussianProcess:
+    """
+    Zero-mean GP on standardised responses. Inputs are scaled by lo/span
+    (the sampling box) so the length scales are fractions of the box.
+    """
+    def __init__(self, lo, span, noise=1e-6):
+        self.lo = np.asarray(lo, dtype=np.float64)
+        self.span = np.where(np.asarray(span, dtype=np.float64) > 0, span, 1.0)
+        self.noise = noise
+        self.ls = None
+
+    def _scale(self, x):
+        return (np.asarray(x, dtype=np.float64).reshape(-1, len(self.lo)) - self.lo) / self.span
+
+    def _factor(self, ls):
+        k = np.exp(-0.5 * _sq_dist(self.x, self.x, ls))
+        k[np.diag_indices_from(k)] += self.noise
+        return np.linalg.cholesky(k)
+
+    def fit(self, x, y, ls=None):
+        """
+        Fits to samples x [n, d] and y [n]. Without ls the length scales
+        (one per input) are chosen by log marginal likelihood.
+        """
+        self.x = self._scale(x)
+        y = np.asarray(y, dtype=np.float64)
+        self.y_mean = float(y.mean())
+        self.y_std = float(y.std()) or 1.0
+        self.yn = (y - self.y_mean) / self.y_std
+        if ls is None:
+            best = None
+            for ls_try in np.stack(np.meshgrid(*[LENGTH_SCALES] * self.x.shape[1], indexing="ij"),
+                                   axis=-1).reshape(-1, self.x.shape[1]):
+                try:
+                    chol = self._factor(ls_try)
+                except np.linalg.LinAlgError:
+                    continue
+                alpha = np.linalg.solve(chol.T, np.linalg.solve(chol, self.yn))
+                lml = -0.5 * self.yn @ alpha - np.log(np.diag(chol)).sum()
+                if best is None or lml > best[0]:
+                    best = (lml, ls_try)
+            ls = best[1] if best is not None else np.full(self.x.shape[1], 0.3)
+        self.ls = np.asarray(ls, dtype=np.float64)
+        self.chol = self._factor(self.ls)
+        self.alpha = np.linalg.solve(self.chol.T, np.linalg.solve(self.chol, self.yn))
+        return self
+
+    def predict(self, xq):
+        """
+        Predictive mean and standard deviation at xq [m, d], in y units.
+        """
+        ks = np.exp(-0.5 * _sq_dist(self._scale(xq), self.x, self.ls))
+        mean = ks @ self.alpha
+        v = np.linalg.solve(self.chol, ks.T)
+        var = np.clip(1.0 - np.einsum("ij,ij->j", v, v), 0.0, None)
+        return self.y_mean + self.y_std * mean, self.y_std * np.sqrt(var)
+
+def candidate_grid(lo, hi, n=41, digits=4):
+    """
+    Axis values (rounded to `digits` significant digits, so variant names
+    stay short) and the flattened [n_f * n_a, 2] grid of candidates.
+    """
+    axes = [np.unique(np.array([float(f"{v:.{digits}g}") for v in np.linspace(a, b, n if b > a else 1)]))
+            for a, b in zip(lo, hi)]
+    mesh = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1)
+    return axes, mesh.reshape(-1, len(axes))
+
+def _slope(mean, axes, span):
+    """
+    |grad mean| on the grid, per unit fraction of the sampling box.
+    """
+    m = mean.reshape([len(a) for a in axes])
+    total = np.zeros_like(m)
+    for k, a in enumerate(axes):
+        if len(a) > 1:
+            total += (np.gradient(m, a, axis=k) * span[k]) ** 2
+    return np.sqrt(total).ravel()
+
+def next_points(gp, x, y, axes, grid, batch=1, gradient_weight=2.0, exclude=()):
+    """
+    Up to `batch` grid points to sample next with their scores, best first.
+    Score = predictive std x (1 + gradient_weight x |grad mean| / max),
+    so uncertain points on the steep flanks of a resonance come first.
+    Points in exclude (already sampled or failed) are never picked.
+    """
+    x = [tuple(p) for p in np.asarray(x, dtype=np.float64)]
+    y = list(y)
+    taken = {tuple(p) for p in exclude} | set(x)
+    picks = []
+    ls = gp.ls
+    for _ in range(batch):
+        mean, std = gp.predict(grid)
+        slope = _slope(mean, axes, gp.span)
+        weight = 1.0 + gradient_weight * (slope / slope.max() if slope.max() > 0 else 0.0)
+        score = std * weight
+        for i in np.argsort(-score):
+            point = tuple(grid[i])
+            if point not in taken:
+                break
+        else:
+            break
+        picks.append((point, float(score[i]), float(mean[i]), float(std[i])))
+        taken.add(point)
+        x.append(point)
+        y.append(float(mean[i]))
+        gp = GaussianProcess(gp.lo, gp.span, gp.noise).fit(np.array(x), np.array(y), ls=ls)
+    return picks
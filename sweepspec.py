@@ -0,0 +1,210 @@
+"""
+Declarative sweep specifications (TOML or JSON) for Simulate.py.
+
+    case = "C:/cases/Autoslosh_Def.xml"
+    unit = "degrees"
+
+    [sweep]
+    dp    = { ladder = [0.02, 0.5, 4] }      # 0.02, 0.01, 0.005, 0.0025
+    t_end = [4]
+    freq  = { range = [0.4, 0.8, 0.1] }      # start, stop (inclusive), step
+    ampl  = { linspace = [2, 8, 4] }
+    zip   = [["freq", "ampl"]]               # freq/ampl paired, not crossed
+
+    [run]
+    solver = true
+    scheduler = "parallel"
+    cores = 16
+    solver_flags = ["-svres:0"]
+
+    [[override]]
+    where = { dp = 0.0025 }
+    solver_flags = ["-ompthreads:16"]
+
+Each parameter is a scalar, a list or one of {range = [start, stop, step]},
+{linspace = [start, stop, n]}, {logspace = [start, stop, n]} or
+{ladder = [start, ratio, n]}. "omega" (rad/s) may be given instead of
+"freq". Parameters in a zip group advance together; everything else is
+crossed. Variants are generated lazily, so counting or walking a sweep
+never builds the full product in memory.
+"""
+import itertools
+import json
+import math
+from pathlib import Path
+
+PARAMS = ("dp", "t_end", "freq", "ampl")
+DEFAULTS = {"dp": [0.01], "t_end": [-1.0], "freq": [0.5], "ampl": [8.0]}
+RUN_DEFAULTS = {
+    "solver": True,
+    "mode": "cpu",
+    "scheduler": "serial",
+    "cores": None,
+    "memory_gib": None,
+    "max_jobs": None,
+    "pipeline_depth": 2,
+    "post_workers": 1,
+    "omp_tuning": True,
+    "cache": True,
+    "cache_gib": 20,
+    "manifest": True,
+    "staging": "auto",
+    "output": "full",
+    "quota_gib": 0,
+    "quota_archive": True,
+    "budget_s": 0,
+    "skip_over_budget": False,
+    "solver_flags": [],
+    "watchdog": None,
+    "diagnostics": None,
+    "convergence": None,
+    "time_prefix": True,
+    "warm_start": None,
+    "adaptive": None,
+    "preflight": True,
+    "trace": False,
+    "render": None,
+    "index": True,
+}
+
+class SpecError(ValueError):
+    pass
+
+class SweepPoint(tuple):
+    """
+    (dp, t_end, freq, ampl) combo that also carries extra solver flags.
+    Unpacks and hashes like the plain 4-tuples used elsewhere.
+    """
+    def __new__(cls, values, solver_flags=()):
+        point = super().__new__(cls, values)
+        point.solver_flags = tuple(solver_flags)
+        return point
+
+def expand_values(name, value):
+    """
+    Values of one parameter as a list (specs are small; only the product
+    of them is large).
+    """
+    if isinstance(value, (int, float)):
+        return [float(value)]
+    if isinstance(value, list):
+        return [float(v) for v in value]
+    if not isinstance(value, dict) or len(value) != 1:
+        raise SpecError(f"{name}: expected a number, a list or one of range/linspace/logspace/ladder")
+    kind, args = next(iter(value.items()))
+    try:
+        a, b, c = (float(x) for x in args)
+    except (TypeError, ValueError):
+        raise SpecError(f"{name}.{kind}: expected three numbers, got {args!r}")
+    if kind == "range":
+        if c == 0 or (b - a) / c < 0:
+            raise SpecError(f"{name}.range: step {c:g} does not go from {a:g} to {b:g}")
+        n = int(math.floor((b - a) / c + 1e-9)) + 1
+        return [round(a + i * c, 12) for i in range(n)]
+    n = int(c)
+    if n < 1:
+        raise SpecError(f"{name}.{kind}: need at least one point")
+    if kind == "linspace":
+        return [a + (b - a) * i / (n - 1) if n > 1 else a for i in range(n)]
+    if kind == "logspace":
+        if a <= 0 or b <= 0:
+            raise SpecError(f"{name}.logspace: bounds must be positive")
+        return [a * (b / a) ** (i / (n - 1)) if n > 1 else a for i in range(n)]
+    if kind == "ladder":
+        return [a * b ** i for i in range(n)]
+    raise SpecError(f"{name}: unknown generator {kind!r}")
+
+def _matches(point, where):
+    for name, want in where.items():
+        have = point[PARAMS.index(name)]
+        wants = want if isinstance(want, list) else [want]
+        if not any(math.isclose(have, float(w), rel_tol=1e-9, abs_tol=1e-12) for w in wants):
+            return False
+    return True
+
+class SweepSpec:
+    """
+    Parsed sweep spec. Iterating yields SweepPoints lazily (a fresh
+    generator each time); len() is computed without expanding.
+    """
+    def __init__(self, data: dict, source=None):
+        self.source = source
+        self.case = data.get("case")
+        self.unit = data.get("unit", "degrees")
+        if self.unit not in ("degrees", "radians"):
+            raise SpecError(f"unit must be degrees or radians, not {self.unit!r}")
+        sweep = dict(data.get("sweep", {}))
+        zip_groups = [list(g) for g in sweep.pop("zip", [])]
+        if "omega" in sweep:
+            if "freq" in sweep:
+                raise SpecError("give either freq or omega, not both")
+            sweep["freq"] = [w / (2 * math.pi) for w in expand_values("omega", sweep.pop("omega"))]
+            zip_groups = [["freq" if n == "omega" else n for n in g] for g in zip_groups]
+        unknown = set(sweep) - set(PARAMS)
+        if unknown:
+            raise SpecError(f"unknown sweep parameter(s): {', '.join(sorted(unknown))}")
+        self.values = {p: expand_values(p, sweep[p]) if p in sweep else list(DEFAULTS[p]) for p in PARAMS}
+        self.axes = []
+        grouped = set()
+        for group in zip_groups:
+            if not group or any(n not in PARAMS or n in grouped for n in group):
+                raise SpecError(f"bad zip group {group!r}")
+            lengths = {len(self.values[n]) for n in group}
+            if len(lengths) != 1:
+                raise SpecError(f"zip group {group!r} has parameters of different lengths")
+            grouped.update(group)
+            self.axes.append(tuple(group))
+        self.axes += [(p,) for p in PARAMS if p not in grouped]
+        self.axes.sort(key=lambda axis: min(PARAMS.index(n) for n in axis))
+        self.run = dict(RUN_DEFAULTS)
+        unknown = set(data.get("run", {})) - set(RUN_DEFAULTS)
+        if unknown:
+            raise SpecError(f"unknown run option(s): {', '.join(sorted(unknown))}")
+        self.run.update(data.get("run", {}))
+        self.overrides = []
+        for ov in data.get("override", []):
+            where = ov.get("where", {})
+            if set(where) - set(PARAMS):
+                raise SpecError(f"override matches unknown parameter(s): {sorted(set(where) - set(PARAMS))}")
+            self.overrides.append((where, list(ov.get("solver_flags", []))))
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        raw = path.read_bytes()
+        if path.suffix.lower() == ".toml":
+            try:
+                import tomllib
+            except ImportError:
+                try:
+                    import tomli as tomllib
+                except ImportError:
+                    raise SpecError("TOML specs need Python 3.11+ or the tomli package; use JSON instead")
+            data = tomllib.loads(raw.decode("utf-8"))
+        else:
+            data = json.loads(raw.decode("utf-8"))
+        spec = cls(data, source=path)
+        if spec.case and not Path(spec.case).is_absolute():
+            spec.case = str((path.parent / spec.case).resolve())
+        return spec
+
+    def __len__(self):
+        return math.prod(len(self.values[axis[0]]) for axis in self.axes)
+
+    def __iter__(self):
+        columns = [list(zip(*(self.values[n] for n in axis))) for axis in self.axes]
+        base_flags = list(self.run["solver_flags"])
+        for combo in itertools.product(*columns):
+            named = {}
+            for axis, vals in zip(self.axes, combo):
+                named.update(zip(axis, vals))
+            values = tuple(named[p] for p in PARAMS)
+            flags = base_flags + [f for where, fl in self.overrides if _matches(values, where) for f in fl]
+            yield SweepPoint(values, flags)
+
+    def describe(self):
+        parts = []
+        for axis in self.axes:
+            label = axis[0] if len(axis) == 1 else "zip(" + ", ".join(axis) + ")"
+            parts.append(f"{label}[{len(self.values[axis[0]])}]")
+        return " × ".join(parts) + f" = {len(self):,} variant(s)"
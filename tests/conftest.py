@@ -0,0 +1,47 @@
+"""
+Shared fixtures: a small synthetic sloshing case (bench.synthetic_case_xml)
+and the fakesph.py stand-ins for GenCase / DualSPHysics / PartVTK wired
+into Simulate, so sweeps run end to end without the real tools.
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import bench  # noqa: E402
+import fakesph  # noqa: E402
+import Simulate  # noqa: E402
+
+@pytest.fixture
+def case_dir(tmp_path):
+    case = tmp_path / "case"
+    (case / "data").mkdir(parents=True)
+    bench.synthetic_case_xml(5).write(case / "Bench_Def.xml", encoding="utf-8", xml_declaration=True)
+    return case
+
+@pytest.fixture
+def case_tree(case_dir):
+    tree, _, _ = Simulate.load_xml_with_sanitize(case_dir / "Bench_Def.xml")
+    return tree
+
+@pytest.fixture
+def fake_tools(tmp_path, monkeypatch):
+    """
+    Writes the stand-in launchers and points Simulate at them. Returns a
+    function that updates the stand-ins' JSON config (fakesph.DEFAULTS keys).
+    """
+    cfg_path = tmp_path / "fakesph.json"
+    cfg = {"parts": 4, "part_kb": 1, "vtk_kb": 1, "bi4_kb": 1}
+    cfg_path.write_text(json.dumps(cfg), encoding="utf-8")
+    exes = fakesph.write_launchers(tmp_path / "bin", cfg_path)
+    monkeypatch.setattr(Simulate, "GENCASE_EXE", str(exes["gencase"]))
+    monkeypatch.setattr(Simulate, "DUAL_CPU_EXE", str(exes["dualsphysics"]))
+    monkeypatch.setattr(Simulate, "PARTVTK_EXE", str(exes["partvtk"]))
+
+    def configure(**values):
+        cfg.update(values)
+        cfg_path.write_text(json.dumps(cfg), encoding="utf-8")
+    return configure
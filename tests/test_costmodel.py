@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+import Simulate
+
+# Ground truth the synthetic history is drawn from.
+STEPS_H, SEC_PER_PS, NP_RATIO = 400.0, 2.0e-5, 1.2
+
+def _truth(tree, dp, t_end, threads):
+    h = 2.0 * dp
+    np_case = int(Simulate.lattice_particle_estimate(tree, dp) * NP_RATIO)
+    steps = int(t_end * STEPS_H / h)
+    wall = steps * np_case * SEC_PER_PS / threads ** Simulate.THREAD_SCALING_EXP
+    return np_case, h, steps, wall
+
+def _write_run(case_dir, tree, name, dp, t_end, threads):
+    np_case, h, steps, wall = _truth(tree, dp, t_end, threads)
+    summary = {"kind": "summary", "wall_time": wall, "total_steps": steps, "sim_time": t_end,
+               "info": {"CaseNp": np_case, "Dp": dp, "KernelH": h, "RunMode": f"Cpu, OMP(Threads:{threads})"}}
+    logs = case_dir / f"Bench__{name}" / "logs"
+    logs.mkdir(parents=True)
+    (logs / "metrics.jsonl").write_text(json.dumps(summary) + "\n", encoding="utf-8")
+
+@pytest.fixture
+def history(case_dir, case_tree):
+    runs = [(0.01, 1.0, 4), (0.01, 2.0, 8), (0.008, 1.0, 4), (0.008, 0.5, 2), (0.006, 1.0, 8), (0.006, 0.5, 4)]
+    for i, (dp, t_end, threads) in enumerate(runs):
+        _write_run(case_dir, case_tree, f"run{i}", dp, t_end, threads)
+    return case_dir
+
+def test_fitted_prediction_tracks_the_history(history, case_tree):
+    model = Simulate.CostModel.from_case_dir(case_tree, history, "Bench")
+    assert len(model.samples) == 6
+    pred = model.predict(0.005, 1.5, threads=4)
+    np_case, _, steps, wall = _truth(case_tree, 0.005, 1.5, 4)
+    assert pred.seconds == pytest.approx(wall, rel=0.15)
+    assert pred.particles == pytest.approx(np_case, rel=0.05)
+    assert pred.steps == pytest.approx(steps, rel=0.05)
+    assert pred.low < wall < pred.high
+    assert "calibrated on 6 CPU run(s)" in model.describe()
+
+def test_prediction_scales_with_time_threads_and_dp(history, case_tree):
+    model = Simulate.CostModel.from_case_dir(case_tree, history, "Bench")
+    base = model.predict(0.008, 1.0, threads=4).seconds
+    assert model.predict(0.008, 2.0, threads=4).seconds == pytest.approx(2 * base)
+    assert model.predict(0.008, 1.0, threads=8).seconds == pytest.approx(base / 2 ** Simulate.THREAD_SCALING_EXP)
+    assert model.predict(0.004, 1.0, threads=4).seconds > 4 * base
+
+def test_history_narrows_the_band(history, case_tree):
+    prior = Simulate.CostModel(case_tree).predict(0.008, 1.0, threads=4)
+    fitted = Simulate.CostModel.from_case_dir(case_tree, history, "Bench").predict(0.008, 1.0, threads=4)
+    assert fitted.high / fitted.low < prior.high / prior.low
+
+def test_incomplete_summaries_are_ignored(case_dir, case_tree):
+    logs = case_dir / "Bench__partial" / "logs"
+    logs.mkdir(parents=True)
+    (logs / "metrics.jsonl").write_text(json.dumps({"kind": "summary", "wall_time": 3.0}) + "\n", encoding="utf-8")
+    model = Simulate.CostModel(case_tree)
+    assert model.observe(case_dir / "Bench__partial") is None
+    assert model.observe(case_dir / "Bench__missing") is None
+    assert not model.samples
+
+def test_serial_sweep_refits_after_each_variant(case_dir, case_tree, fake_tools, monkeypatch):
+    observed = []
+    observe = Simulate.CostModel.observe
+
+    def spy(self, variant_dir):
+        sample = observe(self, variant_dir)
+        observed.append((variant_dir.name, sample is not None))
+        return sample
+    monkeypatch.setattr(Simulate.CostModel, "observe", spy)
+    combos = [(0.01, 1.0, 0.5, 2.0), (0.01, 1.0, 0.8, 2.0)]
+    Simulate.run_sweep(case_tree, case_dir, "Bench", combos, "degrees",
+                       {"solver": True, "manifest": False, "cache": False, "index": False})
+    names = ["Bench__" + Simulate.variant_name_for(*c, "degrees") for c in combos]
+    assert [o for o in observed if o[0] in names] == [(n, True) for n in names]
@@ -0,0 +1,59 @@
+import threading
+
+import Simulate
+
+def _variant(case_dir, case_tree, dp, f=0.5):
+    return Simulate.prepare_variant(case_tree, case_dir, "Bench", dp, 1.0, f, 2.0, "degrees")
+
+def test_motion_variants_share_one_entry(case_dir, case_tree, fake_tools, tmp_path):
+    cache = Simulate.GenCaseCache(tmp_path / "cache")
+    first, second = _variant(case_dir, case_tree, 0.01, 0.5), _variant(case_dir, case_tree, 0.01, 0.8)
+    assert cache.key_for(first, "Bench", 0.01) == cache.key_for(second, "Bench", 0.01)
+    assert cache.restore(cache.key_for(first, "Bench", 0.01), first) is None
+    assert Simulate.run_gencase_cached(cache, first, "Bench", 0.01, 1.0, 0.5, 2.0, "degrees")
+    assert Simulate.run_gencase_cached(cache, second, "Bench", 0.01, 1.0, 0.8, 2.0, "degrees")
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert (second / "0.01.bi4").read_bytes() == (first / "0.01.bi4").read_bytes()
+
+def test_key_changes_with_dp_and_assets(case_dir, case_tree, fake_tools, tmp_path):
+    cache = Simulate.GenCaseCache(tmp_path / "cache")
+    variant = _variant(case_dir, case_tree, 0.01)
+    key = cache.key_for(variant, "Bench", 0.01)
+    assert cache.key_for(variant, "Bench", 0.005) != key
+    (variant / "data" / "tank.stl").write_bytes(b"solid tank\nendsolid tank\n")
+    assert cache.key_for(variant, "Bench", 0.01) != key
+
+def test_evicts_least_recently_used(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "Bench.bi4").write_bytes(b"x" * 1000)
+    cache = Simulate.GenCaseCache(tmp_path / "cache", max_bytes=2500)
+    cache.store("a", src, ["Bench.bi4"], 0.01)
+    cache.store("b", src, ["Bench.bi4"], 0.01)
+    assert cache.restore("a", src) is not None
+    cache.store("c", src, ["Bench.bi4"], 0.01)
+    assert cache.evictions == 1
+    assert cache.restore("b", src) is None
+    assert cache.restore("a", src) is not None and cache.restore("c", src) is not None
+
+def test_eviction_skips_an_entry_in_use(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "Bench.bi4").write_bytes(b"x" * 1000)
+    cache = Simulate.GenCaseCache(tmp_path / "cache", max_bytes=2500)
+    cache.store("a", src, ["Bench.bi4"], 0.01)
+    cache.store("b", src, ["Bench.bi4"], 0.01)
+    held, release = threading.Event(), threading.Event()
+
+    def restoring():
+        with cache._key_lock("a"):
+            held.set()
+            release.wait(5.0)
+    t = threading.Thread(target=restoring)
+    t.start()
+    held.wait(5.0)
+    cache.store("c", src, ["Bench.bi4"], 0.01)
+    release.set()
+    t.join()
+    assert cache.restore("a", src) is not None
+    assert cache.restore("b", src) is None
@@ -0,0 +1,32 @@
+import time
+
+import pytest
+
+import Simulate
+import sloshdiag
+
+COMBO = (0.01, 1.0, 0.5, 2.0)
+
+def test_tail_survives_an_unreadable_head(tmp_path):
+    data = tmp_path / "out" / "data"
+    data.mkdir(parents=True)
+    (data / "Part_Head.ibi4").write_bytes(b"\0" * 1024)
+    (data / "Part_0000.bi4").write_bytes(b"\0" * 1024)
+    tail = sloshdiag.DiagnosticsTail(data, tmp_path / "out" / "diagnostics.npz", lambda: {"dp": 0.01},
+                                     poll_s=0.01, settle_s=0.0).start()
+    deadline = time.time() + 5.0
+    while tail.error is None and time.time() < deadline:
+        time.sleep(0.01)
+    assert isinstance(tail.error, ValueError)
+    assert tail._thread.is_alive()
+    with pytest.raises(ValueError):
+        tail.stop()
+    assert not tail._thread.is_alive()
+
+def test_insitu_failure_keeps_the_solver_result(case_dir, case_tree, fake_tools, capsys):
+    fake_tools(solver_s=0.2)
+    diag_cfg = {"insitu": True, "insitu_poll_s": 0.01, "insitu_settle_s": 0.0}
+    result = Simulate.run_variant(case_tree, case_dir, "Bench", COMBO, "degrees", threads=1, diag_cfg=diag_cfg)
+    assert result["ok"] and result["stage"] == "done"
+    assert not result.get("diagnostics")
+    assert "!! Diagnostics failed" in capsys.readouterr().out
@@ -0,0 +1,70 @@
+import Simulate
+
+COMBO = (0.01, 1.0, 0.5, 2.0)
+
+def _manifest(case_dir):
+    return Simulate.SweepManifest(case_dir / Simulate.MANIFEST_NAME, case_dir)
+
+def test_done_stages_survive_a_reopen(case_dir):
+    m = _manifest(case_dir)
+    h = m.input_hash(b"<case />")
+    assert m.begin("v", COMBO, "degrees", h) == {}
+    m.stage_start("v", "gencase")
+    m.stage_end("v", "gencase")
+    m.stage_start("v", "solver")
+    m.close()
+    m = _manifest(case_dir)
+    assert m.begin("v", COMBO, "degrees", h) == {"gencase": "done", "solver": "running"}
+    assert m.stage_timings("v")["gencase"][0] == "done"
+    m.close()
+
+def test_changed_inputs_drop_recorded_stages(case_dir):
+    m = _manifest(case_dir)
+    m.begin("v", COMBO, "degrees", m.input_hash(b"<case />"))
+    m.stage_start("v", "gencase")
+    m.stage_end("v", "gencase")
+    assert m.begin("v", COMBO, "degrees", m.input_hash(b"<case dp='0.005' />")) == {}
+    (case_dir / "data" / "tank.stl").write_bytes(b"solid tank\nendsolid tank\n")
+    assert _manifest(case_dir).input_hash(b"<case />") != m.input_hash(b"<case />")
+    m.close()
+
+def test_rerun_skips_finished_stages(case_dir, case_tree, fake_tools, capsys):
+    for _ in range(2):
+        m = _manifest(case_dir)
+        result = Simulate.run_variant(case_tree, case_dir, "Bench", COMBO, "degrees", manifest=m, threads=1)
+        m.close()
+        assert result["ok"]
+    out = capsys.readouterr().out
+    assert "prepare/GenCase already done, skipping" in out
+    assert "solver already done, skipping" in out
+    assert out.count("Running GenCase") == 1
+
+def test_missing_solver_is_not_recorded_as_done(case_dir, case_tree, fake_tools, monkeypatch, tmp_path):
+    solver = Simulate.DUAL_CPU_EXE
+    monkeypatch.setattr(Simulate, "DUAL_CPU_EXE", str(tmp_path / "missing" / "DualSPHysics"))
+    m = _manifest(case_dir)
+    result = Simulate.run_variant(case_tree, case_dir, "Bench", COMBO, "degrees", manifest=m, threads=1)
+    assert not result["ok"] and result["stage"] == "solver"
+    assert result["reason"] == f"solver rc={Simulate.LAUNCH_FAILED_RC}"
+    assert m.stage_timings(result["name"])["solver"][0] == "failed"
+    m.close()
+    monkeypatch.setattr(Simulate, "DUAL_CPU_EXE", solver)
+    m = _manifest(case_dir)
+    assert Simulate.run_variant(case_tree, case_dir, "Bench", COMBO, "degrees", manifest=m, threads=1)["ok"]
+    assert m.stage_timings(result["name"])["solver"][0] == "done"
+    m.close()
+
+def test_failed_conversion_is_recorded(case_dir, case_tree, fake_tools, monkeypatch):
+    monkeypatch.setattr(Simulate, "ensure_vtk_with_partvtk", lambda out_dir, base: 3)
+    m = _manifest(case_dir)
+    result = Simulate.run_variant(case_tree, case_dir, "Bench", COMBO, "degrees", manifest=m, threads=1)
+    assert m.stage_timings(result["name"])["convert"][0] == "failed"
+    m.close()
+
+def test_serial_sweep_names_the_failed_stage(case_dir, case_tree, fake_tools, monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr(Simulate, "DUAL_CPU_EXE", str(tmp_path / "missing" / "DualSPHysics"))
+    cfg = {"solver": True, "manifest": False, "cache": False, "index": False}
+    Simulate.run_sweep(case_tree, case_dir, "Bench", [COMBO], "degrees", cfg)
+    out = capsys.readouterr().out
+    assert f"FAILED at solver (solver rc={Simulate.LAUNCH_FAILED_RC})" in out
+    assert "GenCase FAILED" not in out
@@ -0,0 +1,131 @@
+import struct
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import partdata
+
+@pytest.fixture
+def run_dir(tmp_path):
+    return partdata.write_synthetic_run(tmp_path / "data", n_fluid=200, n_bound=40, n_parts=3, dp=0.01,
+                                        time_out=0.25)
+
+def test_head_round_trip(run_dir):
+    head = partdata.PartHead(run_dir / "Part_Head.ibi4")
+    assert head.dp == pytest.approx(0.01)
+    assert head.get("CaseNp") == 240
+    assert head.get("CaseNfluid") == 200
+    assert head.get("Data2D") is True
+    assert head.get("CaseName") == "Synthetic"
+    assert head.bounds() == (0, 40, 40)
+
+def test_parts_round_trip(run_dir):
+    head, parts = partdata.open_run(run_dir)
+    assert [pf.number for pf in parts] == [0, 1, 2]
+    for k, pf in enumerate(parts):
+        with pf:
+            assert pf.time == pytest.approx(0.25 * k)
+            assert pf.pos.shape == (240, 3) and pf.pos.dtype == np.float64
+            assert pf.vel.shape == (240, 3)
+            assert pf.rho.shape == (240,)
+            assert np.array_equal(pf.idp, np.arange(240))
+
+def test_exact_arrays_round_trip(tmp_path):
+    pos = np.arange(12, dtype="<f8").reshape(4, 3) / 7.0
+    rho = np.array([999.5, 1000.0, 1000.5, 1001.0], dtype="<f4")
+    idp = np.array([3, 2, 1, 0], dtype="<u4")
+    path = tmp_path / "Part_0007.bi4"
+    partdata.write_binary_data(path, [("PART", {"TimeStep": 1.5, "Npok": 4}, {"Idp": idp, "Posd": pos, "Rhop": rho})])
+    with partdata.PartFile(path) as pf:
+        assert pf.number == 7 and pf.time == 1.5
+        assert np.array_equal(pf.pos, pos)
+        assert np.array_equal(pf.rho, rho)
+        assert np.array_equal(pf.idp, idp)
+
+def test_type_mask(run_dir):
+    head, parts = partdata.open_run(run_dir)
+    with parts[0] as pf:
+        fluid, bound = pf.type_mask("fluid"), pf.type_mask("bound")
+        assert fluid.sum() == 200 and bound.sum() == 40
+        assert not np.any(fluid & bound)
+        assert np.array_equal(pf.type_mask("moving"), bound)
+        assert not pf.type_mask("fixed").any() and not pf.type_mask("floating").any()
+        with pytest.raises(ValueError):
+            pf.type_mask("spray")
+
+def test_type_mask_needs_the_head(run_dir):
+    with partdata.PartFile(run_dir / "Part_0000.bi4") as pf:
+        with pytest.raises(ValueError):
+            pf.type_mask("fluid")
+
+def test_not_a_jbinarydata_file(tmp_path):
+    path = tmp_path / "Part_0000.bi4"
+    path.write_bytes(b"solid cube\nendsolid\n" * 8)
+    with pytest.raises(ValueError, match="not a JBinaryData file"):
+        partdata.PartHead(path)
+    with pytest.raises(ValueError, match="not a JBinaryData file"):
+        _ = partdata.PartFile(path).pos
+
+def test_empty_and_header_only_files(tmp_path, run_dir):
+    empty = tmp_path / "empty.bi4"
+    empty.write_bytes(b"")
+    with pytest.raises(ValueError):
+        partdata.PartFile(empty).values
+    head_only = tmp_path / "head_only.bi4"
+    head_only.write_bytes((run_dir / "Part_0001.bi4").read_bytes()[:10])
+    with pytest.raises(ValueError):
+        partdata.PartFile(head_only).values
+
+def test_truncated_part_is_an_error(tmp_path, run_dir):
+    data = (run_dir / "Part_0001.bi4").read_bytes()
+    path = tmp_path / "Part_0001.bi4"
+    path.write_bytes(data[:len(data) - 100])
+    with pytest.raises(ValueError, match="truncated data of array 'Rhop'"):
+        _ = partdata.PartFile(path).pos
+
+FIXTURE = Path(__file__).parent / "data" / "jbinary"
+
+def test_checked_in_fixture():
+    head = partdata.PartHead(FIXTURE / "Part_Head.ibi4")
+    assert head.get("CaseName") == "Fixture" and head.dp == 0.005
+    assert head.get("CasePosMin") == (-0.5, 0.0, 0.0)
+    assert head.bounds() == (1, 2, 2)
+    with partdata.PartFile(FIXTURE / "Part_0000.bi4", head) as pf:
+        assert pf.values["FormatVer"] == "180324" and pf.time == 0.0 and pf.values["Npok"] == 6
+        assert pf.pos.dtype == np.float64 and np.allclose(pf.pos[:, 0], np.arange(6) * 0.1)
+        assert pf.vel.dtype == np.float32 and np.allclose(pf.vel[:, 2], np.arange(6) * -0.25)
+        assert np.array_equal(pf.rho, 1000 + 0.5 * np.arange(6))
+        assert np.array_equal(pf.idp, [5, 0, 4, 1, 3, 2])
+        assert pf.type_mask("fluid").tolist() == [True, False, True, False, True, True]
+
+def test_marker_bytes_inside_a_payload(tmp_path):
+    fake = partdata._pack_str(partdata.CODE_ARRAY) + partdata._pack_str("Rhop") + struct.pack("<iiIIf", 0, 11, 1, 4, 7.0)
+    raw = np.frombuffer(fake.ljust(48, b"\0"), dtype="<f8").reshape(2, 3)
+    rho = np.array([999.0, 1001.0], dtype="<f4")
+    path = tmp_path / "Part_0000.bi4"
+    partdata.write_binary_data(path, [("PART", {"TimeStep": 0.0}, {"Posd": raw, "Rhop": rho})])
+    with partdata.PartFile(path) as pf:
+        assert pf.pos.tobytes() == raw.tobytes()
+        assert np.array_equal(pf.rho, rho)
+
+@pytest.mark.parametrize("patch, message", [
+    (lambda h: struct.pack("<iiII", 0, 99, 4, 16), "unknown type 99"),
+    (lambda h: struct.pack("<iiII", 0, 11, 4, 20), "should take 16 bytes, header says 20"),
+])
+def test_unexpected_array_header_is_an_error(tmp_path, patch, message):
+    path = tmp_path / "Part_0000.bi4"
+    partdata.write_binary_data(path, [("PART", {}, {"Rhop": np.ones(4, dtype="<f4")})])
+    data = path.read_bytes()
+    at = data.index(partdata._pack_str("Rhop")) + 8
+    path.write_bytes(data[:at] + patch(None) + data[at + 16:])
+    with pytest.raises(ValueError, match=message):
+        partdata.BinaryDataFile(path)
+
+def test_unexpected_block_is_an_error(tmp_path):
+    path = tmp_path / "Part_0000.bi4"
+    partdata.write_binary_data(path, [("PART", {}, {})])
+    data = path.read_bytes().replace(b"\nVALUES", b"\nVALUEZ")
+    path.write_bytes(data)
+    with pytest.raises(ValueError, match="expected VALUES block"):
+        partdata.BinaryDataFile(path)
@@ -0,0 +1,27 @@
+import pytest
+
+import Simulate
+
+COMBOS = [(0.01, 1.0, 0.5, 2.0), (0.01, 1.0, 0.8, 2.0), (0.01, 1.0, 1.1, 2.0)]
+
+def _broken_combos():
+    yield COMBOS[0]
+    raise RuntimeError("spec file went away")
+
+def test_pipeline_runs_every_variant(case_dir, case_tree, fake_tools):
+    results = Simulate.run_variants_pipelined(case_tree, case_dir, "Bench", COMBOS, "degrees", threads=1)
+    assert [r["ok"] for r in results] == [True] * 3
+
+def test_front_thread_error_is_raised(case_dir, case_tree, fake_tools):
+    with pytest.raises(RuntimeError, match="spec file went away"):
+        Simulate.run_variants_pipelined(case_tree, case_dir, "Bench", _broken_combos(), "degrees", threads=1)
+    assert (case_dir / ("Bench__" + Simulate.variant_name_for(*COMBOS[0], "degrees"))).is_dir()
+
+def test_solver_error_stops_the_front_thread(case_dir, case_tree, fake_tools, monkeypatch):
+    def crash(self):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(Simulate.VariantRun, "solve", crash)
+    combos = [(0.01, 1.0, 0.1 * i, 2.0) for i in range(1, 13)]
+    with pytest.raises(KeyboardInterrupt):
+        Simulate.run_variants_pipelined(case_tree, case_dir, "Bench", combos, "degrees", depth=1, threads=1)
+    assert len(list(case_dir.glob("Bench__*"))) < len(combos)
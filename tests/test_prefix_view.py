@@ -0,0 +1,33 @@
+import json
+
+import Simulate
+
+def _parent(case_dir, t0):
+    parent = case_dir / "Bench__parent"
+    (parent / "out" / "data").mkdir(parents=True)
+    (parent / "logs").mkdir()
+    recs = [{"kind": "info", "Dp": 0.01}]
+    for n in range(5):
+        (parent / "out" / "data" / f"Part_{n:04d}.bi4").write_bytes(b"")
+        recs.append({"kind": "part", "part": n, "part_time": t0 + 0.1 * n, "total_steps": 100 * n})
+    recs.append({"kind": "summary", "info": {"Dp": 0.01}, "wall_time": 9.0})
+    (parent / "logs" / "metrics.jsonl").write_text("".join(json.dumps(r) + "\n" for r in recs), encoding="utf-8")
+    if t0:
+        (parent / Simulate.WARM_START_NAME).write_text(json.dumps({"t": t0, "part": 3, "dir": "settle"}),
+                                                       encoding="utf-8")
+    return parent
+
+def test_warm_started_view_summary_keeps_t_start(case_dir):
+    view = Simulate.make_prefix_view(case_dir, "Bench", _parent(case_dir, 0.5), (0.01, 0.2, 0.5, 2.0), "degrees")
+    summary = Simulate.read_solver_summary(view)
+    assert summary["t_start"] == 0.5
+    assert summary["parts"] == 3 and abs(summary["sim_time"] - 0.2) < 1e-9
+    assert summary["info"]["TimeMax"] == 0.7
+    assert "wall_time" not in summary
+    assert Simulate.warm_start_offset(view) == 0.5
+
+def test_cold_view_summary_has_no_t_start(case_dir):
+    view = Simulate.make_prefix_view(case_dir, "Bench", _parent(case_dir, 0.0), (0.01, 0.3, 0.5, 2.0), "degrees")
+    summary = Simulate.read_solver_summary(view)
+    assert "t_start" not in summary and summary["parts"] == 4
+    assert sorted(p.name for p in (view / "out" / "data").iterdir())[-1] == "Part_0003.bi4"
@@ -0,0 +1,33 @@
+import Simulate
+
+COMBOS = [(0.01, 1.0, 0.5, 2.0), (0.002, 1.0, 0.5, 2.0)]
+SMALL = "Bench__" + Simulate.variant_name_for(*COMBOS[0], "degrees")
+LARGE = "Bench__" + Simulate.variant_name_for(*COMBOS[1], "degrees")
+
+def _cfg(action):
+    return {"solver": False, "manifest": False, "cache": False, "index": False,
+            "preflight": {"max_np": 20000, "action": action}}
+
+def test_check_flags_only_the_finer_dp(case_tree):
+    pf = Simulate.Preflight(case_tree, {"max_np": 20000}, None)
+    assert not pf.check(0.01)[1]
+    assert pf.check(0.002)[1]
+
+def test_skip_and_defer_views_have_a_length():
+    names = {Simulate.variant_name_for(*COMBOS[1], "degrees")}
+    assert len(Simulate._SkipNames(COMBOS, names, "degrees")) == 1
+    assert len(Simulate._DeferNames(COMBOS, names, "degrees")) == 2
+    assert list(Simulate._DeferNames(COMBOS[::-1], names, "degrees")) == COMBOS
+
+def test_solver_off_refuse_skips_oversize_variant(case_dir, case_tree, fake_tools, capsys):
+    Simulate.run_sweep(case_tree, case_dir, "Bench", COMBOS, "degrees", _cfg("refuse"))
+    assert (case_dir / SMALL).is_dir()
+    assert not (case_dir / LARGE).exists()
+    assert "Total variants processed: 1" in capsys.readouterr().out
+
+def test_solver_off_defer_runs_oversize_variant_last(case_dir, case_tree, fake_tools, capsys):
+    Simulate.run_sweep(case_tree, case_dir, "Bench", COMBOS[::-1], "degrees", _cfg("defer"))
+    out = capsys.readouterr().out
+    assert (case_dir / SMALL).is_dir() and (case_dir / LARGE).is_dir()
+    assert "Total variants processed: 2" in out
+    assert out.index(f"[{SMALL[len('Bench__'):]}") < out.index(f"[{LARGE[len('Bench__'):]}")
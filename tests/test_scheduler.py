@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+import Simulate
+
+class _Recorder:
+    """
+    Stand-in for _run_variant_logged: records cores in use and start order.
+    """
+    def __init__(self, durations):
+        self.durations = durations
+        self.lock = threading.Lock()
+        self.busy = 0
+        self.peak = 0
+        self.starts = []
+        self.threads = {}
+
+    def __call__(self, proxy, log_path, tree_orig, case_dir, base, combo, unit, threads=None, **opts):
+        name = Simulate.variant_name_for(*combo, unit)
+        with self.lock:
+            self.busy += threads
+            self.peak = max(self.peak, self.busy)
+            self.starts.append(name)
+            self.threads[name] = threads
+        time.sleep(self.durations.get(combo[0], 0.02))
+        with self.lock:
+            self.busy -= threads
+        return {"name": name, "ok": True, "stage": "done", "elapsed": 0.0}
+
+@pytest.fixture
+def recorder(monkeypatch):
+    def install(threads_by_dp, durations=None):
+        rec = _Recorder(durations or {})
+        monkeypatch.setattr(Simulate, "_run_variant_logged", rec)
+        monkeypatch.setattr(Simulate, "estimate_variant_resources",
+                            lambda tree, dp, max_cores, tuning=None: {"particles": 1000, "threads": threads_by_dp[dp],
+                                                                      "mem_bytes": 1024})
+        return rec
+    return install
+
+def _combos(dps):
+    return [(dp, 1.0, 0.5, float(i)) for i, dp in enumerate(dps)]
+
+def test_core_budget_is_never_exceeded(tmp_path, recorder):
+    rec = recorder({0.01: 1, 0.02: 2, 0.03: 3})
+    results = Simulate.run_variants_parallel(None, tmp_path, "Bench", _combos([0.03, 0.02, 0.01] * 4), "degrees",
+                                             max_cores=4)
+    assert len(results) == 12 and all(r["ok"] for r in results)
+    assert rec.peak <= 4
+
+def test_job_wider_than_budget_is_clamped_and_runs_alone(tmp_path, recorder):
+    rec = recorder({0.001: 16, 0.01: 1})
+    Simulate.run_variants_parallel(None, tmp_path, "Bench", _combos([0.001, 0.01, 0.01]), "degrees", max_cores=4)
+    big = Simulate.variant_name_for(*_combos([0.001])[0], "degrees")
+    assert rec.threads[big] == 4
+    assert rec.peak <= 4
+
+def test_blocked_head_job_stops_backfilling(tmp_path, recorder):
+    rec = recorder({0.001: 4, 0.01: 1}, durations={0.01: 0.05})
+    combos = _combos([0.01, 0.001] + [0.01] * 10)
+    Simulate.run_variants_parallel(None, tmp_path, "Bench", combos, "degrees", max_cores=4, max_backfill=2)
+    big = Simulate.variant_name_for(*combos[1], "degrees")
+    # One small job runs, three more are backfilled past the big one, two
+    # completions later backfilling stops, so the big job is not last.
+    assert rec.starts.index(big) < len(combos) - 1
+    assert rec.peak <= 4
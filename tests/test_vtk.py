@@ -0,0 +1,38 @@
+import pytest
+
+import Simulate
+
+@pytest.fixture
+def variant(tmp_path):
+    data = tmp_path / "variant" / "out" / "data"
+    data.mkdir(parents=True)
+    for n in range(10):
+        (data / f"Part_{n:04d}.bi4").write_bytes(b"")
+    (tmp_path / "variant" / "out" / "vtk").mkdir()
+    (tmp_path / "variant" / "out" / "vtk" / "PartFluid_0005.vtk").write_bytes(b"")
+    return tmp_path / "variant"
+
+def _stub(monkeypatch, failing=()):
+    chunks = []
+
+    def convert(exe, data_dir, chunk_dir, vtk_dir, parts, log_path):
+        chunks.append(parts)
+        if any(n in failing for n in parts):
+            return 1
+        for n in parts:
+            (vtk_dir / f"PartFluid_{n:04d}.vtk").write_bytes(b"")
+        return 0
+    monkeypatch.setattr(Simulate, "_partvtk_chunk", convert)
+    return chunks
+
+def test_materialise_vtk_splits_contiguous_ranges(variant, fake_tools, monkeypatch):
+    chunks = _stub(monkeypatch)
+    assert Simulate.materialise_vtk(variant, workers=4) == 9
+    assert sorted(chunks) == [[0, 1, 2], [3, 4], [6, 7], [8, 9]]
+
+def test_failed_chunk_is_not_counted(variant, fake_tools, monkeypatch, capsys):
+    _stub(monkeypatch, failing={3})
+    assert Simulate.materialise_vtk(variant, workers=4) == 7
+    assert "2 Part(s) got no VTK (Parts 3-4)" in capsys.readouterr().out
+    # A rerun retries only the missing Parts; Part 3 still fails on its own.
+    assert Simulate.materialise_vtk(variant, workers=4) == 1
@@ -0,0 +1,21 @@
+import Simulate
+
+def _dtmin_line(count, t, nstep=100):
+    return f"  WARNING: {count:,} DTs adjusted to DtMin (t:{t:.6f}, nstep:{nstep})"
+
+def test_dtmin_rate_counts_from_the_run_start():
+    parser = Simulate.PartTableParser()
+    dog = Simulate.SolverWatchdog(max_dtmin_per_sim_s=500)
+    assert dog.check(parser.feed(_dtmin_line(100, 0.1)), parser) == Simulate.WATCHDOG_DTMIN_RATE
+
+def test_dtmin_rate_of_warm_start_excludes_settled_time():
+    # 100 adjustments in the first 0.1 s after a restart at t=1: 1000/s, not 100/1.1 s.
+    parser = Simulate.PartTableParser(t_start=1.0)
+    dog = Simulate.SolverWatchdog(max_dtmin_per_sim_s=500)
+    assert dog.check(parser.feed(_dtmin_line(100, 1.1)), parser) == Simulate.WATCHDOG_DTMIN_RATE
+    assert "1000/s" in dog.detail
+
+def test_dtmin_grace_period_applies_after_warm_start():
+    parser = Simulate.PartTableParser(t_start=1.0)
+    dog = Simulate.SolverWatchdog(max_dtmin_per_sim_s=500, grace_sim_time=0.05)
+    assert dog.check(parser.feed(_dtmin_line(100, 1.01)), parser) is None
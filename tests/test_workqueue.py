@@ -0,0 +1,104 @@
+import os
+import time
+
+import pytest
+
+import Simulate
+import sweepspec
+import workqueue
+
+def _queue(tmp_path, worker, **kw):
+    return workqueue.WorkQueue(tmp_path / "queue", worker=worker, **kw)
+
+def _expire(queue, job_id):
+    lock = queue.claims / f"{job_id}.lock"
+    old = time.time() - queue.lease_s - 5
+    os.utime(lock, (old, old))
+
+def test_jobs_are_claimed_once_in_order(tmp_path):
+    a = _queue(tmp_path, "host-a:1")
+    a.create({"base": "Bench"})
+    for job_id in ("0001", "0000"):
+        assert a.submit(job_id, {"combo": job_id})
+    assert not a.submit("0000", {"combo": "again"})
+    b = _queue(tmp_path, "host-b:1")
+    first, second = a.claim(), b.claim()
+    assert (first.job_id, second.job_id) == ("0000", "0001")
+    assert a.claim() is None
+    assert a.status() == {"pending": 0, "running": 2, "expired": 0, "done": 0, "failed": 0}
+    assert a.workers() == {"host-a:1": "0000", "host-b:1": "0001"}
+
+def test_complete_and_drain(tmp_path):
+    q = _queue(tmp_path, "host-a:1")
+    q.create({})
+    q.submit("0000", {})
+    lease = q.claim()
+    q.complete(lease, {"ok": True})
+    assert not lease.lock_path.exists()
+    assert q.drained()
+    assert not q.submit("0000", {})
+    assert q.claim() is None
+
+def test_expired_lease_is_taken_over(tmp_path):
+    a = _queue(tmp_path, "host-a:1", lease_s=30)
+    a.create({})
+    a.submit("0000", {})
+    lease = a.claim()
+    _expire(a, "0000")
+    assert a.status()["expired"] == 1
+    b = _queue(tmp_path, "host-b:1")
+    taken = b.claim()
+    assert taken.job_id == "0000" and taken.attempt == 2
+    assert not lease.heartbeat() and lease.lost
+    assert b.workers() == {"host-b:1": "0000"}
+
+def test_job_fails_after_max_attempts(tmp_path):
+    q = _queue(tmp_path, "host-a:1", lease_s=30, max_attempts=2)
+    q.create({})
+    q.submit("0000", {})
+    q.claim()
+    _expire(q, "0000")
+    assert q.claim().attempt == 2
+    _expire(q, "0000")
+    assert q.claim() is None
+    assert workqueue._read(q.failed / "0000.json")["error"] == "lease expired 2 time(s)"
+    assert q.drained()
+
+def test_workers_agree_on_the_stored_lease(tmp_path):
+    _queue(tmp_path, "host-a:1", lease_s=45, max_attempts=5).create({})
+    q = _queue(tmp_path, "host-b:1")
+    assert (q.lease_s, q.max_attempts) == (45, 5)
+
+def test_heartbeat_touches_without_rewriting(tmp_path):
+    q = _queue(tmp_path, "host-a:1", lease_s=30)
+    q.create({})
+    q.submit("0000", {})
+    lease = q.claim()
+    before = lease.lock_path.read_bytes()
+    _expire(q, "0000")
+    assert lease.heartbeat()
+    assert q.status()["running"] == 1
+    assert lease.lock_path.read_bytes() == before
+
+def test_claim_in_a_takeover_gap_inherits_the_attempt(tmp_path):
+    a = _queue(tmp_path, "host-a:1", lease_s=30, max_attempts=2)
+    a.create({})
+    a.submit("0000", {})
+    a.claim()
+    _expire(a, "0000")
+    # Worker b renamed the expired lease away but has not created its own
+    # lock yet when worker c claims.
+    os.rename(a.claims / "0000.lock", a.claims / "0000.stale")
+    c = _queue(tmp_path, "host-c:1").claim()
+    assert c.attempt == 2
+    _expire(a, "0000")
+    os.rename(a.claims / "0000.lock", a.claims / "0000.stale")
+    assert _queue(tmp_path, "host-b:1").claim() is None
+    assert a.status()["failed"] == 1
+
+def test_submit_refuses_warm_start_specs(case_dir):
+    spec = sweepspec.SweepSpec({"case": str(case_dir / "Bench_Def.xml"), "sweep": {"dp": 0.01},
+                                          "run": {"warm_start": {"settle_s": 0.5}}})
+    with pytest.raises(sweepspec.SpecError, match="warm_start is not supported with --submit"):
+        Simulate.submit_spec(spec)
+    assert not (case_dir / Simulate.QUEUE_DIRNAME).exists()
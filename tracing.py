@@ -0,0 +1,275 @@
+"""
+Lightweight span tracing for sweeps, exported as Chrome trace-event JSON
+(open it in https://ui.perfetto.dev or chrome://tracing):
+
+    start/stop     switch the module-wide Tracer on and off
+    span()         context manager timing one stage on the calling thread;
+                   with tracing off it is a no-op costing one global lookup
+    process_span() span around a child process: pid, exit code, bytes its
+                   output folder grew by, and peak RSS / CPU time of the
+                   child where the platform reports them (wait_child())
+    mark()         a span recorded after the fact (solver start-up)
+    Tracer.summary top stages by total and self time across the sweep
+
+Spans nest per thread; self time is a span's duration minus that of the
+spans directly inside it. Standard library only.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+_active = None
+
+class Tracer:
+    """
+    Thread-safe collector of complete ("X") trace events.
+    """
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.wall0 = time.time()
+        self.pid = os.getpid()
+        self.events = []
+        self.stats = {}
+        self._tids = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _us(self, t):
+        return round((t - self.t0) * 1e6, 1)
+
+    def _tid(self):
+        ident = threading.get_ident()
+        with self._lock:
+            tid = self._tids.get(ident)
+            if tid is None:
+                tid = self._tids[ident] = len(self._tids) + 1
+                self.events.append({"ph": "M", "name": "thread_name", "pid": self.pid, "tid": tid,
+                                    "args": {"name": threading.current_thread().name}})
+        return tid
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def record(self, name, cat, start, end, child_s, args):
+        dur = end - start
+        event = {"ph": "X", "name": name, "cat": cat, "pid": self.pid, "tid": self._tid(),
+                 "ts": self._us(start), "dur": round(dur * 1e6, 1)}
+        if args:
+            event["args"] = {k: (str(v) if isinstance(v, Path) else v) for k, v in args.items()}
+        with self._lock:
+            self.events.append(event)
+            count, total, self_s, longest = self.stats.get(name, (0, 0.0, 0.0, 0.0))
+            self.stats[name] = (count + 1, total + dur, self_s + max(dur - child_s, 0.0), max(longest, dur))
+
+    def instant(self, name, cat="mark", **args):
+        event = {"ph": "i", "s": "t", "name": name, "cat": cat, "pid": self.pid, "tid": self._tid(),
+                 "ts": self._us(time.perf_counter())}
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+
+    def export(self, path):
+        """
+        Writes the trace-event JSON; returns the path.
+        """
+        path = Path(path)
+        summary = [dict(zip(("name", "count", "total_s", "self_s", "max_s"), row)) for row in self.summary(top=None)]
+        with self._lock:
+            events = list(self.events)
+        data = {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.wall0)),
+                              "summary": summary}}
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp, path)
+        return path
+
+    def summary(self, top=15):
+        """
+        [(name, count, total s, self s, max s)] by total time, longest first.
+        """
+        with self._lock:
+            rows = sorted(((name,) + stat for name, stat in self.stats.items()), key=lambda r: -r[2])
+        return rows if top is None else rows[:top]
+
+    def format_summary(self, top=15):
+        rows = self.summary(top)
+        if not rows:
+            return "Trace: no spans recorded"
+        wall = time.perf_counter() - self.t0
+        lines = [f"{'stage':<28} {'count':>6} {'total':>10} {'self':>10} {'mean':>9} {'max':>9} {'% wall':>7}"]
+        for name, count, total, self_s, longest in rows:
+            lines.append(f"{name:<28} {count:>6} {total:>9.1f}s {self_s:>9.1f}s {total / count:>8.2f}s "
+                         f"{longest:>8.1f}s {100.0 * total / wall if wall > 0 else 0.0:>6.1f}%")
+        return "\n".join(lines)
+
+class _Span:
+    __slots__ = ("tracer", "name", "cat", "args", "start", "child_s", "watch", "_bytes0")
+
+    def __init__(self, tracer, name, cat, args, watch=None):
+        self.tracer, self.name, self.cat, self.args = tracer, name, cat, args
+        self.child_s = 0.0
+        self.watch = watch
+        self._bytes0 = None
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        if self.watch is not None:
+            self._bytes0 = dir_bytes(self.watch)
+        self.tracer._stack().append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        stack = self.tracer._stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        if stack:
+            stack[-1].child_s += end - self.start
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        if self.watch is not None:
+            self.args["bytes_written"] = max(dir_bytes(self.watch) - self._bytes0, 0)
+        self.tracer.record(self.name, self.cat, self.start, end, self.child_s, self.args)
+        return False
+
+class _NoSpan:
+    __slots__ = ()
+
+    def set(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NO_SPAN = _NoSpan()
+
+def start():
+    """
+    Switches tracing on (a fresh Tracer) and returns the tracer.
+    """
+    global _active
+    _active = Tracer()
+    return _active
+
+def stop():
+    """
+    Switches tracing off and returns the tracer that was active, if any.
+    """
+    global _active
+    tracer, _active = _active, None
+    return tracer
+
+def active():
+    return _active
+
+def span(name, cat="stage", **args):
+    tracer = _active
+    return NO_SPAN if tracer is None else _Span(tracer, name, cat, args)
+
+def process_span(cmd, watch=None, **args):
+    """
+    Span named "proc:<executable>" for running cmd. watch is a folder
+    whose growth is recorded as bytes_written; call wait_child() on the
+    Popen inside it to record the exit code, peak RSS and CPU time.
+    """
+    tracer = _active
+    if tracer is None:
+        return NO_SPAN
+    args["cmd"] = " ".join(str(c) for c in cmd)
+    return _Span(tracer, f"proc:{Path(str(cmd[0])).stem}", "process", args,
+                 watch=Path(watch) if watch is not None else None)
+
+def instant(name, cat="mark", **args):
+    tracer = _active
+    if tracer is not None:
+        tracer.instant(name, cat, **args)
+
+def now():
+    return time.perf_counter()
+
+def mark(name, since, cat="stage", **args):
+    """
+    Records a span from `since` (a now() value) to now, inside the span
+    currently open on this thread: for phases only known after the fact,
+    such as the time until a child process prints its first line.
+    """
+    tracer = _active
+    if tracer is None:
+        return
+    end = time.perf_counter()
+    stack = tracer._stack()
+    if stack:
+        stack[-1].child_s += end - since
+    tracer.record(name, cat, since, end, 0.0, args)
+
+def dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+def _exit_code(status):
+    if hasattr(os, "waitstatus_to_exitcode"):
+        return os.waitstatus_to_exitcode(status)
+    return -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+
+def _windows_peak_rss(proc):
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class _Counters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + \
+                       [(f, ctypes.c_size_t) for f in ("PeakWorkingSetSize", "WorkingSetSize",
+                                                       "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                                                       "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage",
+                                                       "PagefileUsage", "PeakPagefileUsage")]
+        counters = _Counters()
+        counters.cb = ctypes.sizeof(counters)
+        if ctypes.windll.psapi.GetProcessMemoryInfo(int(proc._handle), ctypes.byref(counters), counters.cb):
+            return int(counters.PeakWorkingSetSize)
+    except (AttributeError, ImportError, OSError, ValueError):
+        pass
+    return None
+
+def wait_child(proc, sp=NO_SPAN):
+    """
+    proc.wait() that also records pid, exit code, peak RSS (bytes) and
+    CPU seconds of the child on sp. With tracing off this is proc.wait().
+    On POSIX the child is reaped with os.wait4 for its own resource usage.
+    """
+    if sp is NO_SPAN:
+        return proc.wait()
+    peak, cpu = None, None
+    if proc.returncode is None and hasattr(os, "wait4"):
+        try:
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = _exit_code(status)
+            peak = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+            cpu = round(usage.ru_utime + usage.ru_stime, 3)
+        except ChildProcessError:
+            pass
+    rc = proc.wait()
+    if peak is None and os.name == "nt":
+        peak = _windows_peak_rss(proc)
+    sp.set(pid=proc.pid, exit_code=rc, **({"peak_rss": peak} if peak is not None else {}),
+           **({"cpu_s": cpu} if cpu is not None else {}))
+    return rc
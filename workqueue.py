@@ -0,0 +1,225 @@
+"""
+Job queue on a shared filesystem (e.g. an NFS case directory) for running
+one sweep on several machines. No server: everything is files.
+
+    <root>/queue.json            run config written by the coordinator
+    <root>/jobs/<id>.json        one file per job (ids sort in run order)
+    <root>/claims/<id>.lock      lease of the worker running the job
+    <root>/claims/<id>.stale     last expired lease (carries the attempt count)
+    <root>/done/<id>.json        result of a finished job
+    <root>/failed/<id>.json      job that failed or ran out of attempts
+
+A worker claims a job by creating its lock file with O_CREAT|O_EXCL, which
+only one host can win. While running it touches the lock (mtime only, the
+contents are never rewritten) as a heartbeat. A lock that has not been
+touched for lease_s seconds is considered dead: the next worker renames it
+to <id>.stale (again only one wins) and the job is free to claim. Whoever
+then wins the O_EXCL create takes its attempt number from the stale lease,
+so the max_attempts cap holds however the takeover races. Lease checks use
+the lock file's mtime, i.e. the file server's clock.
+"""
+import json
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+
+LEASE_S = 120.0
+MAX_ATTEMPTS = 3
+
+def _write_atomic(path: Path, data):
+    tmp = path.with_name(f".{path.name}.{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}")
+    tmp.write_text(json.dumps(data, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+def _read(path: Path):
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class Lease:
+    """
+    A claimed job. Call heartbeat() regularly (or use start_heartbeat());
+    .lost turns True if another worker took the job over.
+    """
+    def __init__(self, queue, job_id, job, attempt):
+        self.queue = queue
+        self.job_id = job_id
+        self.job = job
+        self.attempt = attempt
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def lock_path(self):
+        return self.queue.claims / f"{self.job_id}.lock"
+
+    def heartbeat(self):
+        info = _read(self.lock_path)
+        if info is None or info.get("worker") != self.queue.worker:
+            self.lost = True
+            return False
+        try:
+            # Touch only: if the lease changed hands since the read above,
+            # this merely refreshes the new owner's lock.
+            os.utime(self.lock_path)
+        except FileNotFoundError:
+            self.lost = True
+            return False
+        return True
+
+    def start_heartbeat(self, interval=None):
+        interval = interval or self.queue.lease_s / 4
+
+        def beat():
+            while not self._stop.wait(interval):
+                if not self.heartbeat():
+                    break
+
+        self._thread = threading.Thread(target=beat, name=f"heartbeat-{self.job_id}", daemon=True)
+        self._thread.start()
+
+    def release(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        info = _read(self.lock_path)
+        if info is not None and info.get("worker") == self.queue.worker:
+            try:
+                self.lock_path.unlink()
+            except FileNotFoundError:
+                pass
+
+class WorkQueue:
+    def __init__(self, root: Path, lease_s=None, max_attempts=None, worker=None):
+        """
+        lease_s/max_attempts default to the values stored in queue.json, so
+        all workers of a queue agree on them.
+        """
+        self.root = Path(root)
+        self.jobs = self.root / "jobs"
+        self.claims = self.root / "claims"
+        self.done = self.root / "done"
+        self.failed = self.root / "failed"
+        cfg = self.config()
+        self.lease_s = lease_s or cfg.get("lease_s", LEASE_S)
+        self.max_attempts = max_attempts or cfg.get("max_attempts", MAX_ATTEMPTS)
+        self.worker = worker or worker_id()
+
+    def create(self, config):
+        for d in (self.jobs, self.claims, self.done, self.failed):
+            d.mkdir(parents=True, exist_ok=True)
+        config = dict(config, lease_s=self.lease_s, max_attempts=self.max_attempts)
+        _write_atomic(self.root / "queue.json", config)
+
+    def config(self):
+        return _read(self.root / "queue.json") or {}
+
+    def submit(self, job_id, job):
+        """
+        Adds a job unless it is already queued or done. Returns True if added.
+        """
+        path = self.jobs / f"{job_id}.json"
+        if path.exists() or (self.done / f"{job_id}.json").exists():
+            return False
+        _write_atomic(path, job)
+        return True
+
+    def _finished(self, job_id):
+        return (self.done / f"{job_id}.json").exists() or (self.failed / f"{job_id}.json").exists()
+
+    def _lock_age(self, lock: Path):
+        try:
+            return time.time() - lock.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def claim(self):
+        """
+        Claims the first job that is neither finished nor leased (taking
+        over expired leases). Returns a Lease or None.
+        """
+        for path in sorted(self.jobs.glob("*.json")):
+            job_id = path.stem
+            if self._finished(job_id):
+                continue
+            lock = self.claims / f"{job_id}.lock"
+            stale = self.claims / f"{job_id}.stale"
+            if lock.exists():
+                age = self._lock_age(lock)
+                if age is None or age < self.lease_s:
+                    continue
+                try:
+                    os.rename(lock, stale)
+                except FileNotFoundError:
+                    continue
+                old = _read(stale) or {}
+                print(f"[queue] lease of {job_id} by {old.get('worker', '?')} expired, requeued")
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue
+            old = _read(stale) or {}
+            attempt = old.get("attempt", 0) + 1
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump({"worker": self.worker, "claimed": time.time(), "attempt": attempt}, fh)
+            if attempt > self.max_attempts:
+                _write_atomic(self.failed / f"{job_id}.json",
+                              {"job_id": job_id, "error": f"lease expired {attempt - 1} time(s)",
+                               "last_worker": old.get("worker")})
+                lock.unlink()
+                continue
+            job = _read(path)
+            if job is None or self._finished(job_id):
+                lock.unlink()
+                continue
+            return Lease(self, job_id, job, attempt)
+        return None
+
+    def complete(self, lease, result, ok=True):
+        record = dict(result, job_id=lease.job_id, worker=self.worker, attempt=lease.attempt, finished=time.time())
+        _write_atomic((self.done if ok else self.failed) / f"{lease.job_id}.json", record)
+        lease.release()
+
+    def status(self):
+        counts = {"pending": 0, "running": 0, "expired": 0, "done": 0, "failed": 0}
+        for path in self.jobs.glob("*.json"):
+            job_id = path.stem
+            if (self.done / f"{job_id}.json").exists():
+                counts["done"] += 1
+            elif (self.failed / f"{job_id}.json").exists():
+                counts["failed"] += 1
+            else:
+                age = self._lock_age(self.claims / f"{job_id}.lock")
+                if age is None:
+                    counts["pending"] += 1
+                elif age < self.lease_s:
+                    counts["running"] += 1
+                else:
+                    counts["expired"] += 1
+        return counts
+
+    def drained(self):
+        """
+        True when every job is done or failed.
+        """
+        s = self.status()
+        return s["pending"] == s["running"] == s["expired"] == 0
+
+    def workers(self):
+        """
+        {worker: job_id} for live leases.
+        """
+        live = {}
+        for lock in self.claims.glob("*.lock"):
+            info = _read(lock)
+            age = self._lock_age(lock)
+            if info and age is not None and age < self.lease_s:
+                live[info.get("worker", "?")] = lock.stem
+        return live